@@ -1,11 +1,14 @@
 import os
+import sys
 import logging
 from oerforge.db_utils import initialize_database
 from oerforge.scan import scan_toc_and_populate_db
+from oerforge.execute import execute_course_notebooks
 from oerforge.convert import batch_convert_all_content
 from oerforge.make import build_all_markdown_files
 from oerforge.export_all import export_all
 from oerforge.copyfile import copy_build_to_docs
+from oerforge.linkcheck import check_links, format_report, fail_on_broken
 
 #================================================================
 # Directories for builds and file storage
@@ -33,15 +36,25 @@ def run() -> None:
     logging.info("Step 2: Scanning TOC and populating database...")
     scan_toc_and_populate_db('_content.yml')
 
-    logging.info("Step 3: Batch converting all content...")
+    logging.info("Step 3: Executing notebooks (if enabled in _content.yml)...")
+    execute_course_notebooks('_content.yml')
+
+    logging.info("Step 4: Batch converting all content...")
     batch_convert_all_content()
-    # logging.info("Step 4: Exporting all content to build/...")
+    # logging.info("Step 5: Exporting all content to build/...")
     # export_all()
 
-    logging.info("Step 4: Building HTML...")
+    logging.info("Step 5: Building HTML...")
     build_all_markdown_files()
 
-    # logging.info("Step 6: Copying build/ to docs/ for publishing...")
+    logging.info("Step 6: Checking internal links...")
+    link_result = check_links(BUILD_HTML_DIR)
+    print(format_report(link_result))
+    if link_result['problems'] and fail_on_broken(os.path.join(PROJECT_ROOT, '_content.yml')):
+        logging.error("Broken internal links; set linkcheck.fail_on_broken: false in _content.yml to build anyway.")
+        sys.exit(1)
+
+    # logging.info("Step 7: Copying build/ to docs/ for publishing...")
     # copy_build_to_docs()
 
     # logging.info("Workflow complete. Please check the build/, docs/, and logs directories for results.")
@@ -0,0 +1,61 @@
+"""
+badges.py
+---------
+Accessibility Badge Placement
+
+Pages carry their accessibility badge inside the layout's
+<span id="accessibility-report-placeholder">, between two marker comments:
+
+    <span id="accessibility-report-placeholder"><!--a11y-badge--> ...badge... <!--/a11y-badge--></span>
+
+make.py renders the stored badge there while it renders the page, and verify.py updates it
+after a check with splice_badge(), a string splice between the markers (no HTML parse).
+
+Usage:
+    html, found = splice_badge(html, badge_html)
+"""
+
+import re
+import logging
+
+# --- Constants ---
+PLACEHOLDER_ID = 'accessibility-report-placeholder'
+BADGE_START = '<!--a11y-badge-->'
+BADGE_END = '<!--/a11y-badge-->'
+MARKED_RE = re.compile(re.escape(BADGE_START) + r'.*?' + re.escape(BADGE_END), re.DOTALL)
+PLACEHOLDER_RE = re.compile(r'<(\w+)\b[^>]*\bid\s*=\s*["\']' + re.escape(PLACEHOLDER_ID) + r'["\'][^>]*>')
+
+def badge_markup(badge_html):
+    """
+    Return the badge wrapped in its marker comments (what goes inside the placeholder).
+    """
+    return f"{BADGE_START}{badge_html or ''}{BADGE_END}"
+
+def splice_badge(html, badge_html):
+    """
+    Put badge_html into the page's placeholder, replacing any previous badge.
+    Returns (html, found); found is False if the page has no placeholder (html is unchanged).
+    """
+    marked, count = MARKED_RE.subn(lambda m: badge_markup(badge_html), html, count=1)
+    if count:
+        return marked, True
+    match = PLACEHOLDER_RE.search(html)
+    if match is None:
+        return html, False
+    return html[:match.end()] + badge_markup(badge_html) + html[match.end():], True
+
+def splice_badge_into_file(html_path, badge_html):
+    """
+    Splice the badge into a built page, rewriting it only if it changed.
+    Returns False if the page has no placeholder (the caller falls back to a DOM-based insert).
+    """
+    with open(html_path, 'r', encoding='utf-8') as f:
+        html = f.read()
+    new_html, found = splice_badge(html, badge_html)
+    if not found:
+        return False
+    if new_html != html:
+        with open(html_path, 'w', encoding='utf-8') as f:
+            f.write(new_html)
+        logging.info(f"[badges] Updated accessibility badge in {html_path}")
+    return True
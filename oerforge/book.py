@@ -0,0 +1,304 @@
+"""
+book.py
+-------
+Whole-Course Book Export
+
+Builds a single EPUB and a single PDF for the whole course, with chapters in `_content.yml`
+TOC order. Each chapter is parsed by Pandoc into a JSON AST once and cached under
+cache/book/, keyed by the chapter's content, title, target and the Pandoc version. On the
+next export only changed chapters are re-parsed; the cached ASTs are merged in Python and
+handed to a single final Pandoc (and, for PDF, LaTeX) run. If no chapter and no template
+changed, the final assembly is skipped too.
+
+Usage:
+    python -m oerforge.book                # EPUB and PDF
+    python -m oerforge.book --format epub
+"""
+
+import os
+import re
+import copy
+import json
+import hashlib
+import logging
+import subprocess
+import concurrent.futures
+import yaml
+
+try:
+    from . import process_utils
+    from . import tools
+except ImportError:
+    import process_utils
+    import tools
+
+# --- Constants ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_DIR = os.path.join(PROJECT_ROOT, 'build')
+BOOK_DIR = os.path.join(BUILD_DIR, 'book')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'book')
+CONTENT_YML = os.path.join(PROJECT_ROOT, '_content.yml')
+PDF_TEMPLATE = os.path.join(PROJECT_ROOT, 'templates', 'tex', 'oerforge-pdf-template.tex')
+BOOK_FORMATS = ('epub', 'pdf')
+MAX_HEADER_LEVEL = 6  # Pandoc/HTML have no deeper headings
+
+# Seconds: per-chapter parse, and final assembly per format (PDF runs LaTeX over the whole course)
+CHAPTER_TIMEOUT = 120
+ASSEMBLY_TIMEOUTS = {'epub': 600, 'pdf': 1800}
+
+_pandoc_version = None
+
+def get_pandoc_version():
+    """
+    Return Pandoc's version line (part of every cache key), or '' if Pandoc is unavailable.
+    """
+    global _pandoc_version
+    if _pandoc_version is None:
+        _pandoc_version = tools.tool_version('pandoc') or ''
+        if not _pandoc_version:
+            logging.error("[BOOK] Could not determine Pandoc version: pandoc not found in PATH")
+    return _pandoc_version
+
+def collect_toc_chapters(toc, content_root):
+    """
+    Walk the TOC depth-first and return chapters in reading order.
+    Returns a list of dicts: {title, source_path, level}; only Markdown files that exist are included.
+    """
+    chapters = []
+
+    def walk(items, level):
+        for item in items:
+            file_path = item.get('file')
+            if isinstance(file_path, str) and file_path.endswith('.md'):
+                rel = file_path[len('content/'):] if file_path.startswith('content/') else file_path
+                source_path = os.path.join(content_root, rel)
+                if os.path.exists(source_path):
+                    chapters.append({'title': item.get('title', ''), 'source_path': source_path, 'level': level})
+                else:
+                    logging.warning(f"[BOOK] TOC file not found, skipping chapter: {source_path}")
+            if item.get('children'):
+                walk(item['children'], level + 1)
+
+    walk(toc, 0)
+    return chapters
+
+def chapter_cache_key(chapter, target):
+    """
+    Return the cache key for a chapter's AST: hash of its bytes, title, target format and Pandoc version.
+    """
+    digest = hashlib.sha256()
+    with open(chapter['source_path'], 'rb') as f:
+        digest.update(f.read())
+    for part in (chapter['title'], target, get_pandoc_version(), chapter['source_path']):
+        digest.update(b'\0' + part.encode('utf-8'))
+    return digest.hexdigest()
+
+def _walk_ast(node, fn):
+    """
+    Apply fn to every AST element dict (depth-first).
+    """
+    if isinstance(node, dict):
+        fn(node)
+        for value in node.values():
+            _walk_ast(value, fn)
+    elif isinstance(node, list):
+        for value in node:
+            _walk_ast(value, fn)
+
+def absolutize_image_paths(ast, base_dir):
+    """
+    Rewrite relative Image targets to absolute paths so chapters from different
+    directories can be merged into one document.
+    """
+    def fix(node):
+        if node.get('t') == 'Image':
+            target = node['c'][2]
+            url = target[0]
+            if url and not re.match(r'^[a-zA-Z][a-zA-Z0-9+.-]*:', url) and not os.path.isabs(url):
+                target[0] = os.path.normpath(os.path.join(base_dir, url))
+    _walk_ast(ast.get('blocks', []), fix)
+    return ast
+
+def title_header(title, chapter_index, level=1):
+    """
+    Return a Pandoc Header block (level-1 by default) for a chapter title.
+    """
+    inlines = []
+    for i, word in enumerate(title.split()):
+        if i:
+            inlines.append({'t': 'Space'})
+        inlines.append({'t': 'Str', 'c': word})
+    slug = re.sub(r'[^a-z0-9]+', '-', title.lower()).strip('-') or 'chapter'
+    return {'t': 'Header', 'c': [level, [f"{slug}-{chapter_index}", ['chapter'], []], inlines]}
+
+def shift_headers(blocks, shift):
+    """
+    Return a copy of blocks with every Header moved `shift` levels down (capped at 6).
+    """
+    blocks = copy.deepcopy(blocks)
+    if shift:
+        def demote(node):
+            if node.get('t') == 'Header':
+                node['c'][0] = min(node['c'][0] + shift, MAX_HEADER_LEVEL)
+        _walk_ast(blocks, demote)
+    return blocks
+
+def build_chapter_ast(chapter, target, force=False):
+    """
+    Return the Pandoc JSON AST for one chapter, from cache when its key is unchanged.
+    For PDF, emoji are removed first (LaTeX fonts cannot render them).
+    Returns (ast, from_cache).
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    key = chapter_cache_key(chapter, target)
+    cache_path = os.path.join(CACHE_DIR, f"{key}.json")
+    if not force and os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f), True
+    with open(chapter['source_path'], 'r', encoding='utf-8') as f:
+        md_text = f.read()
+    if target == 'pdf':
+        try:
+            import emoji
+            md_text = emoji.replace_emoji(md_text, replace="")
+        except ImportError:
+            logging.warning("[BOOK] The 'emoji' package is not installed; emoji are kept in the PDF source.")
+    result = process_utils.run_tool(
+        ["pandoc", "-f", "markdown", "-t", "json"],
+        input=md_text, timeout=CHAPTER_TIMEOUT, retries=1
+    )
+    ast = json.loads(result.stdout)
+    absolutize_image_paths(ast, os.path.dirname(os.path.abspath(chapter['source_path'])))
+    tmp_path = cache_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(ast, f)
+    os.replace(tmp_path, cache_path)
+    return ast, False
+
+def merge_chapter_asts(chapters, asts):
+    """
+    Merge chapter ASTs into one document in TOC order.
+    A chapter without its own level-1 heading gets one from its TOC title. Headings follow
+    the TOC hierarchy: a chapter nested `level` deep has its headings (and its title)
+    shifted down `level` levels, so sections stay inside their parent chapter.
+    """
+    if not asts:
+        return None
+    blocks = []
+    for index, (chapter, ast) in enumerate(zip(chapters, asts)):
+        chapter_blocks = ast.get('blocks', [])
+        shift = chapter.get('level', 0)
+        has_h1 = any(b.get('t') == 'Header' and b['c'][0] == 1 for b in chapter_blocks)
+        if not has_h1 and chapter['title']:
+            blocks.append(title_header(chapter['title'], index, min(1 + shift, MAX_HEADER_LEVEL)))
+        blocks.extend(shift_headers(chapter_blocks, shift))
+    return {'pandoc-api-version': asts[0]['pandoc-api-version'], 'meta': {}, 'blocks': blocks}
+
+def _assembly_key(chapter_keys, fmt, levels=()):
+    digest = hashlib.sha256()
+    for key in chapter_keys:
+        digest.update(key.encode('utf-8'))
+    # TOC nesting decides heading levels in the merged document
+    digest.update(json.dumps(list(levels)).encode('utf-8'))
+    digest.update(fmt.encode('utf-8'))
+    if fmt == 'pdf' and os.path.exists(PDF_TEMPLATE):
+        with open(PDF_TEMPLATE, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def export_book(fmt, chapters, output_path, title='', author='', force=False, max_workers=None):
+    """
+    Export one book format from the given chapters.
+    Returns a dict: {format, output, status, chapters, reparsed}.
+    status is one of: success, up-to-date, failed, timeout.
+    """
+    keys = [chapter_cache_key(c, fmt) for c in chapters]
+    assembly_key = _assembly_key(keys, fmt, [c.get('level', 0) for c in chapters])
+    key_path = os.path.join(CACHE_DIR, f"{os.path.basename(output_path)}.key")
+    summary = {'format': fmt, 'output': output_path, 'status': 'failed', 'chapters': len(chapters), 'reparsed': 0}
+    if not force and os.path.exists(output_path) and os.path.exists(key_path):
+        with open(key_path, 'r', encoding='utf-8') as f:
+            if f.read().strip() == assembly_key:
+                logging.info(f"[BOOK] {output_path} is up to date; skipping assembly.")
+                summary['status'] = 'up-to-date'
+                return summary
+    asts = [None] * len(chapters)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(build_chapter_ast, c, fmt, force): i for i, c in enumerate(chapters)}
+        for future in concurrent.futures.as_completed(futures):
+            i = futures[future]
+            try:
+                asts[i], from_cache = future.result()
+                if not from_cache:
+                    summary['reparsed'] += 1
+            except Exception as e:
+                logging.error(f"[BOOK] Failed to parse chapter {chapters[i]['source_path']}: {e}")
+                return summary
+    logging.info(f"[BOOK] {fmt}: {summary['reparsed']} of {len(chapters)} chapter(s) re-parsed; assembling {output_path}")
+    book_ast = merge_chapter_asts(chapters, asts)
+    if book_ast is None:
+        logging.warning("[BOOK] No chapters to export.")
+        return summary
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    cmd = ["pandoc", "-f", "json", "-o", output_path, "--toc", "--resource-path", PROJECT_ROOT]
+    if title:
+        cmd += ["--metadata", f"title={title}"]
+    if author:
+        cmd += ["--metadata", f"author={author}"]
+    if fmt == 'pdf' and os.path.exists(PDF_TEMPLATE):
+        cmd += ["--template", PDF_TEMPLATE]
+    try:
+        process_utils.run_tool(cmd, input=json.dumps(book_ast), timeout=ASSEMBLY_TIMEOUTS[fmt], retries=1)
+    except subprocess.TimeoutExpired:
+        logging.error(f"[BOOK] Assembly of {output_path} timed out after {ASSEMBLY_TIMEOUTS[fmt]}s")
+        summary['status'] = 'timeout'
+        return summary
+    except subprocess.CalledProcessError as e:
+        logging.error(f"[BOOK] Pandoc failed for book {fmt}: {e}\nSTDERR: {e.stderr}")
+        return summary
+    except Exception as e:
+        logging.error(f"[BOOK] Pandoc failed for book {fmt} (unexpected): {e}")
+        return summary
+    with open(key_path, 'w', encoding='utf-8') as f:
+        f.write(assembly_key)
+    summary['status'] = 'success'
+    logging.info(f"[BOOK] Wrote {output_path}")
+    return summary
+
+def export_course_book(config_path=CONTENT_YML, formats=BOOK_FORMATS, force=False, output_dir=BOOK_DIR):
+    """
+    Export the whole course, in TOC order, as one file per format (default: EPUB and PDF).
+    Optional `book:` block in _content.yml: title, author, filename.
+    Returns a list of per-format summaries.
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    site = config.get('site', {})
+    book_config = config.get('book', {}) or {}
+    title = book_config.get('title', site.get('title', ''))
+    author = book_config.get('author', site.get('author', ''))
+    filename = book_config.get('filename', 'book')
+    content_root = os.path.join(os.path.dirname(os.path.abspath(config_path)), 'content')
+    chapters = collect_toc_chapters(config.get('toc', []), content_root)
+    logging.info(f"[BOOK] {len(chapters)} chapter(s) in TOC order")
+    summaries = []
+    for fmt in formats:
+        output_path = os.path.join(output_dir, f"{filename}.{fmt}")
+        can_run, reason = tools.can_convert('.md', f".{fmt}")
+        if not can_run:
+            logging.error(f"[BOOK] Skipping {fmt} book: {reason}")
+            summaries.append({'format': fmt, 'output': output_path, 'status': 'unavailable', 'chapters': len(chapters), 'reparsed': 0})
+            continue
+        summaries.append(export_book(fmt, chapters, output_path, title=title, author=author, force=force))
+    return summaries
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export the whole course as a single EPUB/PDF book.")
+    parser.add_argument("--format", nargs="+", choices=BOOK_FORMATS, default=list(BOOK_FORMATS), help="Book formats to build")
+    parser.add_argument("--force", action="store_true", help="Ignore cached chapters and rebuild everything")
+    parser.add_argument("--config", default=CONTENT_YML, help="Path to _content.yml")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    for s in export_course_book(args.config, formats=args.format, force=args.force):
+        print(f"{s['format']}: {s['status']} ({s['reparsed']}/{s['chapters']} chapters re-parsed) -> {s['output']}")
@@ -15,13 +15,32 @@ import re
 import os
 import logging
 import json
+import sqlite3
+import subprocess
+import threading
 import concurrent.futures
 from datetime import datetime
 
 try:
     from . import db_utils
+    from . import process_utils
+    from .copyfile import copy_if_changed
+    from .db_writer import DBWriter, AssetPathUpdate, ConversionResult, JobStateUpdate
+    from . import job_queue
+    from .notebook import render_notebook_file
+    from . import latex
+    from . import tools
+    from .progress import ProgressLog, read_progress, latest_records
 except ImportError:
     import db_utils
+    import process_utils
+    from copyfile import copy_if_changed
+    from db_writer import DBWriter, AssetPathUpdate, ConversionResult, JobStateUpdate
+    import job_queue
+    from notebook import render_notebook_file
+    import latex
+    import tools
+    from progress import ProgressLog, read_progress, latest_records
 
 # --- Constants ---
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -29,7 +48,33 @@ DB_PATH = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
 BUILD_DIR = os.path.join(PROJECT_ROOT, 'build')
 LOG_PATH = os.path.join(PROJECT_ROOT, 'log', 'build.log')
 SUMMARY_JSON = os.path.join(BUILD_DIR, 'conversion_summary.json')
+PROGRESS_NDJSON = os.path.join(BUILD_DIR, 'conversion_progress.ndjson')
 DEBUG_MODE = os.environ.get("DEBUG", "0") == "1"
+# Compile PDFs against a precompiled preamble format (see latex.py) instead of a full Pandoc+LaTeX run per page
+PDF_PRECOMPILED_PREAMBLE = os.environ.get("OERFORGE_PDF_PRECOMPILED", "0") == "1"
+
+# Per-converter timeouts in seconds, keyed by target extension. LaTeX (PDF) gets the most headroom.
+CONVERTER_TIMEOUTS = {
+    '.txt': 120,
+    '.tex': 120,
+    '.pdf': 600,
+    '.docx': 180,
+    '.epub': 180,
+}
+CONVERTER_RETRIES = 1
+
+# Job queue settings: a claim's lease is short and renewed by a heartbeat while its job runs,
+# so a crashed worker's jobs are reclaimed within JOB_LEASE_SECONDS
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+JOB_LEASE_SECONDS = 120
+JOB_HEARTBEAT_SECONDS = 30
+JOB_FINAL_STATES = {
+    'success': 'done',
+    'skipped': 'done',
+    'failed': 'failed',
+    'timeout': 'failed',
+    'cancelled': 'pending',
+}
 
 def get_page_files_dir(output_path):
     """
@@ -42,46 +87,81 @@ def get_page_files_dir(output_path):
     base, _ = os.path.splitext(output_path)
     return f"{base}_files"
 
-def copy_and_update_assets_for_non_html(input_path, output_path, db_path):
+# Regex for Markdown and HTML image links
+IMAGE_LINK_RE = re.compile(r'!\[[^\]]*\]\(([^)]+)\)|<img [^>]*src=[\"\\\']([^\"\\\']+)[\"\\\']')
+
+def find_image_references(md_text):
     """
-    For non-HTML conversions, copy all referenced assets to PAGE_files/ and update their DB paths.
-    - Finds all image references in the Markdown file.
-    - Copies each asset to the correct PAGE_files directory.
-    - Updates the files and pages_files tables in the database.
+    Return all image paths referenced in Markdown text (Markdown and HTML <img> syntax).
+    """
+    return [p for tup in IMAGE_LINK_RE.findall(md_text) for p in tup if p]
+
+def stage_assets_for_source(input_path, page_files_dir):
+    """
+    Copy all assets referenced by a source file into its PAGE_files directory.
+    - Scans the source once for image references.
+    - Skips copies whose destination already has the same content hash.
+    Returns a list of (old_relative_path, new_relative_path) DB path updates.
+    Does not touch the database; the caller applies the updates via apply_asset_path_updates() or a DBWriter.
     """
     with open(input_path, "r", encoding="utf-8") as f:
         md = f.read()
-    # Regex for Markdown and HTML image links
-    img_links = re.findall(r'!\[[^\]]*\]\(([^)]+)\)|<img [^>]*src=[\"\\\']([^\"\\\']+)[\"\\\']', md)
-    img_paths = [p for tup in img_links for p in tup if p]
+    img_paths = find_image_references(md)
     if not img_paths:
-        return
-    # Determine the correct PAGE_files dir (avoid nesting)
-    if output_path.endswith('_files') or os.path.basename(os.path.dirname(output_path)).endswith('_files'):
-        page_files_dir = os.path.dirname(output_path)
-    else:
-        page_files_dir = get_page_files_dir(output_path)
+        return []
     os.makedirs(page_files_dir, exist_ok=True)
+    updates = []
+    copied = 0
     for rel_path in img_paths:
         rel_path_clean = rel_path.split('?')[0].split('#')[0]
         src_path = os.path.join(PROJECT_ROOT, 'content', rel_path_clean)
         if os.path.exists(src_path):
             dst_path = os.path.join(page_files_dir, os.path.basename(rel_path_clean))
-            shutil.copy2(src_path, dst_path)
-            # Update DB: files.relative_path and pages_files.page_path
-            try:
-                import sqlite3
-                conn = sqlite3.connect(db_path)
-                cursor = conn.cursor()
-                new_rel = os.path.join(os.path.basename(page_files_dir), os.path.basename(rel_path_clean))
-                cursor.execute("UPDATE files SET relative_path=? WHERE relative_path=?", (new_rel, rel_path_clean))
-                cursor.execute("UPDATE pages_files SET page_path=? WHERE page_path=?", (new_rel, rel_path_clean))
-                conn.commit()
-                conn.close()
-            except Exception as e:
-                logging.error(f"[ASSET-DB] Failed to update DB for asset {rel_path_clean}: {e}")
+            if copy_if_changed(src_path, dst_path):
+                copied += 1
+            new_rel = os.path.join(os.path.basename(page_files_dir), os.path.basename(rel_path_clean))
+            updates.append((rel_path_clean, new_rel))
         else:
             logging.warning(f"[ASSET] Referenced asset not found: {src_path}")
+    logging.debug(f"[ASSET] Staged {len(updates)} asset(s) for {input_path} ({copied} copied, {len(updates) - copied} already current)")
+    return updates
+
+def apply_asset_path_updates(updates, db_path):
+    """
+    Apply staged asset path updates to files.relative_path and pages_files.page_path
+    in a single connection and transaction.
+    updates: list of (old_relative_path, new_relative_path)
+    """
+    if not updates:
+        return
+    import sqlite3
+    unique_updates = list(dict.fromkeys(updates))
+    conn = sqlite3.connect(db_path)
+    try:
+        with conn:
+            conn.executemany("UPDATE files SET relative_path=? WHERE relative_path=?", [(new, old) for old, new in unique_updates])
+            conn.executemany("UPDATE pages_files SET page_path=? WHERE page_path=?", [(new, old) for old, new in unique_updates])
+    except Exception as e:
+        logging.error(f"[ASSET-DB] Failed to apply {len(unique_updates)} asset path update(s): {e}")
+    finally:
+        conn.close()
+
+def get_asset_dir_for_output(output_path):
+    """
+    Return the PAGE_files directory for a converted output (avoids nesting PAGE_files/PAGE_files).
+    """
+    if output_path.endswith('_files') or os.path.basename(os.path.dirname(output_path)).endswith('_files'):
+        return os.path.dirname(output_path)
+    return get_page_files_dir(output_path)
+
+def copy_and_update_assets_for_non_html(input_path, output_path, db_path):
+    """
+    For non-HTML conversions, copy all referenced assets to PAGE_files/ and update their DB paths.
+    Standalone helper for single conversions; batch_convert_all_content stages each source once
+    per build and batches the DB updates instead of calling this per format.
+    """
+    updates = stage_assets_for_source(input_path, get_asset_dir_for_output(output_path))
+    apply_asset_path_updates(updates, db_path)
 
 def get_section_files_dir(content_row):
     """
@@ -104,7 +184,8 @@ def get_enabled_conversions(db_path):
         rows = db_utils.get_records(
             "conversion_capabilities",
             "is_enabled=1",
-            conn=conn
+            conn=conn,
+            cursor=conn.cursor()
         )
         return [(row["source_format"], row["target_format"]) for row in rows]
     finally:
@@ -118,7 +199,7 @@ def get_content_files_to_convert(db_path):
     import sqlite3
     conn = sqlite3.connect(db_path)
     try:
-        return db_utils.get_records("content", None, conn=conn)
+        return db_utils.get_records("content", None, conn=conn, cursor=conn.cursor())
     finally:
         conn.close()
 
@@ -140,6 +221,7 @@ def convert_file(input_path, output_path, input_ext, output_ext, db_path, log_qu
     """
     Dispatch to the correct converter function based on input/output extensions.
     Returns a dict: {input, output, status, reason, start_time, end_time}
+    status is one of: success, failed, skipped, timeout, cancelled.
     """
     start = datetime.now().isoformat()
     logging.debug(f"[convert_file] Attempting: {input_path} ({input_ext}) -> {output_path} ({output_ext})")
@@ -148,35 +230,42 @@ def convert_file(input_path, output_path, input_ext, output_ext, db_path, log_qu
         if input_ext == ".md" and output_ext == ".txt":
             logging.debug(f"[convert_file] Dispatch: convert_md_to_txt")
             result = convert_md_to_txt(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
         elif input_ext == ".md" and output_ext == ".md":
             logging.debug(f"[convert_file] Dispatch: convert_md_to_md")
             result = convert_md_to_md(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
         elif input_ext == ".md" and output_ext == ".tex":
             logging.debug(f"[convert_file] Dispatch: convert_md_to_tex")
             result = convert_md_to_tex(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
         elif input_ext == ".md" and output_ext == ".pdf":
             logging.debug(f"[convert_file] Dispatch: convert_md_to_pdf")
             result = convert_md_to_pdf(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
         elif input_ext == ".md" and output_ext == ".docx":
             logging.debug(f"[convert_file] Dispatch: convert_md_to_docx")
             result = convert_md_to_docx(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
         elif input_ext == ".docx" and output_ext == ".md":
             logging.debug(f"[convert_file] Dispatch: convert_docx_to_md")
             result = convert_docx_to_md(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
+        elif input_ext == ".ipynb" and output_ext == ".md":
+            logging.debug(f"[convert_file] Dispatch: convert_ipynb_to_md")
+            result = convert_ipynb_to_md(input_path, output_path)
+        elif input_ext == ".ipynb" and output_ext == ".txt":
+            logging.debug(f"[convert_file] Dispatch: convert_ipynb_to_txt")
+            result = convert_ipynb_to_txt(input_path, output_path)
+        elif input_ext == ".ipynb" and output_ext == ".tex":
+            logging.debug(f"[convert_file] Dispatch: convert_ipynb_to_tex")
+            result = convert_ipynb_to_tex(input_path, output_path)
+        elif input_ext == ".ipynb" and output_ext == ".pdf":
+            logging.debug(f"[convert_file] Dispatch: convert_ipynb_to_pdf")
+            result = convert_ipynb_to_pdf(input_path, output_path)
+        elif input_ext == ".ipynb" and output_ext == ".docx":
+            logging.debug(f"[convert_file] Dispatch: convert_ipynb_to_docx")
+            result = convert_ipynb_to_docx(input_path, output_path)
         elif input_ext == ".ipynb" and output_ext == ".epub":
             logging.debug(f"[convert_file] Dispatch: convert_ipynb_to_epub")
             result = convert_ipynb_to_epub(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
         elif input_ext == ".md" and output_ext == ".epub":
             logging.debug(f"[convert_file] Dispatch: convert_md_to_epub")
             result = convert_md_to_epub(input_path, output_path)
-            copy_and_update_assets_for_non_html(input_path, output_path, db_path)
         else:
             msg = f"No converter for {input_ext} -> {output_ext}"
             logging.warning(msg)
@@ -184,6 +273,12 @@ def convert_file(input_path, output_path, input_ext, output_ext, db_path, log_qu
         status = "success" if result else "failed"
         logging.info(f"[convert_file] {input_path} -> {output_path}: {status}")
         return {"input": input_path, "output": output_path, "status": status, "reason": None, "start_time": start, "end_time": datetime.now().isoformat()}
+    except subprocess.TimeoutExpired as e:
+        logging.error(f"[convert_file] Conversion timed out after {e.timeout}s: {input_path} -> {output_path}")
+        return {"input": input_path, "output": output_path, "status": "timeout", "reason": f"Timed out after {e.timeout}s", "start_time": start, "end_time": datetime.now().isoformat()}
+    except process_utils.ToolCancelledError as e:
+        logging.warning(f"[convert_file] Conversion cancelled: {input_path} -> {output_path}")
+        return {"input": input_path, "output": output_path, "status": "cancelled", "reason": str(e), "start_time": start, "end_time": datetime.now().isoformat()}
     except Exception as e:
         logging.error(f"[convert_file] Conversion failed: {input_path} -> {output_path}: {e}")
         return {"input": input_path, "output": output_path, "status": "failed", "reason": str(e), "start_time": start, "end_time": datetime.now().isoformat()}
@@ -194,13 +289,14 @@ def convert_md_to_txt(input_path, output_path):
     Convert Markdown to plain text using Pandoc.
     Images will be ignored in plain text output.
     """
-    import subprocess
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        subprocess.run([
+        process_utils.run_tool([
             "pandoc", input_path, "-t", "plain", "-o", output_path
-        ], check=True, capture_output=True, text=True)
+        ], timeout=CONVERTER_TIMEOUTS['.txt'], retries=CONVERTER_RETRIES)
         return True
+    except (subprocess.TimeoutExpired, process_utils.ToolCancelledError):
+        raise
     except subprocess.CalledProcessError as e:
         logging.error(f"Pandoc failed for TXT: {e}\nSTDOUT: {e.stdout}\nSTDERR: {e.stderr}")
         return False
@@ -226,13 +322,14 @@ def convert_md_to_tex(input_path, output_path):
     Convert Markdown to LaTeX using Pandoc.
     Images are converted to LaTeX includegraphics commands.
     """
-    import subprocess
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        subprocess.run([
+        process_utils.run_tool([
             "pandoc", input_path, "-o", output_path
-        ], check=True, capture_output=True, text=True)
+        ], timeout=CONVERTER_TIMEOUTS['.tex'], retries=CONVERTER_RETRIES)
         return True
+    except (subprocess.TimeoutExpired, process_utils.ToolCancelledError):
+        raise
     except subprocess.CalledProcessError as e:
         logging.error(f"Pandoc failed for LaTeX: {e}\nSTDOUT: {e.stdout}\nSTDERR: {e.stderr}")
         return False
@@ -243,8 +340,8 @@ def convert_md_to_tex(input_path, output_path):
 def convert_md_to_pdf(input_path, output_path):
     """
     Convert Markdown to PDF using Pandoc, removing emoji characters before conversion.
+    With OERFORGE_PDF_PRECOMPILED=1, pages compile against the precompiled template preamble.
     """
-    import subprocess
     import tempfile
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -252,6 +349,7 @@ def convert_md_to_pdf(input_path, output_path):
     except ImportError:
         logging.error("The 'emoji' package is required for emoji removal in PDF export. Please install it.")
         return False
+    tmp_path = None
     try:
         with open(input_path, "r", encoding="utf-8") as f:
             md_text = f.read()
@@ -261,32 +359,44 @@ def convert_md_to_pdf(input_path, output_path):
             tmp_path = tmp.name
         project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         template_path = os.path.join(project_root, "templates", "tex", "oerforge-pdf-template.tex")
+        if PDF_PRECOMPILED_PREAMBLE and os.path.exists(template_path):
+            try:
+                return latex.compile_markdown_to_pdf(tmp_path, output_path, template_path)
+            except (subprocess.TimeoutExpired, process_utils.ToolCancelledError):
+                raise
+            except Exception as e:
+                logging.warning(f"[LATEX] Precompiled preamble build failed for {output_path}, falling back to Pandoc: {e}")
         pandoc_cmd = ["pandoc", tmp_path, "-o", output_path]
         if os.path.exists(template_path):
             pandoc_cmd += ["--template", template_path]
-        subprocess.run(pandoc_cmd, check=True, capture_output=True, text=True)
+        process_utils.run_tool(pandoc_cmd, timeout=CONVERTER_TIMEOUTS['.pdf'], retries=CONVERTER_RETRIES)
         return True
+    except (subprocess.TimeoutExpired, process_utils.ToolCancelledError):
+        raise
     except subprocess.CalledProcessError as e:
         logging.error(f"Pandoc failed for PDF (emoji removed): {e}\nSTDOUT: {e.stdout}\nSTDERR: {e.stderr}")
         return False
     except Exception as e:
         logging.error(f"Pandoc failed for PDF (unexpected): {e}")
         return False
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
 def convert_md_to_docx(input_path, output_path):
     """
     Convert Markdown to DOCX using Pandoc, extracting media to embed images.
     """
-    import subprocess
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        from .convert import get_page_files_dir
         media_dir = get_page_files_dir(output_path)
-        subprocess.run([
+        process_utils.run_tool([
             "pandoc", input_path, "-o", output_path,
             "--extract-media", media_dir
-        ], check=True, capture_output=True, text=True)
+        ], timeout=CONVERTER_TIMEOUTS['.docx'], retries=CONVERTER_RETRIES)
         return True
+    except (subprocess.TimeoutExpired, process_utils.ToolCancelledError):
+        raise
     except subprocess.CalledProcessError as e:
         logging.error(f"Pandoc failed for DOCX: {e}\nSTDOUT: {e.stdout}\nSTDERR: {e.stderr}")
         return False
@@ -298,13 +408,14 @@ def convert_md_to_epub(input_path, output_path):
     """
     Convert Markdown to EPUB using Pandoc.
     """
-    import subprocess
     try:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
-        subprocess.run([
+        process_utils.run_tool([
             "pandoc", input_path, "-o", output_path
-        ], check=True, capture_output=True, text=True)
+        ], timeout=CONVERTER_TIMEOUTS['.epub'], retries=CONVERTER_RETRIES)
         return True
+    except (subprocess.TimeoutExpired, process_utils.ToolCancelledError):
+        raise
     except subprocess.CalledProcessError as e:
         logging.error(f"Pandoc failed for EPUB: {e}\nSTDOUT: {e.stdout}\nSTDERR: {e.stderr}")
         return False
@@ -312,31 +423,180 @@ def convert_md_to_epub(input_path, output_path):
         logging.error(f"Pandoc failed for EPUB (unexpected): {e}")
         return False
 
+# --- Notebook Converters ---
+def convert_ipynb_to_md(input_path, output_path):
+    """
+    Render a Jupyter notebook to Markdown in-process (no nbconvert).
+    Output images are written to the output's PAGE_files directory and linked relatively.
+    """
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        asset_dir = get_asset_dir_for_output(output_path)
+        md_text = render_notebook_file(input_path, asset_dir, os.path.relpath(asset_dir, os.path.dirname(output_path)))
+        if md_text is None:
+            return False
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(md_text)
+        return True
+    except Exception as e:
+        logging.error(f"Notebook rendering failed for MD: {e}")
+        return False
+
+def _convert_ipynb_via_markdown(md_converter, input_path, output_path):
+    """
+    Render a notebook to a temporary Markdown file and hand it to a Markdown converter.
+    Images are linked by absolute path so Pandoc can embed them regardless of its working directory.
+    """
+    import tempfile
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    asset_dir = os.path.abspath(get_asset_dir_for_output(output_path))
+    md_text = render_notebook_file(input_path, asset_dir, asset_dir)
+    if md_text is None:
+        return False
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile("w", delete=False, suffix=".md", encoding="utf-8") as tmp:
+            tmp.write(md_text)
+            tmp_path = tmp.name
+        return md_converter(tmp_path, output_path)
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def convert_ipynb_to_txt(input_path, output_path):
+    """
+    Convert a Jupyter notebook to plain text via its rendered Markdown.
+    """
+    return _convert_ipynb_via_markdown(convert_md_to_txt, input_path, output_path)
+
+def convert_ipynb_to_tex(input_path, output_path):
+    """
+    Convert a Jupyter notebook to LaTeX via its rendered Markdown.
+    """
+    return _convert_ipynb_via_markdown(convert_md_to_tex, input_path, output_path)
+
+def convert_ipynb_to_pdf(input_path, output_path):
+    """
+    Convert a Jupyter notebook to PDF via its rendered Markdown.
+    """
+    return _convert_ipynb_via_markdown(convert_md_to_pdf, input_path, output_path)
+
+def convert_ipynb_to_docx(input_path, output_path):
+    """
+    Convert a Jupyter notebook to DOCX via its rendered Markdown.
+    """
+    return _convert_ipynb_via_markdown(convert_md_to_docx, input_path, output_path)
+
+def convert_ipynb_to_epub(input_path, output_path):
+    """
+    Convert a Jupyter notebook to EPUB via its rendered Markdown.
+    """
+    return _convert_ipynb_via_markdown(convert_md_to_epub, input_path, output_path)
+
 # --- Stub converters for other formats (ipynb, docx, marp, tex, jupyter, ppt, txt) ---
 # ...existing code for stub converters...
 
 print("Total converter stubs defined: 44")
 
-def batch_convert_all_content(db_path=DB_PATH, force=False, summary_json_path=SUMMARY_JSON):
+def _stage_and_post(writer, input_path, page_files_dir):
     """
-    Orchestrate batch conversion of all content files.
-    - Gathers enabled conversions and content files.
-    - Schedules and runs conversion jobs in parallel.
-    - Writes a summary JSON and prints a plain text summary.
+    Worker task: stage a source's assets and post the resulting DB path updates to the writer.
     """
-    logging.info("[batch_convert_all_content] Starting batch conversion...")
+    updates = stage_assets_for_source(input_path, page_files_dir)
+    writer.post_many(AssetPathUpdate(old, new) for old, new in updates)
+    return len(updates)
+
+def _convert_and_post(writer, meta, input_path, output_path, input_ext, output_ext, db_path):
+    """
+    Worker task: run convert_file and post a ConversionResult intent to the writer.
+    Adds the job duration in seconds and the toolchain stamp to the returned result dict.
+    """
+    result = convert_file(input_path, output_path, input_ext, output_ext, db_path)
+    result["toolchain"] = tools.toolchain_stamp(input_ext, output_ext)
+    started = datetime.fromisoformat(result["start_time"])
+    ended = datetime.fromisoformat(result["end_time"])
+    result["duration"] = round((ended - started).total_seconds(), 3)
+    if meta.get("content_id") is not None:
+        writer.post(ConversionResult(
+            content_id=meta["content_id"],
+            source_format=input_ext,
+            target_format=output_ext,
+            output_path=os.path.relpath(output_path, BUILD_DIR),
+            conversion_time=result["duration"],
+            status=result["status"],
+            reason=result["reason"],
+            forced=int(bool(meta.get("forced"))),
+            custom_label=meta.get("custom_label"),
+            created_at=result["end_time"],
+            toolchain=result["toolchain"],
+        ))
+    return result
+
+def classify_job(input_path, output_path, force=False, toolchain=None, recorded_toolchain=None):
+    """
+    Classify a planned conversion without running it.
+    Returns (state, reason); state is one of: new, stale, up-to-date, missing-source.
+    new and stale jobs are the ones should_convert() accepts. An output that is newer than
+    its source is still stale if it was built with a different toolchain (tool versions)
+    than the current one; outputs without a recorded toolchain are not compared.
+    """
+    if force:
+        return "stale", "forced"
+    if not os.path.exists(output_path):
+        return "new", "output does not exist"
+    if not os.path.exists(input_path):
+        return "missing-source", "source file not found"
+    delta = os.path.getmtime(input_path) - os.path.getmtime(output_path)
+    if delta > 0:
+        return "stale", f"source modified {delta:.0f}s after output"
+    if toolchain is not None and recorded_toolchain is not None and toolchain != recorded_toolchain:
+        return "stale", f"toolchain changed: {recorded_toolchain or 'none'} -> {toolchain or 'none'}"
+    return "up-to-date", "output newer than source"
+
+def get_recorded_toolchains(db_path):
+    """
+    Return {output path relative to build/: toolchain} from the last successful conversion of
+    each output. Read from conversion_jobs, which (unlike conversion_results) is kept when
+    initialize_database() rebuilds the other tables.
+    """
+    conn = job_queue.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT output_path, toolchain FROM conversion_jobs WHERE toolchain IS NOT NULL"
+        ).fetchall()
+    except sqlite3.OperationalError as e:
+        logging.warning(f"[plan_conversion_jobs] No recorded toolchains: {e}")
+        rows = []
+    finally:
+        conn.close()
+    return {
+        os.path.relpath(output_path, BUILD_DIR) if os.path.isabs(output_path) else output_path: toolchain
+        for output_path, toolchain in rows
+    }
+
+def enumerate_conversion_jobs(db_path=DB_PATH, force=False):
+    """
+    Enumerate every conversion from content x conversion_capabilities x export_types, classified
+    with classify_job(). Has no side effects (creates no directories), so it backs both the
+    real planner and dry-run plans. Conversions whose tools are missing (see tools.py) are
+    classified as unavailable up front instead of failing one by one.
+    Returns a list of dicts {input_path, output_path, input_ext, output_ext, content_id, forced,
+    custom_label, state, reason}.
+    """
+    available_tools = tools.probe_tools()
+    recorded_toolchains = get_recorded_toolchains(db_path)
     conversions = get_enabled_conversions(db_path)
-    logging.debug(f"[batch_convert_all_content] Enabled conversions: {conversions}")
+    logging.debug(f"[plan_conversion_jobs] Enabled conversions: {conversions}")
     files = get_content_files_to_convert(db_path)
-    logging.debug(f"[batch_convert_all_content] Content files to convert: {len(files)}")
+    logging.debug(f"[plan_conversion_jobs] Content files to convert: {len(files)}")
     jobs = []
     for i, file in enumerate(files):
         if i < 5:
-            logging.debug(f"[batch_convert_all_content] file dict {i}: keys={list(file.keys())}, file={file}")
+            logging.debug(f"[plan_conversion_jobs] file dict {i}: keys={list(file.keys())}, file={file}")
     for file in files:
         input_path = file["source_path"]
         if input_path and os.path.basename(input_path) == "_index.md":
-            logging.info(f"[batch_convert_all_content] Skipping conversion for section index: {input_path}")
+            logging.info(f"[plan_conversion_jobs] Skipping conversion for section index: {input_path}")
             continue
         input_ext = file.get("mime_type")
         if not input_ext:
@@ -350,7 +610,6 @@ def batch_convert_all_content(db_path=DB_PATH, force=False, summary_json_path=SU
             continue
         base_dir = os.path.dirname(base_output_path)
         base_name = os.path.splitext(os.path.basename(base_output_path))[0]
-        did_identity = False
         for (src_ext, tgt_ext) in conversions:
             if input_ext != src_ext:
                 continue
@@ -359,34 +618,290 @@ def batch_convert_all_content(db_path=DB_PATH, force=False, summary_json_path=SU
                 output_path = os.path.join(base_dir, base_name + tgt_ext)
             else:
                 page_files_dir = get_page_files_dir(os.path.join(base_dir, base_name + ".html"))
-                os.makedirs(page_files_dir, exist_ok=True)
                 output_path = os.path.join(page_files_dir, base_name + tgt_ext)
-            if input_ext == tgt_ext:
-                if export_types_list and tgt_fmt not in export_types_list:
-                    logging.debug(f"[batch_convert_all_content] SKIP: identity conversion {input_ext}->{tgt_ext} excluded by export_types_list {export_types_list}")
-                    continue
-                did_identity = True
-            else:
-                if export_types_list and tgt_fmt not in export_types_list:
-                    continue
-            if os.path.abspath(input_path) == os.path.abspath(output_path):
-                logging.info(f"[batch_convert_all_content] Skipping identity conversion to avoid overwriting source: {input_path} -> {output_path}")
+            if export_types_list and tgt_fmt not in export_types_list:
+                if input_ext == tgt_ext:
+                    logging.debug(f"[plan_conversion_jobs] SKIP: identity conversion {input_ext}->{tgt_ext} excluded by export_types_list {export_types_list}")
                 continue
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            if not should_convert(input_path, output_path, force=force_this):
-                logging.info(f"[batch_convert_all_content] Skipping up-to-date: {input_path} -> {output_path}")
+            if os.path.abspath(input_path) == os.path.abspath(output_path):
+                logging.info(f"[plan_conversion_jobs] Skipping identity conversion to avoid overwriting source: {input_path} -> {output_path}")
                 continue
-            logging.debug(f"[batch_convert_all_content] Adding job: {input_path} ({input_ext}) -> {output_path} ({tgt_ext})")
-            jobs.append((input_path, output_path, input_ext, tgt_ext, db_path))
-    logging.info(f"[batch_convert_all_content] Total jobs queued: {len(jobs)}")
+            can_run, missing_reason = tools.can_convert(input_ext, tgt_ext, available_tools)
+            if not can_run:
+                state, reason = "unavailable", missing_reason
+            else:
+                rel_output = os.path.relpath(output_path, BUILD_DIR) if os.path.isabs(output_path) else output_path
+                state, reason = classify_job(
+                    input_path, output_path, force=force_this,
+                    toolchain=tools.toolchain_stamp(input_ext, tgt_ext, available_tools),
+                    recorded_toolchain=recorded_toolchains.get(rel_output),
+                )
+            jobs.append({
+                "input_path": input_path,
+                "output_path": output_path,
+                "input_ext": input_ext,
+                "output_ext": tgt_ext,
+                "content_id": file.get("id"),
+                "forced": force_this,
+                "custom_label": file.get("export_custom_label"),
+                "state": state,
+                "reason": reason,
+            })
+    return jobs
+
+def plan_conversion_jobs(db_path=DB_PATH, force=False):
+    """
+    Build the list of conversion jobs from content x conversion_capabilities x export_types.
+    Returns (jobs, asset_staging):
+    - jobs: list of dicts {input_path, output_path, input_ext, output_ext, content_id, forced, custom_label}
+      for every output that is missing or older than its source (or forced).
+    - asset_staging: {input_path: PAGE_files dir} for every source with at least one non-HTML target.
+    """
+    jobs = []
+    asset_staging = {}
+    unavailable = {}
+    for job in enumerate_conversion_jobs(db_path, force=force):
+        input_path, output_path = job["input_path"], job["output_path"]
+        if job["state"] == "unavailable":
+            unavailable[job["reason"]] = unavailable.get(job["reason"], 0) + 1
+            continue
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        if job["output_ext"] != ".html":
+            # Assets are staged once per source per build, not once per target format
+            asset_staging[input_path] = os.path.dirname(output_path)
+        if job["state"] not in ("new", "stale"):
+            logging.info(f"[plan_conversion_jobs] Skipping {job['state']}: {input_path} -> {output_path}")
+            continue
+        logging.debug(f"[plan_conversion_jobs] Adding job: {input_path} ({job['input_ext']}) -> {output_path} ({job['output_ext']})")
+        jobs.append({k: job[k] for k in ("input_path", "output_path", "input_ext", "output_ext", "content_id", "forced", "custom_label")})
+    for reason, count in sorted(unavailable.items()):
+        logging.warning(f"[plan_conversion_jobs] Skipping {count} conversion(s): {reason}")
+    return jobs, asset_staging
+
+def _job_worker_loop(db_path, writer, worker_id, on_result, active_jobs):
+    """
+    Claim and run jobs from the conversion_jobs queue until it is empty or the run is cancelled.
+    Job state changes are posted to the writer; cancelled jobs are released back to pending.
+    The job being run is listed in active_jobs ({job id: worker id}) for the lease heartbeat.
+    """
+    conn = job_queue.connect(db_path)
+    try:
+        while not process_utils.is_cancelled():
+            job = job_queue.claim_job(conn, worker_id, JOB_LEASE_SECONDS)
+            if job is None:
+                break
+            active_jobs[job["id"]] = worker_id
+            try:
+                meta = {"content_id": job["content_id"], "forced": job["forced"], "custom_label": job["custom_label"]}
+                result = _convert_and_post(writer, meta, job["input_path"], job["output_path"], job["input_ext"], job["output_ext"], db_path)
+            finally:
+                active_jobs.pop(job["id"], None)
+            state = JOB_FINAL_STATES.get(result["status"], "failed")
+            toolchain = result["toolchain"] if state == "done" else None
+            writer.post(JobStateUpdate(job["id"], state, result["reason"], result["end_time"], toolchain))
+            on_result(result)
+    finally:
+        conn.close()
+
+def _lease_heartbeat(db_path, active_jobs, stop):
+    """
+    Renew the leases of the jobs in active_jobs every JOB_HEARTBEAT_SECONDS until stop is set.
+    """
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            conn = job_queue.connect(db_path)
+            try:
+                for job_id, worker_id in list(active_jobs.items()):
+                    job_queue.renew_lease(conn, job_id, worker_id, JOB_LEASE_SECONDS)
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logging.warning(f"[drain_job_queue] Could not renew job leases: {e}")
+
+def get_claimed_results(db_path=DB_PATH):
+    """
+    Return the jobs still claimed in the queue as result dicts with status 'claimed'
+    (another worker is running them, or they need a rerun to be reclaimed).
+    """
+    conn = job_queue.connect(db_path)
+    try:
+        claimed = job_queue.get_claimed_jobs(conn)
+    finally:
+        conn.close()
+    return [{
+        "input": job["input_path"],
+        "output": job["output_path"],
+        "status": "claimed",
+        "reason": f"still claimed by {job['lease_owner']}",
+    } for job in claimed]
+
+def drain_job_queue(db_path=DB_PATH, writer=None, max_workers=DEFAULT_WORKERS, worker_name=None, progress=None):
+    """
+    Run max_workers worker threads that cooperatively drain the conversion_jobs queue.
+    Several processes may drain the same queue at once. On Ctrl-C, in-flight tool processes
+    are terminated, their jobs are released back to pending, and KeyboardInterrupt is re-raised.
+    Each result is streamed to `progress` (a ProgressLog) as soon as it finishes.
+    Returns the list of result dicts produced by this process, followed by a 'claimed' entry
+    for each job other workers still hold when nothing is left to claim.
+    """
+    worker_name = worker_name or f"{job_queue.HOSTNAME}-{os.getpid()}"
+    own_writer = writer is None
+    if own_writer:
+        writer = DBWriter(db_path).start()
     results = []
-    with concurrent.futures.ThreadPoolExecutor() as executor:
-        future_to_job = {executor.submit(convert_file, *job): job for job in jobs}
-        for future in concurrent.futures.as_completed(future_to_job):
-            result = future.result()
-            logging.debug(f"[batch_convert_all_content] Job result: {result}")
+    results_lock = threading.Lock()
+    active_jobs = {}
+    stop_heartbeat = threading.Event()
+
+    def on_result(result):
+        logging.debug(f"[drain_job_queue] Job result: {result}")
+        with results_lock:
             results.append(result)
-    os.makedirs(BUILD_DIR, exist_ok=True)
+        if progress is not None:
+            progress.record(result)
+
+    process_utils.reset_cancellation()
+    heartbeat = threading.Thread(target=_lease_heartbeat, args=(db_path, active_jobs, stop_heartbeat), daemon=True)
+    heartbeat.start()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+    loops = [executor.submit(_job_worker_loop, db_path, writer, f"{worker_name}-{n}", on_result, active_jobs) for n in range(max_workers)]
+    try:
+        for future in concurrent.futures.as_completed(loops):
+            future.result()
+    except KeyboardInterrupt:
+        logging.warning("[drain_job_queue] Interrupted; terminating in-flight conversions and releasing their jobs.")
+        process_utils.cancel_all()
+        raise
+    finally:
+        executor.shutdown(wait=True)
+        stop_heartbeat.set()
+        heartbeat.join()
+        if own_writer:
+            writer.close()
+        else:
+            writer.flush()
+    claimed = get_claimed_results(db_path)
+    for result in claimed:
+        logging.warning(f"[drain_job_queue] Not finished: {result['output']} is {result['reason']}")
+    return results + claimed
+
+def batch_convert_all_content(db_path=DB_PATH, force=False, summary_json_path=SUMMARY_JSON, resume=True,
+                              max_workers=DEFAULT_WORKERS, progress_path=PROGRESS_NDJSON):
+    """
+    Orchestrate batch conversion of all content files.
+    - Plans jobs from enabled conversions and content files.
+    - Persists them to the conversion_jobs queue; with resume=True, an interrupted run
+      continues with its unfinished jobs only.
+    - Stages assets once per source, then drains the queue in parallel.
+    - Streams one NDJSON line per finished job to progress_path, with a live console counter.
+    - Writes the summary JSON from the stream and prints a plain text summary; jobs other
+      workers still hold are listed with status 'claimed' rather than dropped.
+    """
+    logging.info("[batch_convert_all_content] Starting batch conversion...")
+    jobs, asset_staging = plan_conversion_jobs(db_path, force=force)
+    conn = job_queue.connect(db_path)
+    try:
+        interrupted_run = job_queue.get_unfinished_run(conn) if resume else None
+        run_id = job_queue.enqueue_jobs(conn, jobs, resume=resume)
+        counts = job_queue.get_state_counts(conn, run_id)
+    finally:
+        conn.close()
+    logging.info(f"[batch_convert_all_content] Total jobs planned: {len(jobs)}; queue state for run {run_id}: {counts}")
+    remaining = counts.get("pending", 0) + counts.get("claimed", 0)
+    # A resumed run keeps the records of the jobs it already finished
+    progress = ProgressLog(progress_path, remaining, run_id=run_id, label="convert", append=run_id == interrupted_run).open()
+    # All DB writes from workers go through a single writer thread
+    writer = DBWriter(db_path).start()
+    try:
+        logging.info(f"[batch_convert_all_content] Staging assets for {len(asset_staging)} source(s)")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            stage_futures = {executor.submit(_stage_and_post, writer, src, files_dir): src for src, files_dir in asset_staging.items()}
+            for future in concurrent.futures.as_completed(stage_futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"[ASSET] Failed to stage assets for {stage_futures[future]}: {e}")
+        drain_job_queue(db_path, writer=writer, max_workers=max_workers, progress=progress)
+    except KeyboardInterrupt:
+        writer.close()
+        progress.close()
+        write_conversion_summary(latest_records(read_progress(progress_path, run_id)), summary_json_path)
+        print("  Interrupted: rerun to resume the unfinished jobs.")
+        raise
+    writer.close()
+    progress.close()
+    results = latest_records(read_progress(progress_path, run_id)) + get_claimed_results(db_path)
+    write_conversion_summary(results, summary_json_path)
+    return results
+
+def run_worker(db_path=DB_PATH, max_workers=DEFAULT_WORKERS, progress_path=PROGRESS_NDJSON):
+    """
+    Drain an existing conversion_jobs queue without planning (for extra local worker processes).
+    Results are appended to the same progress stream as the main run.
+    """
+    logging.info(f"[run_worker] Worker {os.getpid()} draining conversion_jobs with {max_workers} thread(s)")
+    conn = job_queue.connect(db_path)
+    try:
+        run_id = job_queue.get_unfinished_run(conn)
+        counts = job_queue.get_state_counts(conn, run_id) if run_id else {}
+    finally:
+        conn.close()
+    with ProgressLog(progress_path, counts.get("pending", 0), run_id=run_id, label="worker", append=True) as progress:
+        results = drain_job_queue(db_path, max_workers=max_workers, progress=progress)
+    print_conversion_summary(results)
+    return results
+
+def write_conversion_summary(results, summary_json_path=SUMMARY_JSON):
+    """
+    Write the conversion results to the summary JSON and print a plain text summary.
+    """
+    os.makedirs(os.path.dirname(summary_json_path) or BUILD_DIR, exist_ok=True)
     with open(summary_json_path, "w", encoding="utf-8") as f:
         json.dump(results, f, indent=2)
-    print("\nConversion Summary:")
\ No newline at end of file
+    print_conversion_summary(results)
+
+def print_conversion_summary(results):
+    """
+    Print per-status counts and any timed-out, cancelled or still claimed jobs.
+    """
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    print("\nConversion Summary:")
+    for status, count in sorted(counts.items()):
+        print(f"  {status}: {count}")
+    for result in results:
+        if result["status"] in ("timeout", "cancelled", "claimed"):
+            print(f"  [{result['status'].upper()}] {result['input']} -> {result['output']}")
+
+def main():
+    """
+    CLI entry point.
+        python -m oerforge.convert            plan, queue, and run all conversions (resumes an interrupted run)
+        python -m oerforge.convert --worker   join an existing run as an extra worker process
+        python -m oerforge.convert --plan     dry run: classify jobs and estimate the rebuild time
+    """
+    import argparse
+    parser = argparse.ArgumentParser(description="Batch convert content to all enabled export formats.")
+    parser.add_argument("--worker", action="store_true", help="Only drain the existing conversion_jobs queue")
+    parser.add_argument("--force", action="store_true", help="Reconvert outputs even if they are up to date")
+    parser.add_argument("--no-resume", action="store_true", help="Start a new run instead of resuming an interrupted one")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of worker threads")
+    parser.add_argument("--db", default=DB_PATH, help="Path to sqlite.db")
+    parser.add_argument("--plan", action="store_true", help="Dry run: print the job plan and cost estimate without converting")
+    parser.add_argument("--plan-json", default=None, help="Where to write the plan JSON (default: build/conversion_plan.json)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if DEBUG_MODE else logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.plan:
+        try:
+            from . import plan
+        except ImportError:
+            import plan
+        plan.run_plan(args.db, force=args.force, workers=args.workers, plan_json_path=args.plan_json or plan.PLAN_JSON)
+    elif args.worker:
+        run_worker(args.db, max_workers=args.workers)
+    else:
+        batch_convert_all_content(args.db, force=args.force, resume=not args.no_resume, max_workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,17 @@ Module to copy project content and static assets into build directories for depl
 
 Features:
 - Copies all contents of 'content/' to 'build/PAGE_files/' for each page (PAGE = base filename)
-- Copies 'static/css/' to 'build/css/' and 'static/js/' to 'build/js/'
 - Creates target directories if they do not exist
 - Overwrites files each time it is called
 - Creates 'build/.nojekyll' to prevent GitHub Pages from running Jekyll
+- Publishes build/ to docs/ with sync_tree(): a manifest of (size, mtime, sha256) per tree
+  (cache/manifests/) means only files whose stat changed are hashed; only changed files are
+  copied (in parallel, each written to a temporary file and renamed into place), files gone
+  from build/ are deleted, and the list of changed files is written for deploy tooling
+  (cache/publish_changes.json)
+- Syncs static assets and DB images into build/css, build/js and build/images the same way,
+  from one merged plan: each file is copied only if it changed, and files no longer in
+  static/ or the DB are removed
 
 Usage:
     from oerforge.copyfile import copy_project_files
@@ -14,8 +21,11 @@ Usage:
 """
 
 import os
+import json
 import shutil
+import hashlib
 import logging
+import concurrent.futures
 from oerforge import db_utils
 
 BUILD_DIR = 'build'
@@ -27,7 +37,13 @@ __all__ = [
     "copy_build_to_docs_safe",
     "ensure_dir",
     "create_nojekyll",
-    "copy_build_to_docs"
+    "copy_build_to_docs",
+    "file_sha256",
+    "copy_if_changed",
+    "sync_tree",
+    "sync_files",
+    "sync_build_to_docs",
+    "sync_assets_to_build"
 ]
 
 def get_project_root():
@@ -46,6 +62,13 @@ JS_SRC = os.path.join(PROJECT_ROOT, 'static', 'js')
 JS_DST = os.path.join(BUILD_DIR, 'js')
 NOJEKYLL_PATH = os.path.join(BUILD_DIR, '.nojekyll')
 LOG_PATH = os.path.join(PROJECT_ROOT, 'log/build.log')
+DOCS_DIR = os.path.join(PROJECT_ROOT, 'docs')
+MANIFEST_DIR = os.path.join(PROJECT_ROOT, 'cache', 'manifests')
+CHANGES_PATH = os.path.join(PROJECT_ROOT, 'cache', 'publish_changes.json')
+SYNC_WORKERS = min(16, (os.cpu_count() or 1) * 2)
+TMP_SUFFIX = '.oerforge-tmp'
+STATIC_DIR = os.path.join(PROJECT_ROOT, 'static')
+ASSET_TYPES = ('css', 'js', 'images')
 
 def ensure_dir(path):
     """
@@ -56,6 +79,29 @@ def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
 
+def file_sha256(path, chunk_size=1024 * 1024):
+    """
+    Return the hex SHA-256 digest of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def copy_if_changed(src_path, dst_path):
+    """
+    Copy src_path to dst_path unless the destination already has identical content.
+    Compares size first and only hashes both files when sizes match.
+    Returns True if the file was copied, False if it was already current.
+    """
+    if os.path.exists(dst_path) and os.path.getsize(dst_path) == os.path.getsize(src_path):
+        if file_sha256(dst_path) == file_sha256(src_path):
+            return False
+    ensure_dir(os.path.dirname(dst_path))
+    shutil.copy2(src_path, dst_path)
+    return True
+
 def create_nojekyll(path):
     """
     Create an empty .nojekyll file at the given path.
@@ -64,17 +110,187 @@ def create_nojekyll(path):
         f.write('')
     logging.info(f"Created .nojekyll at {path}")
     
+def manifest_path_for(tree, label=None):
+    """
+    Return the manifest file for a directory tree (one per absolute path and label, under cache/manifests/).
+    """
+    tree = os.path.abspath(tree)
+    key = hashlib.sha1(tree.encode('utf-8')).hexdigest()[:12]
+    suffix = f"-{label}" if label else ''
+    return os.path.join(MANIFEST_DIR, f"{os.path.basename(tree) or 'root'}-{key}{suffix}.json")
+
+def load_manifest(path):
+    """
+    Return {relative path: [size, mtime_ns, sha256]} from a manifest file ({} if missing or unreadable).
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"[SYNC] Ignoring unreadable manifest {path}: {e}")
+        return {}
+
+def write_json_atomic(path, data):
+    """
+    Write JSON to a temporary file and rename it over path.
+    """
+    ensure_dir(os.path.dirname(path))
+    tmp_path = path + TMP_SUFFIX
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def walk_tree(tree, subdirs=None):
+    """
+    Return {relative path: full path} for every file in a tree (or only in its subdirs).
+    """
+    files = {}
+    roots = [os.path.join(tree, sub) for sub in subdirs] if subdirs else [tree]
+    for top in roots:
+        if not os.path.isdir(top):
+            continue
+        for root, dirs, filenames in os.walk(top):
+            for filename in filenames:
+                if filename.endswith(TMP_SUFFIX):
+                    continue
+                full_path = os.path.join(root, filename)
+                files[os.path.relpath(full_path, tree).replace(os.sep, '/')] = full_path
+    return files
+
+def scan_files(files, manifest, executor):
+    """
+    Return the current manifest of {key: full path}. Files whose size and mtime match the
+    previous manifest keep their recorded hash; the rest are hashed on the executor.
+    """
+    current = {}
+    to_hash = []
+    for key, full_path in files.items():
+        st = os.stat(full_path)
+        previous = manifest.get(key)
+        if previous and previous[0] == st.st_size and previous[1] == st.st_mtime_ns:
+            current[key] = previous
+        else:
+            current[key] = [st.st_size, st.st_mtime_ns, None]
+            to_hash.append(key)
+    for key, digest in zip(to_hash, executor.map(lambda key: file_sha256(files[key]), to_hash)):
+        current[key][2] = digest
+    return current
+
+def scan_tree(tree, manifest, executor, subdirs=None):
+    """
+    Return the current manifest of a tree (or of its subdirs), keyed by relative path.
+    """
+    return scan_files(walk_tree(tree, subdirs), manifest, executor)
+
+def _copy_atomic(src_path, dst_path):
+    """
+    Copy src_path to a temporary file next to dst_path and rename it into place.
+    Returns the destination's (size, mtime_ns).
+    """
+    ensure_dir(os.path.dirname(dst_path))
+    tmp_path = dst_path + TMP_SUFFIX
+    shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dst_path)
+    st = os.stat(dst_path)
+    return st.st_size, st.st_mtime_ns
+
+def _apply_plan(sources, src_files, dst, dst_files, delete, executor):
+    """
+    Copy every planned file ({relative path: source path}) whose hash differs from dst's, and
+    (if delete) remove dst files that are not planned. Updates dst_files; returns (copied, deleted).
+    """
+    to_copy = sorted(rel for rel, entry in src_files.items() if rel not in dst_files or dst_files[rel][2] != entry[2])
+    to_delete = sorted(rel for rel in dst_files if rel not in src_files) if delete else []
+
+    copied = []
+    futures = {executor.submit(_copy_atomic, sources[rel], os.path.join(dst, rel)): rel for rel in to_copy}
+    for future in concurrent.futures.as_completed(futures):
+        rel = futures[future]
+        try:
+            size, mtime_ns = future.result()
+        except OSError as e:
+            logging.error(f"[SYNC] Failed to copy {rel}: {e}")
+            dst_files.pop(rel, None)
+            continue
+        dst_files[rel] = [size, mtime_ns, src_files[rel][2]]
+        copied.append(rel)
+    deleted = []
+    for rel in to_delete:
+        try:
+            os.remove(os.path.join(dst, rel))
+            deleted.append(rel)
+        except OSError as e:
+            logging.error(f"[SYNC] Failed to delete {rel}: {e}")
+            continue
+        dst_files.pop(rel, None)
+        # Remove directories left empty
+        parent = os.path.dirname(os.path.join(dst, rel))
+        while os.path.abspath(parent) != os.path.abspath(dst) and os.path.isdir(parent) and not os.listdir(parent):
+            os.rmdir(parent)
+            parent = os.path.dirname(parent)
+    return sorted(copied), deleted
+
+def sync_tree(src, dst, delete=True, workers=SYNC_WORKERS, changes_path=CHANGES_PATH):
+    """
+    Make dst an exact copy of src, copying only files whose content differs and (if delete)
+    removing files that are not in src. Both trees' manifests are kept under cache/manifests/.
+    Writes {src, dst, copied, deleted} to changes_path (if set) and returns it.
+    """
+    src_manifest_path = manifest_path_for(src)
+    dst_manifest_path = manifest_path_for(dst)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        sources = walk_tree(src)
+        src_files = scan_files(sources, load_manifest(src_manifest_path), executor)
+        dst_files = scan_tree(dst, load_manifest(dst_manifest_path), executor)
+        copied, deleted = _apply_plan(sources, src_files, dst, dst_files, delete, executor)
+
+    write_json_atomic(src_manifest_path, src_files)
+    write_json_atomic(dst_manifest_path, dst_files)
+    changes = {'src': os.path.abspath(src), 'dst': os.path.abspath(dst), 'copied': copied, 'deleted': deleted}
+    if changes_path:
+        write_json_atomic(changes_path, changes)
+    logging.info(f"[SYNC] {src} -> {dst}: {len(copied)} copied, {len(deleted)} deleted, "
+                 f"{len(src_files) - len(copied)} unchanged")
+    return changes
+
+def sync_files(sources, dst, subdirs, delete=True, workers=SYNC_WORKERS):
+    """
+    Make dst's subdirs hold exactly the planned files ({relative path: source path}), copying
+    only files whose content differs and (if delete) removing unplanned files in those subdirs;
+    the rest of dst is left alone. Source files are tracked in a manifest keyed by their full
+    path, so each is hashed once however many plans use it. Returns {dst, copied, deleted}.
+    """
+    label = '-'.join(sorted(subdirs))
+    src_manifest_path = manifest_path_for(dst, f"{label}-sources")
+    dst_manifest_path = manifest_path_for(dst, label)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        paths = {os.path.abspath(path) for path in sources.values()}
+        path_files = scan_files({path: path for path in paths}, load_manifest(src_manifest_path), executor)
+        src_files = {rel: path_files[os.path.abspath(path)] for rel, path in sources.items()}
+        dst_files = scan_tree(dst, load_manifest(dst_manifest_path), executor, subdirs)
+        copied, deleted = _apply_plan(sources, src_files, dst, dst_files, delete, executor)
+
+    write_json_atomic(src_manifest_path, path_files)
+    write_json_atomic(dst_manifest_path, dst_files)
+    logging.info(f"[SYNC] {len(sources)} planned file(s) -> {dst} ({', '.join(sorted(subdirs))}): "
+                 f"{len(copied)} copied, {len(deleted)} deleted, {len(sources) - len(copied)} unchanged")
+    return {'dst': os.path.abspath(dst), 'copied': copied, 'deleted': deleted}
+
+def sync_build_to_docs(build_dir=None, docs_dir=None, delete=True):
+    """
+    Publish build/ to docs/ with sync_tree().
+    """
+    return sync_tree(build_dir or BUILD_DIR, docs_dir or DOCS_DIR, delete=delete)
+
 def copy_build_to_docs():
     """
-    Copy everything from build/ to docs/, including .nojekyll
+    Make docs/ match build/ (including .nojekyll), copying only what changed.
     """
-    DOCS_DIR = os.path.join(PROJECT_ROOT, 'docs')
-    logging.info(f"Copying all build/ contents to docs/: {BUILD_DIR} -> {DOCS_DIR}")
-    if os.path.exists(DOCS_DIR):
-        logging.debug(f"Removing existing docs directory: {DOCS_DIR}")
-        shutil.rmtree(DOCS_DIR)
-    shutil.copytree(BUILD_DIR, DOCS_DIR)
-    logging.info(f"Copied build/ to docs/")
+    logging.info(f"Syncing build/ to docs/: {BUILD_DIR} -> {DOCS_DIR}")
+    return sync_build_to_docs()
+
 def copy_to_build(src_path, dst_dir=None):
     """
     Copy any source file to the build/files directory (or specified dst_dir).
@@ -90,71 +306,95 @@ def copy_to_build(src_path, dst_dir=None):
     return dst_path
 def copy_build_to_docs_safe():
     """
-    Non-destructively copy everything from build/ to docs/.
-    Creates docs/ if missing, copies files over themselves, does not remove docs/.
-    """
-    DOCS_DIR = os.path.join(PROJECT_ROOT, 'docs')
-    BUILD_DIR = os.path.join(PROJECT_ROOT, 'build')
-    if not os.path.exists(DOCS_DIR):
-        os.makedirs(DOCS_DIR)
-    for root, dirs, files in os.walk(BUILD_DIR):
-        rel_path = os.path.relpath(root, BUILD_DIR)
-        target_dir = os.path.join(DOCS_DIR, rel_path) if rel_path != '.' else DOCS_DIR
-        if not os.path.exists(target_dir):
-            os.makedirs(target_dir)
-        for file in files:
-            src_file = os.path.join(root, file)
-            dst_file = os.path.join(target_dir, file)
-            shutil.copy2(src_file, dst_file)
+    Non-destructively sync build/ to docs/: changed files are copied, nothing is deleted.
+    """
+    return sync_build_to_docs(delete=False)
 
-def copy_static_assets_to_build(asset_types=None):
+def plan_static_assets(asset_types=None, static_dir=None):
     """
-    Copy static assets (CSS, JS, images) from static/ to build/.
-    Extensible for new asset types.
-    """
-    if asset_types is None:
-        asset_types = ['css', 'js', 'images']
-    for asset in asset_types:
-        src = os.path.join(PROJECT_ROOT, 'static', asset)
-        dst = os.path.join(BUILD_HTML_DIR, asset)
-        if os.path.exists(dst):
-            shutil.rmtree(dst)
-        if os.path.exists(src):
-            shutil.copytree(src, dst)
-            logging.info(f"Copied {src} to {dst}")
-        else:
+    Return {build-relative path: source path} for every file in static/<asset type>/.
+    """
+    static_dir = static_dir or STATIC_DIR
+    plan = {}
+    for asset in asset_types or ASSET_TYPES:
+        src = os.path.join(static_dir, asset)
+        if not os.path.isdir(src):
             logging.warning(f"Source directory not found: {src}")
-    logging.info("[ASSET] Static assets copied to build/.")
+            continue
+        for rel, full_path in walk_tree(src).items():
+            plan[f"{asset}/{rel}"] = full_path
+    return plan
 
-def copy_db_images_to_build():
+def plan_db_images(db_path=None):
     """
-    Copy all images referenced in the DB from their source location to build/images/.
-    Only copies images where is_image=1 and is_remote=0.
+    Return {build-relative path: source path} for the local images recorded in the DB
+    (is_image=1 AND is_remote=0); each goes to images/<basename>.
     """
-    db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
     image_records = db_utils.get_records(
         'files',
         where_clause="is_image=1 AND is_remote=0",
-        db_path=db_path
+        db_path=db_path or os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
     )
-    images_dir = os.path.join(BUILD_HTML_DIR, 'images')
-    os.makedirs(images_dir, exist_ok=True)
+    plan = {}
     for rec in image_records:
         src = rec.get('absolute_path') or rec.get('relative_path')
-        if src and os.path.exists(src):
-            dst = os.path.join(images_dir, os.path.basename(src))
-            if not os.path.exists(dst):
-                shutil.copy2(src, dst)
-                logging.info(f"[DB-IMG] Copied image {src} to {dst}")
-        else:
+        if not src or not os.path.exists(src):
             logging.warning(f"[DB-IMG] Image not found for copying: {src}")
-           
+            continue
+        rel = f"images/{os.path.basename(src)}"
+        if rel in plan and os.path.abspath(plan[rel]) != os.path.abspath(src):
+            logging.warning(f"[DB-IMG] {src} and {plan[rel]} both map to {rel}; keeping {plan[rel]}")
+            continue
+        plan[rel] = src
+    return plan
+
+def plan_build_assets(asset_types=None, db_path=None, static_dir=None):
+    """
+    Merge static assets and DB images into one plan. A DB image whose build path is already
+    taken by a static file is skipped (static files win, as they did when copied first).
+    """
+    plan = plan_static_assets(asset_types, static_dir)
+    for rel, src in plan_db_images(db_path).items():
+        if rel in plan:
+            if os.path.abspath(plan[rel]) != os.path.abspath(src):
+                logging.warning(f"[DB-IMG] {src} is shadowed by static asset {plan[rel]}")
+            continue
+        plan[rel] = src
+    return plan
+
+def sync_assets_to_build(asset_types=None, db_path=None, build_dir=None, static_dir=None):
+    """
+    Bring build/css, build/js and build/images up to date from static/ and the DB's images in
+    one pass: only changed files are copied, and files no longer in either source are removed.
+    DB images always go to images/, so static/images is always part of the plan (otherwise
+    its files would be removed from build/images as orphans).
+    """
+    subdirs = sorted(set(asset_types or ASSET_TYPES) | {'images'})
+    plan = plan_build_assets(subdirs, db_path, static_dir)
+    changes = sync_files(plan, build_dir or BUILD_HTML_DIR, subdirs)
+    logging.info("[ASSET] Static assets and DB images synced to build/.")
+    return changes
+
+def copy_static_assets_to_build(asset_types=None):
+    """
+    Sync static assets (CSS, JS, images) from static/ to build/.
+    DB images are part of the same plan, so they are not removed as orphans.
+    """
+    return sync_assets_to_build(asset_types)
+
+def copy_db_images_to_build():
+    """
+    Copy all images referenced in the DB from their source location to build/images/.
+    Only copies images where is_image=1 and is_remote=0, and only if they changed.
+    """
+    return sync_files(plan_db_images(), BUILD_HTML_DIR, ['images'], delete=False)
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Copy project files and assets for deployment.")
     parser.add_argument("--copy-to-build", metavar="SRC_PATH", help="Copy a file to build/files/")
-    parser.add_argument("--copy-build-to-docs", action="store_true", help="Copy build/ to docs/ (destructive)")
+    parser.add_argument("--copy-build-to-docs", action="store_true", help="Sync build/ to docs/ (deletes files not in build/)")
     parser.add_argument("--copy-build-to-docs-safe", action="store_true", help="Copy build/ to docs/ (non-destructive)")
     parser.add_argument("--create-nojekyll", action="store_true", help="Create .nojekyll in build/")
     args = parser.parse_args()
@@ -163,11 +403,11 @@ if __name__ == "__main__":
         result = copy_to_build(args.copy_to_build)
         print(f"Copied to: {result}")
     if args.copy_build_to_docs:
-        copy_build_to_docs()
-        print("Copied build/ to docs/ (destructive)")
+        changes = copy_build_to_docs()
+        print(f"Synced build/ to docs/: {len(changes['copied'])} copied, {len(changes['deleted'])} deleted (list in {CHANGES_PATH})")
     if args.copy_build_to_docs_safe:
-        copy_build_to_docs_safe()
-        print("Copied build/ to docs/ (non-destructive)")
+        changes = copy_build_to_docs_safe()
+        print(f"Synced build/ to docs/ (non-destructive): {len(changes['copied'])} copied (list in {CHANGES_PATH})")
     if args.create_nojekyll:
         create_nojekyll(NOJEKYLL_PATH)
         print(f"Created .nojekyll at {NOJEKYLL_PATH}")
\ No newline at end of file
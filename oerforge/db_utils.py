@@ -46,10 +46,14 @@ def db_log(message, level=logging.INFO):
 def drop_tables(cursor):
     """
     Drop all tables for a clean DB initialization.
+    conversion_jobs, accessibility_results and accessibility_issues are kept across builds (an
+    interrupted conversion resumes; unchanged pages are not re-checked with Pa11y; issues can be
+    reported across builds). Stored results are reattached to the rescanned content by
+    relink_accessibility_results().
     """
     tables = [
         "files", "pages_files", "content", "site_info",
-        "conversion_capabilities", "conversion_results", "accessibility_results"
+        "conversion_capabilities", "conversion_results"
     ]
     for table in tables:
         cursor.execute(f"DROP TABLE IF EXISTS {table}")
@@ -72,31 +76,15 @@ def create_tables(cursor):
         forced BOOLEAN,
         custom_label TEXT,
         created_at TEXT,
+        toolchain TEXT,
         FOREIGN KEY(content_id) REFERENCES content(id)
     )
     """)
+    # One row per output: a re-conversion replaces the earlier result (see DBWriter)
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_conversion_results_output ON conversion_results(content_id, target_format)")
     db_log("Created table: conversion_results")
 
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS accessibility_results (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        content_id INTEGER NOT NULL,
-        pa11y_json TEXT,
-        badge_html TEXT,
-        wcag_level TEXT,
-        error_count INTEGER,
-        warning_count INTEGER,
-        notice_count INTEGER,
-        checked_at TEXT,
-        status TEXT,
-        reason TEXT,
-        custom_label TEXT,
-        forced BOOLEAN,
-        created_at TEXT,
-        FOREIGN KEY(content_id) REFERENCES content(id)
-    )
-    """)
-    db_log("Created table: accessibility_results")
+    create_accessibility_tables(cursor)
 
     cursor.execute("""
     CREATE TABLE IF NOT EXISTS files (
@@ -155,9 +143,11 @@ def create_tables(cursor):
         export_force INTEGER DEFAULT 0,
         export_custom_label TEXT DEFAULT NULL,
         export_output_path TEXT DEFAULT NULL,
-        in_toc BOOLEAN DEFAULT 0
+        in_toc BOOLEAN DEFAULT 0,
+        canonical_path TEXT DEFAULT NULL
     )
     """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_content_canonical_path ON content(canonical_path)")
     db_log("Created table: content")
 
     cursor.execute("""
@@ -190,6 +180,94 @@ def create_tables(cursor):
     """)
     db_log("Created table: conversion_capabilities")
 
+    create_conversion_jobs_table(cursor)
+
+def create_accessibility_tables(cursor):
+    """
+    Create accessibility_results (one row per page and WCAG level; pa11y_json may be
+    zlib-compressed) and accessibility_issues (one row per Pa11y issue).
+    accessibility_results.canonical_path records the page a result belongs to, since
+    content ids change whenever the content table is rebuilt.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS accessibility_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_id INTEGER NOT NULL,
+        pa11y_json TEXT,
+        badge_html TEXT,
+        wcag_level TEXT,
+        error_count INTEGER,
+        warning_count INTEGER,
+        notice_count INTEGER,
+        checked_at TEXT,
+        status TEXT,
+        reason TEXT,
+        custom_label TEXT,
+        forced BOOLEAN,
+        created_at TEXT,
+        html_hash TEXT,
+        config_hash TEXT,
+        canonical_path TEXT,
+        FOREIGN KEY(content_id) REFERENCES content(id)
+    )
+    """)
+    db_log("Created table: accessibility_results")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_accessibility_results_page ON accessibility_results(content_id, wcag_level)")
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS accessibility_issues (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        content_id INTEGER NOT NULL,
+        wcag_level TEXT NOT NULL,
+        type TEXT,
+        code TEXT,
+        message TEXT,
+        context TEXT,
+        selector TEXT,
+        runner TEXT,
+        FOREIGN KEY(content_id) REFERENCES content(id)
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_accessibility_issues_page ON accessibility_issues(content_id, wcag_level)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_accessibility_issues_code ON accessibility_issues(code)")
+    db_log("Created table: accessibility_issues")
+
+def create_conversion_jobs_table(cursor):
+    """
+    Create the persistent conversion job queue.
+    Not dropped by initialize_database, so an interrupted run can be resumed and each output
+    keeps the toolchain of its last successful conversion (a change marks it stale).
+    state is one of: pending, claimed, done, failed.
+    """
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS conversion_jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        run_id TEXT NOT NULL,
+        input_path TEXT NOT NULL,
+        output_path TEXT NOT NULL UNIQUE,
+        input_ext TEXT NOT NULL,
+        output_ext TEXT NOT NULL,
+        content_id INTEGER,
+        forced BOOLEAN DEFAULT 0,
+        custom_label TEXT,
+        input_mtime REAL,
+        state TEXT NOT NULL DEFAULT 'pending',
+        lease_owner TEXT,
+        lease_expires REAL,
+        attempts INTEGER DEFAULT 0,
+        reason TEXT,
+        created_at TEXT,
+        updated_at TEXT,
+        toolchain TEXT
+    )
+    """)
+    cursor.execute("PRAGMA table_info(conversion_jobs)")
+    if "toolchain" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE conversion_jobs ADD COLUMN toolchain TEXT")
+        db_log("Added column 'toolchain' to conversion_jobs")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_conversion_jobs_state ON conversion_jobs(state, lease_expires)")
+    db_log("Created table: conversion_jobs")
+
 def insert_default_conversion_capabilities(cursor):
     """
     Insert default conversion capabilities if table is empty.
@@ -239,7 +317,10 @@ def initialize_database(db_path=None):
 def migrate_database(db_path=None):
     """
     Run schema migration for existing database.
-    Adds missing columns to conversion_results and accessibility_results.
+    Adds missing columns to conversion_results, accessibility_results and content,
+    backfills content.canonical_path, adds the accessibility_issues table, and adds the
+    unique (content_id, target_format) index on conversion_results and (content_id, wcag_level)
+    index on accessibility_results, keeping the newest row of any duplicates.
     """
     if db_path is None:
         db_dir = os.path.join(PROJECT_ROOT, 'db')
@@ -251,27 +332,152 @@ def migrate_database(db_path=None):
             ("reason", "TEXT"),
             ("forced", "BOOLEAN"),
             ("custom_label", "TEXT"),
-            ("created_at", "TEXT")
+            ("created_at", "TEXT"),
+            ("toolchain", "TEXT")
         ],
         "accessibility_results": [
+            ("wcag_level", "TEXT"),
             ("status", "TEXT"),
             ("reason", "TEXT"),
             ("custom_label", "TEXT"),
             ("forced", "BOOLEAN"),
-            ("created_at", "TEXT")
+            ("created_at", "TEXT"),
+            ("html_hash", "TEXT"),
+            ("config_hash", "TEXT"),
+            ("canonical_path", "TEXT")
+        ],
+        "content": [
+            ("canonical_path", "TEXT")
         ]
     }
     for table, columns in migrations.items():
         cursor.execute(f"PRAGMA table_info({table})")
         existing = {row[1] for row in cursor.fetchall()}
+        if not existing:
+            continue  # table not created yet; create_tables adds the full schema
         for col, coltype in columns:
             if col not in existing:
                 cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col} {coltype}")
                 db_log(f"Added column '{col}' to {table}")
+    cursor.execute("PRAGMA table_info(conversion_results)")
+    if 'target_format' in {row[1] for row in cursor.fetchall()}:
+        # Keep only the latest result per output so the unique index can be created
+        cursor.execute("""
+            DELETE FROM conversion_results WHERE id NOT IN (
+                SELECT MAX(id) FROM conversion_results GROUP BY content_id, target_format
+            )
+        """)
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_conversion_results_output ON conversion_results(content_id, target_format)")
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='accessibility_results'")
+    if cursor.fetchone() is not None:
+        # Keep only the latest result per page and level so the unique index can be created
+        cursor.execute("""
+            DELETE FROM accessibility_results WHERE id NOT IN (
+                SELECT MAX(id) FROM accessibility_results GROUP BY content_id, wcag_level
+            )
+        """)
+        create_accessibility_tables(cursor)
+    cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='content'")
+    if cursor.fetchone() is not None:
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_content_canonical_path ON content(canonical_path)")
+        refresh_canonical_paths(conn)
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='accessibility_results'")
+        if cursor.fetchone() is not None:
+            cursor.execute("""
+                UPDATE accessibility_results SET canonical_path = (
+                    SELECT canonical_path FROM content WHERE content.id = accessibility_results.content_id
+                ) WHERE canonical_path IS NULL
+            """)
     conn.commit()
     conn.close()
     db_log("Closed DB connection after migration.")
 
+# --- Canonical Output Paths ---
+
+def canonical_build_path(path, build_dir='build'):
+    """
+    Normalize an output path to the canonical form stored in content.canonical_path:
+    POSIX-style, relative to build/, without './' or a leading 'build/'.
+    Accepts paths relative to build/, relative to the project ('build/...'), or absolute
+    paths under build_dir. Returns None for empty paths and absolute paths outside build_dir.
+    """
+    if not path:
+        return None
+    if os.path.isabs(path):
+        rel = os.path.relpath(os.path.normpath(path), os.path.abspath(build_dir))
+        if rel == os.pardir or rel.startswith(os.pardir + os.sep):
+            return None
+    else:
+        rel = os.path.normpath(path.replace('\\', '/'))
+        build_prefix = os.path.basename(os.path.normpath(build_dir))
+        if rel == build_prefix or rel.startswith(build_prefix + os.sep):
+            rel = os.path.relpath(rel, build_prefix)
+    return rel.replace(os.sep, '/')
+
+def refresh_canonical_paths(conn, build_dir='build'):
+    """
+    Fill content.canonical_path for rows that lack it or whose output_path changed. Returns rows updated.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, output_path, canonical_path FROM content")
+    updates = []
+    for content_id, output_path, canonical_path in cursor.fetchall():
+        canonical = canonical_build_path(output_path, build_dir)
+        if canonical != canonical_path:
+            updates.append((canonical, content_id))
+    if updates:
+        cursor.executemany("UPDATE content SET canonical_path=? WHERE id=?", updates)
+        conn.commit()
+    return len(updates)
+
+def relink_accessibility_results(conn):
+    """
+    Point stored accessibility_results and their accessibility_issues at the current content
+    ids, matching them by canonical_path (content is rebuilt, with new ids, on every scan).
+    Results and issues whose page is gone are deleted. Returns the number of pages relinked.
+    """
+    cursor = conn.cursor()
+    try:
+        stored = cursor.execute("""
+            SELECT content_id, canonical_path FROM accessibility_results
+            GROUP BY content_id, canonical_path ORDER BY MAX(id) DESC
+        """).fetchall()
+    except sqlite3.OperationalError:
+        return 0
+    current = {}
+    for content_id, canonical in cursor.execute("SELECT id, canonical_path FROM content WHERE canonical_path IS NOT NULL ORDER BY id"):
+        current.setdefault(canonical, content_id)
+    moves = []
+    taken = set()
+    for old_id, canonical in stored:
+        new_id = current.get(canonical)
+        # The newest results win if two stored pages now map to the same content row
+        if new_id is not None and new_id not in taken:
+            taken.add(new_id)
+            moves.append((new_id, old_id, canonical))
+    if len(moves) == len(stored) and all(new_id == old_id for new_id, old_id, _ in moves):
+        return 0
+    # Negate first so moving ids around never collides on the (content_id, wcag_level) index
+    cursor.execute("UPDATE accessibility_results SET content_id = -content_id")
+    cursor.execute("UPDATE accessibility_issues SET content_id = -content_id")
+    cursor.executemany(
+        "UPDATE accessibility_results SET content_id = ? WHERE content_id = ? AND canonical_path IS ?",
+        [(new_id, -old_id, canonical) for new_id, old_id, canonical in moves]
+    )
+    issue_moves = {}
+    for new_id, old_id, _ in moves:
+        issue_moves.setdefault(old_id, new_id)
+    cursor.executemany(
+        "UPDATE accessibility_issues SET content_id = ? WHERE content_id = ?",
+        [(new_id, -old_id) for old_id, new_id in issue_moves.items()]
+    )
+    cursor.execute("DELETE FROM accessibility_results WHERE content_id < 0")
+    cursor.execute("DELETE FROM accessibility_issues WHERE content_id < 0")
+    conn.commit()
+    relinked = sum(1 for new_id, old_id, _ in moves if new_id != old_id)
+    db_log(f"Relinked accessibility results of {relinked} page(s); dropped {len(stored) - len(moves)} stale page(s)")
+    return relinked
+
 # --- General Purpose DB Functions ---
 
 def get_db_connection(db_path=None):
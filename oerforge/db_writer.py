@@ -0,0 +1,259 @@
+"""
+db_writer.py
+------------
+Single-Writer Database Queue
+
+Worker threads never write to SQLite directly. They post typed write intents to a DBWriter,
+whose dedicated thread owns the only write connection and commits the intents in order,
+coalesced into large transactions (flushed every `flush_interval` seconds or every
+`max_batch` intents, whichever comes first). If a batch fails, its intents are retried one
+at a time so that only the failing intents are lost.
+
+Write intents:
+    - AssetPathUpdate: rewrite files.relative_path / pages_files.page_path after asset staging
+    - ConversionResult: upsert the conversion_results row for a (content_id, target_format) pair
+    - PagesFileLink: insert a pages_files row linking a file to a page
+    - JobStateUpdate: record the final state of a conversion_jobs row (and, on success, the
+      toolchain that built its output) and release its lease
+    - AccessibilityResult: upsert a page's accessibility_results row and replace its accessibility_issues
+
+Usage:
+    with DBWriter(db_path) as writer:
+        writer.post(AssetPathUpdate('img.png', 'about_files/img.png'))
+    # all intents are committed when the block exits
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+import logging
+from collections import namedtuple
+
+# --- Write intents ---
+AssetPathUpdate = namedtuple('AssetPathUpdate', ['old_path', 'new_path'])
+ConversionResult = namedtuple('ConversionResult', [
+    'content_id', 'source_format', 'target_format', 'output_path',
+    'conversion_time', 'status', 'reason', 'forced', 'custom_label', 'created_at', 'toolchain'
+], defaults=(None,))
+PagesFileLink = namedtuple('PagesFileLink', ['file_id', 'page_path'])
+JobStateUpdate = namedtuple('JobStateUpdate', ['job_id', 'state', 'reason', 'updated_at', 'toolchain'], defaults=(None,))
+# issues: list of (type, code, message, context, selector, runner) tuples
+AccessibilityResult = namedtuple('AccessibilityResult', [
+    'content_id', 'wcag_level', 'pa11y_json', 'badge_html', 'error_count', 'warning_count',
+    'notice_count', 'html_hash', 'config_hash', 'issues'
+])
+
+# --- Control messages (internal) ---
+_Flush = namedtuple('_Flush', ['event'])
+_STOP = object()
+
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_BATCH = 500
+DEFAULT_QUEUE_SIZE = 10000
+
+def _write_asset_path_updates(cursor, intents):
+    cursor.executemany(
+        "UPDATE files SET relative_path=? WHERE relative_path=?",
+        [(i.new_path, i.old_path) for i in intents]
+    )
+    cursor.executemany(
+        "UPDATE pages_files SET page_path=? WHERE page_path=?",
+        [(i.new_path, i.old_path) for i in intents]
+    )
+
+def _write_conversion_results(cursor, intents):
+    cursor.executemany(
+        """INSERT INTO conversion_results (
+            content_id, source_format, target_format, output_path, conversion_time,
+            status, reason, forced, custom_label, created_at, toolchain
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(content_id, target_format) DO UPDATE SET
+            source_format=excluded.source_format, output_path=excluded.output_path,
+            conversion_time=excluded.conversion_time, status=excluded.status, reason=excluded.reason,
+            forced=excluded.forced, custom_label=excluded.custom_label, created_at=excluded.created_at,
+            toolchain=excluded.toolchain""",
+        [tuple(i) for i in intents]
+    )
+
+def _write_pages_file_links(cursor, intents):
+    cursor.executemany(
+        "INSERT INTO pages_files (file_id, page_path) VALUES (?, ?)",
+        [tuple(i) for i in intents]
+    )
+
+def _write_job_state_updates(cursor, intents):
+    cursor.executemany(
+        "UPDATE conversion_jobs SET state=?, reason=?, lease_owner=NULL, lease_expires=NULL, updated_at=?, "
+        "toolchain=COALESCE(?, toolchain) WHERE id=?",
+        [(i.state, i.reason, i.updated_at, i.toolchain, i.job_id) for i in intents]
+    )
+
+def _write_accessibility_results(cursor, intents):
+    cursor.executemany(
+        """INSERT INTO accessibility_results (
+            content_id, wcag_level, pa11y_json, badge_html, error_count, warning_count,
+            notice_count, html_hash, config_hash, checked_at, canonical_path
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, datetime('now'), (SELECT canonical_path FROM content WHERE id = ?))
+        ON CONFLICT(content_id, wcag_level) DO UPDATE SET
+            pa11y_json=excluded.pa11y_json, badge_html=excluded.badge_html,
+            error_count=excluded.error_count, warning_count=excluded.warning_count,
+            notice_count=excluded.notice_count, html_hash=excluded.html_hash,
+            config_hash=excluded.config_hash, checked_at=excluded.checked_at,
+            canonical_path=excluded.canonical_path""",
+        [tuple(i)[:-1] + (i.content_id,) for i in intents]
+    )
+    # A page posted twice in one batch keeps only its latest issues
+    latest = {(i.content_id, i.wcag_level): i for i in intents}
+    cursor.executemany(
+        "DELETE FROM accessibility_issues WHERE content_id=? AND wcag_level=?",
+        list(latest)
+    )
+    cursor.executemany(
+        """INSERT INTO accessibility_issues (
+            content_id, wcag_level, type, code, message, context, selector, runner
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+        [key + tuple(issue) for key, i in latest.items() for issue in i.issues]
+    )
+
+INTENT_HANDLERS = {
+    AssetPathUpdate: _write_asset_path_updates,
+    ConversionResult: _write_conversion_results,
+    PagesFileLink: _write_pages_file_links,
+    JobStateUpdate: _write_job_state_updates,
+    AccessibilityResult: _write_accessibility_results,
+}
+
+class DBWriter:
+    """
+    Dedicated database writer thread fed by a bounded queue.
+    post() is thread-safe and blocks only when the queue is full (backpressure).
+    flush() blocks until every intent posted before it is committed.
+    """
+
+    def __init__(self, db_path, flush_interval=DEFAULT_FLUSH_INTERVAL, max_batch=DEFAULT_MAX_BATCH, queue_size=DEFAULT_QUEUE_SIZE):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self.committed = 0
+        self.errors = 0
+
+    def start(self):
+        """
+        Start the writer thread. Returns self.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="oerforge-db-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def post(self, intent):
+        """
+        Queue a write intent (one of the namedtuples in INTENT_HANDLERS).
+        """
+        if type(intent) not in INTENT_HANDLERS:
+            raise TypeError(f"Unsupported write intent: {type(intent).__name__}")
+        self._queue.put(intent)
+
+    def post_many(self, intents):
+        """
+        Queue several write intents in order.
+        """
+        for intent in intents:
+            self.post(intent)
+
+    def flush(self, timeout=None):
+        """
+        Block until all intents posted so far are committed. Returns True on success.
+        """
+        event = threading.Event()
+        self._queue.put(_Flush(event))
+        return event.wait(timeout)
+
+    def close(self):
+        """
+        Commit everything still queued and stop the writer thread.
+        """
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._thread = None
+        logging.info(f"[DBWriter] Closed: {self.committed} intent(s) committed, {self.errors} failed.")
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _commit(self, conn, batch):
+        """
+        Write one batch in a single transaction, preserving order and grouping
+        consecutive intents of the same type into one executemany. If the batch fails,
+        retry its intents one at a time so one bad intent does not lose the others.
+        """
+        if not batch:
+            return
+        cursor = conn.cursor()
+        try:
+            run = [batch[0]]
+            for intent in batch[1:]:
+                if type(intent) is type(run[0]):
+                    run.append(intent)
+                    continue
+                INTENT_HANDLERS[type(run[0])](cursor, run)
+                run = [intent]
+            INTENT_HANDLERS[type(run[0])](cursor, run)
+            conn.commit()
+            self.committed += len(batch)
+            return
+        except Exception as e:
+            conn.rollback()
+            logging.warning(f"[DBWriter] Batch of {len(batch)} intent(s) failed ({e}); retrying one at a time.")
+        for intent in batch:
+            try:
+                INTENT_HANDLERS[type(intent)](cursor, [intent])
+                conn.commit()
+                self.committed += 1
+            except Exception as e:
+                conn.rollback()
+                self.errors += 1
+                logging.error(f"[DBWriter] Failed to write {intent!r}: {e}")
+
+    def _run(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA busy_timeout = 30000")
+        batch = []
+        waiters = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+                if item is _STOP:
+                    break
+                if isinstance(item, _Flush):
+                    waiters.append(item.event)
+                elif item is not None:
+                    batch.append(item)
+                    if deadline is None:
+                        deadline = time.monotonic() + self.flush_interval
+                if item is None or waiters or len(batch) >= self.max_batch:
+                    self._commit(conn, batch)
+                    batch = []
+                    deadline = None
+                    for event in waiters:
+                        event.set()
+                    waiters = []
+        finally:
+            self._commit(conn, batch)
+            for event in waiters:
+                event.set()
+            conn.close()
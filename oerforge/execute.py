@@ -0,0 +1,269 @@
+"""
+execute.py
+----------
+Cached Notebook Execution
+
+Optional execute-on-build stage for the .ipynb sources listed in `_content.yml`. Each notebook
+is executed with a local Jupyter kernel (nbclient) and its code cell outputs are cached under
+cache/notebooks/, keyed by a hash of the code cells and the kernel spec. Editing prose in
+Markdown cells does not trigger re-execution; editing code does.
+
+Notebooks run across a bounded pool of kernels. Each execution runs in a child process under
+process_utils.run_tool, so a notebook that exceeds its timeout is killed without stalling the
+build. Cached outputs are registered in the files table as is_code_generated rows, and are
+merged into the notebook at render time (notebook.render_notebook_file).
+
+Enable in _content.yml:
+    execute:
+      enabled: true
+      kernels: 4          # parallel kernels
+      timeout: 600        # seconds per notebook
+      cell_timeout: 120   # seconds per cell
+
+Usage:
+    python -m oerforge.execute [--force]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import subprocess
+import concurrent.futures
+from datetime import datetime
+import yaml
+
+try:
+    from . import process_utils
+    from .db_utils import get_db_connection
+except ImportError:
+    import process_utils
+    from db_utils import get_db_connection
+
+# --- Constants ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DB_PATH = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'notebooks')
+CONTENT_YML = os.path.join(PROJECT_ROOT, '_content.yml')
+DEFAULT_KERNELS = min(4, os.cpu_count() or 1)
+DEFAULT_NOTEBOOK_TIMEOUT = 600
+DEFAULT_CELL_TIMEOUT = 120
+
+def _source_text(source):
+    return ''.join(source) if isinstance(source, list) else (source or '')
+
+def code_cells(nb):
+    """
+    Return the notebook's code cells in order.
+    """
+    return [cell for cell in nb.get('cells', []) if cell.get('cell_type') == 'code']
+
+def execution_key(nb):
+    """
+    Return the cache key for a notebook's outputs: hash of its code cells and kernel spec.
+    """
+    kernelspec = nb.get('metadata', {}).get('kernelspec', {})
+    digest = hashlib.sha256()
+    digest.update(json.dumps([kernelspec.get('name', ''), kernelspec.get('language', '')]).encode('utf-8'))
+    for cell in code_cells(nb):
+        digest.update(b'\0' + _source_text(cell.get('source')).encode('utf-8'))
+    return digest.hexdigest()
+
+def cache_path_for_key(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"{key}.json")
+
+def load_cached_outputs(nb, cache_dir=None):
+    """
+    Return the cached execution record for this notebook's code, or None.
+    """
+    path = cache_path_for_key(execution_key(nb), cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logging.warning(f"[EXECUTE] Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+def apply_cached_outputs(nb, record):
+    """
+    Replace the notebook's code cell outputs with the cached ones (in place). Returns nb.
+    """
+    cells = code_cells(nb)
+    if len(cells) != len(record.get('outputs', [])):
+        logging.warning("[EXECUTE] Cached outputs do not match the notebook's code cells; keeping stored outputs.")
+        return nb
+    for cell, outputs, count in zip(cells, record['outputs'], record.get('execution_counts', [None] * len(cells))):
+        cell['outputs'] = outputs
+        cell['execution_count'] = count
+    return nb
+
+def execute_notebook_file(source_path, cache_file, cell_timeout=DEFAULT_CELL_TIMEOUT):
+    """
+    Execute one notebook with nbclient and write its code cell outputs to cache_file.
+    Runs in the child process started by execute_notebooks(); the working directory
+    is the notebook's own directory, as in Jupyter.
+    """
+    import nbformat
+    from nbclient import NotebookClient
+    nb = nbformat.read(source_path, as_version=4)
+    kernel_name = nb.metadata.get('kernelspec', {}).get('name', 'python3')
+    client = NotebookClient(
+        nb, timeout=cell_timeout, kernel_name=kernel_name,
+        resources={'metadata': {'path': os.path.dirname(os.path.abspath(source_path))}}
+    )
+    client.execute()
+    cells = code_cells(nb)
+    record = {
+        'source': source_path,
+        'key': execution_key(nb),
+        'kernel': kernel_name,
+        'executed_at': datetime.now().isoformat(),
+        'outputs': [cell.get('outputs', []) for cell in cells],
+        'execution_counts': [cell.get('execution_count') for cell in cells],
+    }
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    tmp_path = cache_file + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+    os.replace(tmp_path, cache_file)
+
+def _execute_in_child(source_path, cache_file, timeout, cell_timeout):
+    """
+    Execute a notebook in a child process; returns (status, reason, duration).
+    """
+    start = time.monotonic()
+    cmd = [sys.executable, "-m", "oerforge.execute", "--run-one", source_path, cache_file, "--cell-timeout", str(cell_timeout)]
+    try:
+        process_utils.run_tool(cmd, timeout=timeout, retries=0, cwd=PROJECT_ROOT)
+        return 'executed', None, time.monotonic() - start
+    except subprocess.TimeoutExpired:
+        return 'timeout', f"Timed out after {timeout}s", time.monotonic() - start
+    except subprocess.CalledProcessError as e:
+        lines = (e.stderr or '').strip().splitlines()
+        return 'failed', lines[-1] if lines else str(e), time.monotonic() - start
+
+def collect_toc_notebooks(toc, root_dir=PROJECT_ROOT):
+    """
+    Return absolute paths of the .ipynb files listed in the TOC, in TOC order.
+    """
+    notebooks = []
+    for item in toc:
+        file_path = item.get('file')
+        if isinstance(file_path, str) and file_path.endswith('.ipynb'):
+            source_path = file_path if file_path.startswith('content/') else f'content/{file_path}'
+            notebooks.append(os.path.join(root_dir, source_path))
+        if item.get('children'):
+            notebooks.extend(collect_toc_notebooks(item['children'], root_dir))
+    return notebooks
+
+def register_execution_files(records, db_path=DB_PATH, root_dir=PROJECT_ROOT):
+    """
+    Record each notebook's cached outputs as an is_code_generated row in the files table,
+    replacing any earlier row for the same notebook.
+    """
+    if not records:
+        return
+    conn = get_db_connection(db_path)
+    try:
+        cursor = conn.cursor()
+        pages = [(os.path.relpath(r['source'], root_dir),) for r in records]
+        cursor.executemany("DELETE FROM files WHERE is_code_generated=1 AND referenced_page=?", pages)
+        cursor.executemany("""
+            INSERT INTO files (filename, extension, mime_type, is_image, is_remote, referenced_page,
+                               relative_path, absolute_path, cell_type, is_code_generated, has_local_copy)
+            VALUES (?, '.json', 'application/json', 0, 0, ?, ?, ?, 'code', 1, 1)
+        """, [(
+            os.path.basename(r['cache_file']),
+            os.path.relpath(r['source'], root_dir),
+            os.path.relpath(r['cache_file'], root_dir),
+            r['cache_file'],
+        ) for r in records])
+        conn.commit()
+    finally:
+        conn.close()
+
+def execute_notebooks(notebooks, db_path=DB_PATH, kernels=DEFAULT_KERNELS, timeout=DEFAULT_NOTEBOOK_TIMEOUT,
+                      cell_timeout=DEFAULT_CELL_TIMEOUT, force=False, cache_dir=None):
+    """
+    Execute notebooks whose code changed since their last cached run, across a pool of `kernels`.
+    Returns a list of dicts: {source, cache_file, status, reason, duration};
+    status is one of: cached, executed, failed, timeout, missing.
+    """
+    results = []
+    to_run = []
+    for source_path in notebooks:
+        if not os.path.exists(source_path):
+            logging.warning(f"[EXECUTE] Notebook not found: {source_path}")
+            results.append({'source': source_path, 'cache_file': None, 'status': 'missing', 'reason': 'not found', 'duration': 0})
+            continue
+        try:
+            with open(source_path, 'r', encoding='utf-8') as f:
+                nb = json.load(f)
+            cache_file = cache_path_for_key(execution_key(nb), cache_dir)
+        except (ValueError, OSError, AttributeError, TypeError) as e:
+            # Malformed JSON, unreadable file, or JSON that is not a notebook
+            logging.error(f"[EXECUTE] Cannot read notebook {source_path}: {e}")
+            results.append({'source': source_path, 'cache_file': None, 'status': 'failed', 'reason': f"unreadable notebook: {e}", 'duration': 0})
+            continue
+        if not force and os.path.exists(cache_file):
+            results.append({'source': source_path, 'cache_file': cache_file, 'status': 'cached', 'reason': None, 'duration': 0})
+        else:
+            to_run.append((source_path, cache_file))
+    logging.info(f"[EXECUTE] {len(to_run)} notebook(s) to execute, {len(results)} cached, missing or unreadable, {kernels} kernel(s)")
+    if to_run:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=kernels) as executor:
+            futures = {
+                executor.submit(_execute_in_child, source_path, cache_file, timeout, cell_timeout): (source_path, cache_file)
+                for source_path, cache_file in to_run
+            }
+            for future in concurrent.futures.as_completed(futures):
+                source_path, cache_file = futures[future]
+                status, reason, duration = future.result()
+                level = logging.INFO if status == 'executed' else logging.ERROR
+                logging.log(level, f"[EXECUTE] {source_path}: {status} in {duration:.1f}s" + (f" ({reason})" if reason else ""))
+                results.append({'source': source_path, 'cache_file': cache_file, 'status': status, 'reason': reason, 'duration': round(duration, 3)})
+    register_execution_files([r for r in results if r['status'] in ('cached', 'executed')], db_path)
+    return results
+
+def execute_course_notebooks(config_path=CONTENT_YML, db_path=DB_PATH, force=False):
+    """
+    Run the execute stage if enabled in _content.yml (`execute: enabled: true`).
+    Returns the list of per-notebook results (empty when disabled).
+    """
+    with open(config_path, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    settings = config.get('execute', {}) or {}
+    if not settings.get('enabled', False):
+        logging.info("[EXECUTE] Notebook execution disabled; using stored outputs.")
+        return []
+    try:
+        import nbclient  # noqa: F401
+    except ImportError:
+        logging.error("nbclient is not installed. Run 'pip install nbclient' to execute notebooks on build.")
+        return []
+    notebooks = collect_toc_notebooks(config.get('toc', []), os.path.dirname(os.path.abspath(config_path)))
+    return execute_notebooks(
+        notebooks, db_path=db_path,
+        kernels=settings.get('kernels', DEFAULT_KERNELS),
+        timeout=settings.get('timeout', DEFAULT_NOTEBOOK_TIMEOUT),
+        cell_timeout=settings.get('cell_timeout', DEFAULT_CELL_TIMEOUT),
+        force=force,
+    )
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Execute course notebooks and cache their outputs.")
+    parser.add_argument("--force", action="store_true", help="Re-execute notebooks even if cached")
+    parser.add_argument("--run-one", nargs=2, metavar=("SOURCE", "CACHE_FILE"), help=argparse.SUPPRESS)
+    parser.add_argument("--cell-timeout", type=int, default=DEFAULT_CELL_TIMEOUT, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.run_one:
+        execute_notebook_file(args.run_one[0], args.run_one[1], args.cell_timeout)
+    else:
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+        for r in execute_course_notebooks(force=args.force):
+            print(f"{r['status']:>9}  {r['source']}" + (f"  ({r['reason']})" if r['reason'] else ""))
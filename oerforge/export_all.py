@@ -1,21 +1,35 @@
 """
 export_all.py
 
-Batch export orchestrator for converting Markdown files to DOCX using Pandoc.
+Parallel batch export engine: converts every page in the content table to each of its
+export_types (docx, pdf, epub, tex, txt) using the converters in convert.py.
+- Exports run on a pool of worker threads (--workers).
+- An artifact is skipped when its output exists and the content hash of its source matches
+  the one recorded in the checkpoint file, so reruns only export what changed.
+- The checkpoint (build/export_checkpoint.json) is saved as work completes; an interrupted
+  export resumes from it.
+- Prints a throughput summary (pages/s, MB/s).
 Logs all actions and errors to log/export.log.
 """
 
 import os
 import sys
+import json
+import time
+import hashlib
 import sqlite3
 import logging
+import threading
+import concurrent.futures
 import yaml
 # Ensure project root is in sys.path for module imports
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
-from oerforge.convert import convert_md_to_docx
+from oerforge import convert
+from oerforge import process_utils
 from oerforge.copyfile import copy_build_to_docs_safe
+from oerforge.progress import ProgressLog
 
 # --- Constants ---
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -24,51 +38,233 @@ BUILD_ROOT = os.path.join(PROJECT_ROOT, "build")
 BUILD_FILES_ROOT = os.path.join(BUILD_ROOT, "files")
 LOG_PATH = os.path.join(PROJECT_ROOT, "log", "export.log")
 DB_PATH = os.path.join(PROJECT_ROOT, "db", "sqlite.db")
+CHECKPOINT_PATH = os.path.join(BUILD_ROOT, "export_checkpoint.json")
+PROGRESS_PATH = os.path.join(BUILD_ROOT, "export_progress.ndjson")
+EXPORT_FORMATS = ("docx", "pdf", "epub", "tex", "txt")
+DEFAULT_WORKERS = convert.DEFAULT_WORKERS
+CHECKPOINT_INTERVAL = 2.0  # seconds between checkpoint saves while exporting
 
-# --- Logging Setup ---
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[logging.FileHandler(LOG_PATH, encoding="utf-8"), logging.StreamHandler(sys.stdout)]
-)
+# (source extension, export format) -> converter(input_path, output_path)
+EXPORTERS = {
+    (".md", "docx"): convert.convert_md_to_docx,
+    (".md", "pdf"): convert.convert_md_to_pdf,
+    (".md", "epub"): convert.convert_md_to_epub,
+    (".md", "tex"): convert.convert_md_to_tex,
+    (".md", "txt"): convert.convert_md_to_txt,
+    (".ipynb", "docx"): convert.convert_ipynb_to_docx,
+    (".ipynb", "pdf"): convert.convert_ipynb_to_pdf,
+    (".ipynb", "epub"): convert.convert_ipynb_to_epub,
+    (".ipynb", "tex"): convert.convert_ipynb_to_tex,
+    (".ipynb", "txt"): convert.convert_ipynb_to_txt,
+}
 
+def configure_logging():
+    """
+    Log to log/export.log and the console.
+    """
+    os.makedirs(os.path.dirname(LOG_PATH), exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        handlers=[logging.FileHandler(LOG_PATH, encoding="utf-8"), logging.StreamHandler(sys.stdout)]
+    )
+
+def source_hash(path):
+    """
+    Return the SHA-256 of a source file's bytes.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
 
-# --- Batch Export Orchestrator ---
-def export_all(config_path=None):
+class Checkpoint:
+    """
+    Resumable record of finished exports: {output_path: {hash, status, size}}.
+    Thread-safe; saved atomically at most every CHECKPOINT_INTERVAL seconds and on save(force=True).
     """
-    Batch process all Markdown files in the TOC and convert to DOCX.
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except Exception as e:
+                logging.warning(f"[EXPORT] Ignoring unreadable checkpoint {path}: {e}")
+
+    def is_current(self, output_path, content_hash):
+        entry = self.entries.get(output_path)
+        return bool(entry and entry.get("status") == "success" and entry.get("hash") == content_hash and os.path.exists(output_path))
+
+    def update(self, output_path, content_hash, status, size):
+        with self._lock:
+            self.entries[output_path] = {"hash": content_hash, "status": status, "size": size}
+        self.save()
+
+    def save(self, force=False):
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_save < CHECKPOINT_INTERVAL:
+                return
+            self._last_save = now
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+
+def load_export_config(config_path):
+    """
+    Return the global export types from _content.yml (used for records without their own).
+    """
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = yaml.safe_load(f) or {}
+    return config.get("export", {}).get("types", list(EXPORT_FORMATS))
+
+def plan_exports(records, default_types, formats=EXPORT_FORMATS):
     """
-    logging.info("[EXPORT] Starting batch DOCX export.")
+    Expand content records into export tasks.
+    records: iterable of (id, source_path, slug, export_types).
+    Returns a list of dicts {source_path, ext, format, output_path}.
+    """
+    tasks = []
+    for record_id, source_path, slug, export_types in records:
+        src_path = os.path.join(PROJECT_ROOT, source_path) if not os.path.isabs(source_path) else source_path
+        ext = os.path.splitext(src_path)[1].lower()
+        types = [t.strip() for t in export_types.split(",") if t.strip()] if export_types else list(default_types)
+        base_name = os.path.splitext(os.path.basename(source_path))[0]
+        # Use slug from DB for output path
+        out_dir = os.path.join(BUILD_ROOT, slug) if slug else BUILD_ROOT
+        for fmt in types:
+            if fmt not in formats or (ext, fmt) not in EXPORTERS:
+                continue
+            tasks.append({
+                "source_path": src_path,
+                "ext": ext,
+                "format": fmt,
+                "output_path": os.path.join(out_dir, f"{base_name}.{fmt}"),
+            })
+    return tasks
+
+def _export_one(task, content_hash):
+    """
+    Worker task: run one converter and return a result dict for the progress stream.
+    """
+    start = time.monotonic()
+    try:
+        ok = EXPORTERS[(task["ext"], task["format"])](task["source_path"], task["output_path"])
+        status = "success" if ok else "failed"
+        reason = None
+    except Exception as e:
+        status, reason = "failed", str(e)
+    size = os.path.getsize(task["output_path"]) if status == "success" and os.path.exists(task["output_path"]) else 0
+    return {
+        "input": task["source_path"],
+        "output": task["output_path"],
+        "format": task["format"],
+        "status": status,
+        "reason": reason,
+        "hash": content_hash,
+        "bytes": size,
+        "duration": round(time.monotonic() - start, 3),
+    }
+
+def export_all(config_path=None, db_path=DB_PATH, workers=DEFAULT_WORKERS, formats=EXPORT_FORMATS,
+               force=False, checkpoint_path=CHECKPOINT_PATH):
+    """
+    Export every page to each of its export_types in parallel, skipping artifacts that are current.
+    Returns a summary dict: {pages, exported, current, failed, bytes, seconds, pages_per_second, mb_per_second}.
+    """
+    logging.info("[EXPORT] Starting batch export.")
     if config_path is None:
         config_path = os.path.join(PROJECT_ROOT, "_content.yml")
-    with open(config_path, "r", encoding="utf-8") as f:
-        config = yaml.safe_load(f)
-    toc = config.get("toc", [])
-    # Load TOC from config
-    with open(config_path, "r", encoding="utf-8") as f:
-        config = yaml.safe_load(f)
-    toc = config.get("toc", [])
-    conn = None
-    if os.path.exists(DB_PATH):
-        conn = sqlite3.connect(DB_PATH)
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, source_path, slug FROM content WHERE source_path LIKE '%.md'")
-        records = cursor.fetchall()
-        for record in records:
-            record_id, source_path, slug = record
-            src_path = os.path.join(PROJECT_ROOT, source_path) if not os.path.isabs(source_path) else source_path
-            base_name = os.path.splitext(os.path.basename(source_path))[0]
-            # Use slug from DB for output path
-            out_dir = os.path.join(BUILD_ROOT, slug) if slug else BUILD_ROOT
-            out_path = os.path.join(out_dir, base_name + ".docx")
-            if os.path.exists(src_path):
-                logging.info(f"[EXPORT] Converting: {src_path} -> {out_path}")
-                convert_md_to_docx(src_path, out_path, record_id, conn)
-            else:
-                logging.warning(f"[EXPORT] Missing Markdown file: {src_path}")
+    default_types = load_export_config(config_path)
+    if not os.path.exists(db_path):
+        logging.error(f"[EXPORT] Database not found: {db_path}. Run the scan first.")
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        records = conn.execute(
+            "SELECT id, source_path, slug, export_types FROM content WHERE mime_type IN ('.md', '.ipynb') AND source_path IS NOT NULL"
+        ).fetchall()
+    finally:
         conn.close()
-    logging.info("[EXPORT] Batch DOCX export complete.")
+    tasks = plan_exports(records, default_types, formats)
+
+    checkpoint = Checkpoint(checkpoint_path)
+    hashes = {}
+    pending = []
+    current = 0
+    for task in tasks:
+        if not os.path.exists(task["source_path"]):
+            logging.warning(f"[EXPORT] Missing source file: {task['source_path']}")
+            continue
+        if task["source_path"] not in hashes:
+            hashes[task["source_path"]] = source_hash(task["source_path"])
+        content_hash = hashes[task["source_path"]]
+        if not force and checkpoint.is_current(task["output_path"], content_hash):
+            current += 1
+            continue
+        pending.append((task, content_hash))
+    logging.info(f"[EXPORT] {len(tasks)} artifact(s) from {len(hashes)} page(s): {len(pending)} to export, {current} current; {workers} worker(s)")
+
+    start = time.monotonic()
+    results = []
+    # A run cancelled earlier in this process must not cancel this one
+    process_utils.reset_cancellation()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    try:
+        with ProgressLog(PROGRESS_PATH, len(pending), label="export") as progress:
+            futures = [executor.submit(_export_one, task, content_hash) for task, content_hash in pending]
+            for future in concurrent.futures.as_completed(futures):
+                result = future.result()
+                results.append(result)
+                progress.record(result)
+                checkpoint.update(result["output"], result["hash"], result["status"], result["bytes"])
+    except KeyboardInterrupt:
+        logging.warning("[EXPORT] Interrupted; finished exports are kept in the checkpoint.")
+        process_utils.cancel_all()
+        executor.shutdown(wait=True, cancel_futures=True)
+        raise
+    finally:
+        executor.shutdown(wait=True)
+        checkpoint.save(force=True)
+    elapsed = max(time.monotonic() - start, 1e-9)
+    exported_pages = {r["input"] for r in results if r["status"] == "success"}
+    total_bytes = sum(r["bytes"] for r in results)
+    summary = {
+        "pages": len(hashes),
+        "exported": sum(1 for r in results if r["status"] == "success"),
+        "current": current,
+        "failed": sum(1 for r in results if r["status"] != "success"),
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 3),
+        "pages_per_second": round(len(exported_pages) / elapsed, 2) if results else 0.0,
+        "mb_per_second": round(total_bytes / (1024 * 1024) / elapsed, 2) if results else 0.0,
+    }
+    print_export_summary(summary, results)
+    logging.info("[EXPORT] Batch export complete.")
+    return summary
+
+def print_export_summary(summary, results):
+    """
+    Print artifact counts, throughput and any failed exports.
+    """
+    print("\nExport Summary:")
+    print(f"  pages: {summary['pages']}")
+    print(f"  exported: {summary['exported']}")
+    print(f"  current (skipped): {summary['current']}")
+    print(f"  failed: {summary['failed']}")
+    print(f"  throughput: {summary['pages_per_second']} pages/s, {summary['mb_per_second']} MB/s "
+          f"({summary['bytes'] / (1024 * 1024):.1f} MB in {summary['seconds']:.1f}s)")
+    for r in results:
+        if r["status"] != "success":
+            print(f"  [FAILED] {r['input']} -> {r['output']}" + (f" ({r['reason']})" if r["reason"] else ""))
 
 def export_build_to_docs():
     """
@@ -82,7 +278,11 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser(description="Batch export and copy build to docs.")
     parser.add_argument("--copy", action="store_true", help="Copy build/ to docs/")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of parallel exports")
+    parser.add_argument("--formats", nargs="+", choices=EXPORT_FORMATS, default=list(EXPORT_FORMATS), help="Export formats")
+    parser.add_argument("--force", action="store_true", help="Re-export artifacts even if they are current")
     args = parser.parse_args()
-    export_all()
+    configure_logging()
+    export_all(workers=args.workers, formats=tuple(args.formats), force=args.force)
     if args.copy:
         export_build_to_docs()
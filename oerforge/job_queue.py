@@ -0,0 +1,258 @@
+"""
+job_queue.py
+------------
+Crash-Safe Conversion Job Queue
+
+Persists the planned conversion jobs to the `conversion_jobs` table so an interrupted batch
+conversion resumes where it stopped instead of starting over. Jobs move through the states
+pending -> claimed -> done | failed. A claim holds a short lease that the claiming worker
+renews (renew_lease) while the job runs; if the worker dies, the lease expires and another
+worker reclaims the job. Resuming a run also releases, at once, claims held by processes on
+this host that no longer exist.
+
+Worker ids have the form <hostname>-<pid>-<n>, which is how a claim's owner process is found.
+
+Claims use BEGIN IMMEDIATE transactions, so several local worker processes
+(`python -m oerforge.convert --worker`) can drain the same queue safely.
+
+Usage:
+    conn = connect(db_path)
+    run_id = enqueue_jobs(conn, jobs)
+    job = claim_job(conn, worker_id, lease_seconds=900)
+"""
+
+import os
+import socket
+import sqlite3
+import time
+import uuid
+import logging
+from datetime import datetime
+
+try:
+    from .db_utils import create_conversion_jobs_table
+except ImportError:
+    from db_utils import create_conversion_jobs_table
+
+JOB_STATES = ('pending', 'claimed', 'done', 'failed')
+UNFINISHED_STATES = ('pending', 'claimed')
+
+HOSTNAME = socket.gethostname()
+
+_checked_dbs = set()
+
+def connect(db_path):
+    """
+    Open a connection for queue operations (autocommit mode, explicit transactions).
+    Ensures the conversion_jobs table exists for databases created before it was added.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    if db_path not in _checked_dbs:
+        create_conversion_jobs_table(conn.cursor())
+        _checked_dbs.add(db_path)
+    return conn
+
+def _now_iso():
+    return datetime.now().isoformat()
+
+def get_unfinished_run(conn):
+    """
+    Return the run_id of an interrupted run (one with pending or claimed jobs), or None.
+    """
+    row = conn.execute(
+        "SELECT run_id FROM conversion_jobs WHERE state IN ('pending', 'claimed') ORDER BY id LIMIT 1"
+    ).fetchone()
+    return row["run_id"] if row else None
+
+def _pid_alive(pid):
+    """
+    Whether a local process exists. On Windows this cannot be probed safely (signal 0
+    terminates the process there), so the process is assumed alive and its lease decides.
+    """
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def owner_is_dead(owner, hostname=HOSTNAME):
+    """
+    Whether a lease owner (<hostname>-<pid>-<n>) is a process on this host that no longer exists.
+    Owners on other hosts, or not in that form, are never reported dead.
+    """
+    if not owner or not owner.startswith(f"{hostname}-"):
+        return False
+    pid = owner[len(hostname) + 1:].split('-', 1)[0]
+    if not pid.isdigit():
+        return False
+    return int(pid) != os.getpid() and not _pid_alive(int(pid))
+
+def release_stale_claims(conn, hostname=HOSTNAME):
+    """
+    Put claimed jobs back to pending when their lease has expired or their owner process on
+    this host has died. Returns the number of jobs released.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            "SELECT id, output_path, lease_owner, lease_expires FROM conversion_jobs WHERE state = 'claimed'"
+        ).fetchall()
+        stale = [row for row in rows
+                 if row["lease_expires"] is None or row["lease_expires"] < now or owner_is_dead(row["lease_owner"], hostname)]
+        conn.executemany(
+            "UPDATE conversion_jobs SET state = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+            [(_now_iso(), row["id"]) for row in stale]
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    for row in stale:
+        logging.warning(f"[job_queue] Releasing stale claim of {row['lease_owner']} on {row['output_path']}")
+    return len(stale)
+
+def enqueue_jobs(conn, jobs, resume=True):
+    """
+    Persist planned jobs and return the run_id they belong to.
+    jobs: list of dicts with input_path, output_path, input_ext, output_ext,
+          and optionally content_id, forced, custom_label.
+    - With resume=True and an interrupted run in the table, stale claims are released first
+      (release_stale_claims); jobs of that run that are done, failed or still claimed by a
+      live worker (and whose input has not changed since) are kept as they are.
+    - Every other planned job is (re)set to pending under the current run.
+    - Leftover unfinished jobs that are no longer planned are removed.
+    """
+    run_id = get_unfinished_run(conn) if resume else None
+    resumed = run_id is not None
+    if resumed:
+        release_stale_claims(conn)
+    if run_id is None:
+        run_id = uuid.uuid4().hex
+    now = _now_iso()
+    rows = []
+    for job in jobs:
+        input_path = job["input_path"]
+        mtime = os.path.getmtime(input_path) if os.path.exists(input_path) else None
+        rows.append((
+            run_id, input_path, job["output_path"], job["input_ext"], job["output_ext"],
+            job.get("content_id"), int(bool(job.get("forced"))), job.get("custom_label"),
+            mtime, now, now
+        ))
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.executemany("""
+            INSERT INTO conversion_jobs (
+                run_id, input_path, output_path, input_ext, output_ext,
+                content_id, forced, custom_label, input_mtime, state, attempts, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 'pending', 0, ?, ?)
+            ON CONFLICT(output_path) DO UPDATE SET
+                input_path = excluded.input_path,
+                input_ext = excluded.input_ext,
+                output_ext = excluded.output_ext,
+                content_id = excluded.content_id,
+                forced = excluded.forced,
+                custom_label = excluded.custom_label,
+                updated_at = excluded.updated_at,
+                state = CASE
+                    WHEN conversion_jobs.run_id = excluded.run_id
+                         AND conversion_jobs.state IN ('done', 'failed', 'claimed')
+                         AND conversion_jobs.input_mtime IS excluded.input_mtime
+                    THEN conversion_jobs.state ELSE 'pending' END,
+                attempts = CASE
+                    WHEN conversion_jobs.run_id = excluded.run_id THEN conversion_jobs.attempts ELSE 0 END,
+                input_mtime = excluded.input_mtime,
+                run_id = excluded.run_id
+        """, rows)
+        conn.execute(
+            "DELETE FROM conversion_jobs WHERE state IN ('pending', 'claimed') AND updated_at != ?",
+            (now,)
+        )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    counts = get_state_counts(conn, run_id)
+    if resumed:
+        logging.info(f"[job_queue] Resuming run {run_id}: {counts}")
+    else:
+        logging.info(f"[job_queue] Started run {run_id}: {counts}")
+    return run_id
+
+def claim_job(conn, worker_id, lease_seconds):
+    """
+    Atomically claim the next pending job (or a claimed job whose lease has expired).
+    Returns the job as a dict, or None when nothing is left to claim.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute("""
+            SELECT * FROM conversion_jobs
+            WHERE state = 'pending' OR (state = 'claimed' AND lease_expires < ?)
+            ORDER BY id LIMIT 1
+        """, (now,)).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        if row["state"] == 'claimed':
+            logging.warning(f"[job_queue] Reclaiming expired lease of {row['lease_owner']} on {row['output_path']}")
+        conn.execute("""
+            UPDATE conversion_jobs
+            SET state = 'claimed', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ?
+            WHERE id = ?
+        """, (worker_id, now + lease_seconds, _now_iso(), row["id"]))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    job = dict(row)
+    job["state"] = 'claimed'
+    job["lease_owner"] = worker_id
+    return job
+
+def renew_lease(conn, job_id, worker_id, lease_seconds):
+    """
+    Extend a claimed job's lease (the worker's heartbeat). Returns False if the worker no
+    longer holds the claim.
+    """
+    cursor = conn.execute(
+        "UPDATE conversion_jobs SET lease_expires = ? WHERE id = ? AND state = 'claimed' AND lease_owner = ?",
+        (time.time() + lease_seconds, job_id, worker_id)
+    )
+    return cursor.rowcount > 0
+
+def get_claimed_jobs(conn):
+    """
+    Return the jobs currently claimed (by any worker), oldest first.
+    """
+    return [dict(row) for row in conn.execute("SELECT * FROM conversion_jobs WHERE state = 'claimed' ORDER BY id").fetchall()]
+
+def finish_job(conn, job_id, state, reason=None):
+    """
+    Record the final state of a job directly (done, failed, or pending to release a claim).
+    Batch conversion posts JobStateUpdate intents to its DBWriter instead.
+    """
+    if state not in JOB_STATES:
+        raise ValueError(f"Unknown job state: {state}")
+    conn.execute(
+        "UPDATE conversion_jobs SET state = ?, reason = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE id = ?",
+        (state, reason, _now_iso(), job_id)
+    )
+
+def get_state_counts(conn, run_id=None):
+    """
+    Return {state: count} for a run (or all runs).
+    """
+    sql = "SELECT state, COUNT(*) AS n FROM conversion_jobs"
+    params = ()
+    if run_id:
+        sql += " WHERE run_id = ?"
+        params = (run_id,)
+    sql += " GROUP BY state"
+    return {row["state"]: row["n"] for row in conn.execute(sql, params).fetchall()}
@@ -0,0 +1,175 @@
+"""
+latex.py
+--------
+Precompiled LaTeX Preamble for PDF Exports
+
+Loading the package-heavy preamble of templates/tex/oerforge-pdf-template.tex is most of the
+cost of every per-page PDF. This module dumps the static part of that preamble (the
+\\documentclass and \\usepackage lines) into a LaTeX format file once, and compiles each
+page against it. The format is stored under cache/latex/<template hash>/ and is rebuilt
+automatically when the template changes.
+
+Each page also keeps its own aux directory under cache/latex/aux/, so LaTeX's multi-pass
+reruns (cross-references, TOC) start from the previous build's .aux files.
+
+Packages listed in RUNTIME_PACKAGES (hyperref) install begin-document hooks that do not
+survive \\dump; they are loaded per page instead.
+
+Usage:
+    compile_markdown_to_pdf('page.md', 'build/page.pdf', template_path)
+"""
+
+import os
+import re
+import shutil
+import hashlib
+import logging
+import threading
+
+try:
+    from . import process_utils
+except ImportError:
+    import process_utils
+
+# --- Constants ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, 'cache', 'latex')
+LATEX_ENGINE = 'pdflatex'
+FORMAT_NAME = 'oerforge-preamble'
+RUNTIME_PACKAGES = ('hyperref',)
+MAX_LATEX_PASSES = 3
+FORMAT_TIMEOUT = 300
+PANDOC_TIMEOUT = 120
+LATEX_TIMEOUT = 300
+RERUN_RE = re.compile(r'Rerun to get|Label\(s\) may have changed|There were undefined references')
+USEPACKAGE_RE = re.compile(r'\\usepackage(\[[^\]]*\])?\{([^}]+)\}')
+
+_format_lock = threading.Lock()
+_format_dirs = {}
+
+def template_hash(template_path):
+    """
+    Return the SHA-256 of the template file (the format cache key, together with the engine).
+    """
+    with open(template_path, 'rb') as f:
+        return hashlib.sha256(f.read() + LATEX_ENGINE.encode('utf-8')).hexdigest()
+
+def split_template(template_text):
+    """
+    Split a Pandoc LaTeX template into (static_preamble, runtime_template).
+    The static preamble is the leading run of plain \\documentclass/\\usepackage lines
+    (no Pandoc $variables$); runtime packages are moved to the runtime part.
+    """
+    lines = template_text.splitlines(keepends=True)
+    static, runtime_head = [], []
+    index = 0
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if '$' in line:
+            break
+        if stripped.startswith('%') or not stripped:
+            static.append(line)
+            continue
+        if stripped.startswith('\\documentclass'):
+            static.append(line)
+            continue
+        match = USEPACKAGE_RE.match(stripped)
+        if match:
+            if match.group(2) in RUNTIME_PACKAGES:
+                runtime_head.append(line)
+            else:
+                static.append(line)
+            continue
+        break
+    else:
+        index = len(lines)
+    return ''.join(static), ''.join(runtime_head + lines[index:])
+
+def ensure_format(template_path, cache_dir=None):
+    """
+    Build (once) the precompiled format for the template's static preamble.
+    Returns (format_dir, runtime_template_path). Safe to call from many threads and
+    processes: the format is built in a temporary directory and renamed into place.
+    """
+    cache_dir = cache_dir or CACHE_DIR
+    key = template_hash(template_path)
+    with _format_lock:
+        if key in _format_dirs:
+            if _format_dirs[key] is None:
+                raise RuntimeError("precompiled preamble format failed to build earlier in this run")
+            return _format_dirs[key]
+        format_dir = os.path.join(cache_dir, key)
+        runtime_template = os.path.join(format_dir, 'runtime-template.tex')
+        fmt_file = os.path.join(format_dir, f"{FORMAT_NAME}.fmt")
+        if not (os.path.exists(fmt_file) and os.path.exists(runtime_template)):
+            with open(template_path, 'r', encoding='utf-8') as f:
+                static, runtime = split_template(f.read())
+            build_dir = f"{format_dir}.tmp-{os.getpid()}"
+            shutil.rmtree(build_dir, ignore_errors=True)
+            os.makedirs(build_dir)
+            with open(os.path.join(build_dir, f"{FORMAT_NAME}.tex"), 'w', encoding='utf-8') as f:
+                f.write(static + '\\dump\n')
+            with open(os.path.join(build_dir, 'runtime-template.tex'), 'w', encoding='utf-8') as f:
+                f.write(runtime)
+            logging.info(f"[LATEX] Building precompiled preamble {FORMAT_NAME}.fmt for {os.path.basename(template_path)}")
+            try:
+                process_utils.run_tool([
+                    LATEX_ENGINE, "-ini", "-interaction=nonstopmode", "-halt-on-error",
+                    f"-jobname={FORMAT_NAME}", f"&{LATEX_ENGINE}", f"{FORMAT_NAME}.tex"
+                ], timeout=FORMAT_TIMEOUT, retries=1, cwd=build_dir)
+            except Exception:
+                _format_dirs[key] = None
+                shutil.rmtree(build_dir, ignore_errors=True)
+                raise
+            try:
+                os.rename(build_dir, format_dir)
+            except OSError:
+                # Another process finished first; its format is equivalent
+                shutil.rmtree(build_dir, ignore_errors=True)
+        _format_dirs[key] = (format_dir, runtime_template)
+        return _format_dirs[key]
+
+def page_aux_dir(output_path, cache_dir=None):
+    """
+    Return the persistent aux directory for one output PDF.
+    """
+    digest = hashlib.sha1(os.path.abspath(output_path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir or CACHE_DIR, 'aux', digest)
+
+def needs_rerun(log_path):
+    """
+    Return True if the LaTeX log asks for another pass.
+    """
+    if not os.path.exists(log_path):
+        return False
+    with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+        return bool(RERUN_RE.search(f.read()))
+
+def compile_markdown_to_pdf(md_path, output_path, template_path, cache_dir=None):
+    """
+    Compile Markdown to PDF against the precompiled preamble format.
+    Pandoc writes the page's .tex into its aux directory; LaTeX runs there with -fmt and
+    reruns only while the log asks for it. Raises on tool failure (like process_utils.run_tool).
+    """
+    format_dir, runtime_template = ensure_format(template_path, cache_dir)
+    aux_dir = page_aux_dir(output_path, cache_dir)
+    os.makedirs(aux_dir, exist_ok=True)
+    jobname = 'page'
+    tex_path = os.path.join(aux_dir, f"{jobname}.tex")
+    process_utils.run_tool([
+        "pandoc", md_path, "-s", "-t", "latex", "--template", runtime_template, "-o", tex_path
+    ], timeout=PANDOC_TIMEOUT, retries=1)
+    env = dict(os.environ)
+    env['TEXFORMATS'] = format_dir + os.pathsep + env.get('TEXFORMATS', '')
+    cmd = [
+        LATEX_ENGINE, "-interaction=nonstopmode", "-halt-on-error",
+        f"-fmt={FORMAT_NAME}", f"-output-directory={aux_dir}", f"-jobname={jobname}", tex_path
+    ]
+    for attempt in range(MAX_LATEX_PASSES):
+        process_utils.run_tool(cmd, timeout=LATEX_TIMEOUT, retries=1, env=env)
+        if not needs_rerun(os.path.join(aux_dir, f"{jobname}.log")):
+            break
+        logging.debug(f"[LATEX] Rerun {attempt + 2} requested for {output_path}")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    shutil.copyfile(os.path.join(aux_dir, f"{jobname}.pdf"), output_path)
+    return True
@@ -0,0 +1,217 @@
+"""
+linkcheck.py
+------------
+Whole-Site Internal Link and Asset Checker
+
+Checks every internal href/src in build/ against the files that actually exist:
+- every HTML page is parsed once (in parallel) for its links and its anchor ids/names
+- every file in the build is collected into one in-memory set of paths
+- each link is then one set lookup (plus one for a #fragment), so the check is O(total links)
+
+External links (http:, mailto:, ...) are not followed. Links left as .md (not rewritten by
+make.py) and make.py's "(OER-Forge: ...)" notes are reported in their own groups.
+
+build.py runs the check after building the HTML and exits non-zero when links are broken,
+unless `linkcheck: fail_on_broken: false` is set in _content.yml.
+
+Usage:
+    python -m oerforge.linkcheck [build_dir]   # exits 1 if any link is broken
+"""
+
+import os
+import sys
+import logging
+import concurrent.futures
+from collections import defaultdict
+from html.parser import HTMLParser
+from urllib.parse import urlsplit, unquote
+import yaml
+
+# --- Constants ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUILD_DIR = os.path.join(PROJECT_ROOT, 'build')
+CONTENT_YML = os.path.join(PROJECT_ROOT, '_content.yml')
+HTML_EXTENSIONS = ('.html', '.htm')
+# (tag, attribute) pairs whose value is a link
+LINK_ATTRIBUTES = {
+    ('a', 'href'), ('area', 'href'), ('link', 'href'), ('img', 'src'), ('script', 'src'),
+    ('source', 'src'), ('video', 'src'), ('audio', 'src'), ('track', 'src'), ('iframe', 'src'),
+    ('embed', 'src'), ('object', 'data'), ('video', 'poster'),
+}
+EXTERNAL_SCHEMES = ('http', 'https', 'mailto', 'tel', 'data', 'javascript', 'ftp')
+UNRESOLVED_MARKER = '(OER-Forge: '
+WORKERS = os.cpu_count() or 1
+MIN_PARALLEL = 64  # smaller sites are parsed in-process
+# Report groups, in report order
+GROUPS = {
+    'missing-page': "Links to pages that do not exist",
+    'unrewritten-md': "Links still pointing at .md sources",
+    'missing-anchor': "Links to #fragments that do not exist",
+    'missing-asset': "Missing images, scripts, stylesheets and files",
+    'unresolved': "Source links make.py could not resolve",
+}
+
+class _LinkParser(HTMLParser):
+    """
+    Collects a page's links as (line, tag, url) and its anchor targets (id and a[name]).
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self.anchors = set()
+        self.notes = []
+
+    def handle_starttag(self, tag, attrs):
+        for name, value in attrs:
+            if value is None:
+                continue
+            if name == 'id' or (tag == 'a' and name == 'name'):
+                self.anchors.add(value)
+            elif (tag, name) in LINK_ATTRIBUTES:
+                self.links.append((self.getpos()[0], tag, value.strip()))
+
+    def handle_data(self, data):
+        if UNRESOLVED_MARKER in data:
+            self.notes.append((self.getpos()[0], data.strip()))
+
+def parse_page(path):
+    """
+    Parse one HTML file; returns (path, links, anchors, notes).
+    """
+    parser = _LinkParser()
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        parser.feed(f.read())
+    parser.close()
+    return path, parser.links, parser.anchors, parser.notes
+
+def parse_pages(paths, workers=WORKERS):
+    """
+    Parse pages on a process pool; yields parse_page() results.
+    """
+    if workers <= 1 or len(paths) < MIN_PARALLEL:
+        for path in paths:
+            yield parse_page(path)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(parse_page, paths, chunksize=max(1, len(paths) // (workers * 4)))
+
+def resolve_link(url, page_rel):
+    """
+    Resolve a link found on page_rel (build-relative, '/'-separated) to (target path, fragment).
+    Returns None for external links. The target path is build-relative; '' fragment means none.
+    """
+    parts = urlsplit(url)
+    if parts.scheme.lower() in EXTERNAL_SCHEMES or parts.netloc or (parts.scheme and len(parts.scheme) > 1):
+        return None
+    path = unquote(parts.path)
+    fragment = unquote(parts.fragment)
+    if not path:
+        return page_rel, fragment
+    if path.startswith('/'):
+        target = path.lstrip('/')
+    else:
+        target = os.path.join(os.path.dirname(page_rel), path)
+    target = os.path.normpath(target).replace(os.sep, '/')
+    if path.endswith('/'):
+        target = f"{target}/index.html" if target != '.' else 'index.html'
+    return target, fragment
+
+def collect_files(build_dir):
+    """
+    Return (set of every build-relative file path, list of HTML page paths).
+    """
+    files = set()
+    pages = []
+    for root, dirs, filenames in os.walk(build_dir):
+        for filename in filenames:
+            full_path = os.path.join(root, filename)
+            rel = os.path.relpath(full_path, build_dir).replace(os.sep, '/')
+            files.add(rel)
+            if filename.lower().endswith(HTML_EXTENSIONS):
+                pages.append(full_path)
+    return files, pages
+
+def check_links(build_dir=BUILD_DIR, workers=WORKERS):
+    """
+    Check every internal link in build_dir.
+    Returns {'pages': n, 'links': n, 'problems': {group: [(page, line, url, detail)]}}.
+    """
+    files, pages = collect_files(build_dir)
+    anchors = {}
+    page_links = {}
+    problems = defaultdict(list)
+    for path, links, ids, notes in parse_pages(pages, workers):
+        rel = os.path.relpath(path, build_dir).replace(os.sep, '/')
+        anchors[rel] = ids
+        page_links[rel] = links
+        for line, note in notes:
+            problems['unresolved'].append((rel, line, '', note))
+
+    total = 0
+    for rel, links in page_links.items():
+        for line, tag, url in links:
+            resolved = resolve_link(url, rel)
+            if resolved is None:
+                continue
+            total += 1
+            target, fragment = resolved
+            if target not in files:
+                if target + '/index.html' in files:
+                    target = target + '/index.html'
+                elif target.lower().endswith('.md'):
+                    problems['unrewritten-md'].append((rel, line, url, target))
+                    continue
+                else:
+                    group = 'missing-page' if tag in ('a', 'area') and target.lower().endswith(HTML_EXTENSIONS) else 'missing-asset'
+                    problems[group].append((rel, line, url, target))
+                    continue
+            if fragment and target in anchors and fragment not in anchors[target]:
+                problems['missing-anchor'].append((rel, line, url, f"{target}#{fragment}"))
+    for entries in problems.values():
+        entries.sort()
+    return {'pages': len(pages), 'links': total, 'problems': {group: problems[group] for group in GROUPS if problems.get(group)}}
+
+def fail_on_broken(content_yml=CONTENT_YML):
+    """
+    Whether broken links should fail the build (linkcheck.fail_on_broken in _content.yml, default true).
+    """
+    if not os.path.exists(content_yml):
+        return True
+    with open(content_yml, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    return bool((config.get('linkcheck') or {}).get('fail_on_broken', True))
+
+def format_report(result, max_pages=5):
+    """
+    Return the report as text: problems grouped by kind, then by target, with the pages linking to it.
+    """
+    broken = sum(len(entries) for entries in result['problems'].values())
+    lines = [f"Checked {result['links']} internal link(s) on {result['pages']} page(s): {broken} problem(s)"]
+    for group, entries in result['problems'].items():
+        by_target = defaultdict(list)
+        for page, line, url, detail in entries:
+            by_target[detail].append(f"{page}:{line}")
+        lines.append(f"\n{GROUPS[group]} ({len(entries)}):")
+        for target, sources in sorted(by_target.items(), key=lambda item: (-len(item[1]), item[0])):
+            more = f" and {len(sources) - max_pages} more" if len(sources) > max_pages else ''
+            lines.append(f"  {target}")
+            lines.append(f"    from {', '.join(sources[:max_pages])}{more}")
+    return '\n'.join(lines)
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Check internal links and assets in the built site.")
+    parser.add_argument("build_dir", nargs="?", default=BUILD_DIR, help="Directory of the built site")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Processes parsing pages")
+    args = parser.parse_args(argv)
+    if not os.path.isdir(args.build_dir):
+        print(f"Build directory not found: {args.build_dir}")
+        return 2
+    result = check_links(args.build_dir, args.workers)
+    print(format_report(result))
+    return 1 if result['problems'] else 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    sys.exit(main())
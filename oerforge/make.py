@@ -11,6 +11,7 @@ Features:
     - Ensures all internal and asset links are relative for static hosting
     - Populates and checks the SQLite database for content and navigation
     - Copies static assets and images to the build directory
+    - Renders each page's stored accessibility badge into its placeholder
     - Provides detailed logging for debugging and build inspection
 
 Usage:
@@ -21,21 +22,28 @@ import os
 import re
 import sys
 import yaml
+import time
+import sqlite3
 import logging
 from pathlib import Path
 from bs4 import BeautifulSoup, Tag
 from markdown_it import MarkdownIt
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-from oerforge.db_utils import get_db_connection, db_log, initialize_database
-from oerforge.copyfile import ensure_dir, copy_static_assets_to_build, copy_db_images_to_build
+from oerforge.db_utils import get_db_connection, db_log, initialize_database, relink_accessibility_results
+from oerforge.copyfile import ensure_dir, sync_assets_to_build
 from oerforge.scan import merge_export_config
+from oerforge.notebook import render_notebook_file
+from oerforge.progress import ProgressLog
+from oerforge.badges import badge_markup
 
 # --- Constants ---
+PAGE_SOURCE_TYPES = ('.md', '.ipynb')
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
 BUILD_HTML_DIR = os.path.join(PROJECT_ROOT, 'build')
 LAYOUTS_DIR = os.path.join(PROJECT_ROOT, 'layouts')
 LOG_PATH = os.path.join(PROJECT_ROOT, 'log', 'build.log')
+BUILD_PROGRESS_NDJSON = os.path.join(BUILD_HTML_DIR, 'build_progress.ndjson')
 
 def configure_logging(overwrite=False):
     """
@@ -165,6 +173,14 @@ def postprocess_internal_links(html, md_to_html_map, current_output_path=None):
                 print(f"[DEBUG][LINK] Inserted diagnostic message after link: {msg}")
     return str(soup)
 
+def render_notebook_page(source_path, output_path):
+    """
+    Render a Jupyter notebook to Markdown for the HTML pipeline.
+    Output images are written to the page's PAGE_files directory next to the HTML file.
+    """
+    asset_dir = os.path.splitext(output_path)[0] + '_files'
+    return render_notebook_file(source_path, asset_dir, os.path.basename(asset_dir))
+
 def setup_template_env():
     """
     Set up and return a Jinja2 Environment for rendering HTML templates.
@@ -263,13 +279,36 @@ def build_nav(items, content_lookup, current_output_dir, parent_slugs=None):
         logging.debug(debug_msg)
     return nav
 
+def load_accessibility_badges(cursor, wcag_level=None):
+    """
+    Return {output_path: badge_html} from the stored accessibility_results, so pages are
+    rendered with their badge instead of having it injected after the build.
+    Only results for wcag_level are used when given; pages without a result get no badge.
+    Results are kept across initialize_database() and reattached to the current content ids first.
+    """
+    relink_accessibility_results(cursor.connection)
+    query = (
+        "SELECT c.output_path, a.badge_html FROM accessibility_results a "
+        "JOIN content c ON c.id = a.content_id WHERE a.badge_html IS NOT NULL"
+    )
+    params = ()
+    if wcag_level:
+        query += " AND a.wcag_level = ?"
+        params = (wcag_level,)
+    try:
+        cursor.execute(query + " ORDER BY a.id", params)
+    except sqlite3.OperationalError as e:
+        logging.debug(f"[BUILD] No stored accessibility badges: {e}")
+        return {}
+    return {output_path: badge_html for output_path, badge_html in cursor.fetchall() if output_path}
+
 def build_all_markdown_files():
     """
     Main build routine for the static site generator.
     - Auto-populates the DB with Markdown files if the content table is empty.
     - Loads site context from _content.yml.
     - Syncs site_info table with YAML.
-    - Converts Markdown to HTML and renders with Jinja2.
+    - Converts Markdown (and notebooks, rendered in-process) to HTML and renders with Jinja2.
     - Copies static assets and images.
     """
     if not os.path.exists(DB_PATH):
@@ -290,7 +329,7 @@ def build_all_markdown_files():
     content_lookup = {}
     conn = get_db_connection(DB_PATH)
     cursor = conn.cursor()
-    cursor.execute("SELECT source_path, slug, output_path FROM content WHERE mime_type = '.md'")
+    cursor.execute("SELECT source_path, slug, output_path FROM content WHERE mime_type IN (?, ?)", PAGE_SOURCE_TYPES)
     db_md_files = set()
     for source_path, slug, output_path in cursor.fetchall():
         content_lookup[(source_path, slug)] = output_path
@@ -338,33 +377,55 @@ def build_all_markdown_files():
         if mismatch:
             logging.warning("Site info mismatch between _content.yml and site_info table:\n" + "\n".join(mismatch))
 
-    cursor.execute("SELECT source_path, output_path, title, slug, export_types FROM content WHERE mime_type = '.md'")
+    cursor.execute("SELECT source_path, output_path, title, slug, export_types FROM content WHERE mime_type IN (?, ?)", PAGE_SOURCE_TYPES)
     records = cursor.fetchall()
     if not records:
         logging.warning("No Markdown files found in database. Nothing to build.")
         conn.close()
         return
 
+    accessibility_badges = load_accessibility_badges(cursor, content_config.get('pa11y', {}).get('wcag_level'))
     env = setup_template_env()
     logging.debug(f"[BUILD] Total markdown records: {len(records)}")
     files_written = []
     files_skipped = []
+    progress = ProgressLog(BUILD_PROGRESS_NDJSON, len(records), label="build").open()
+
+    def record_page(source_path, abs_output_path, started, reason=None):
+        if reason is None:
+            files_written.append((source_path, abs_output_path))
+        else:
+            files_skipped.append((source_path, abs_output_path, reason))
+        progress.record({
+            'input': source_path,
+            'output': abs_output_path,
+            'status': 'written' if reason is None else 'skipped',
+            'reason': reason,
+            'duration': round(time.monotonic() - started, 3),
+        })
+
     for i, (source_path, output_path, title, slug, export_types) in enumerate(records):
+        started = time.monotonic()
         logging.debug(f"[BUILD] Record {i}: source_path={source_path}, output_path={output_path}, title={title}, slug={slug}, export_types={export_types}")
         abs_source_path = os.path.join(PROJECT_ROOT, source_path) if not os.path.isabs(source_path) else source_path
         abs_output_path = os.path.join(BUILD_HTML_DIR, output_path) if not os.path.isabs(output_path) else output_path
         logging.debug(f"[BUILD] abs_source_path={abs_source_path}, abs_output_path={abs_output_path}")
         if not os.path.exists(abs_source_path):
             logging.error(f"[BUILD] Source file not found: {abs_source_path}. Skipping.")
-            files_skipped.append((source_path, abs_output_path, 'source missing'))
+            record_page(source_path, abs_output_path, started, 'source missing')
             continue
         try:
-            with open(abs_source_path, 'r', encoding='utf-8') as f:
-                md_text = f.read()
+            if abs_source_path.endswith('.ipynb'):
+                md_text = render_notebook_page(abs_source_path, abs_output_path)
+                if md_text is None:
+                    raise ValueError("notebook could not be parsed")
+            else:
+                with open(abs_source_path, 'r', encoding='utf-8') as f:
+                    md_text = f.read()
             logging.debug(f"[BUILD] Read markdown from {abs_source_path} (length={len(md_text)})")
         except Exception as e:
             logging.error(f"[BUILD] Failed to read {abs_source_path}: {e}")
-            files_skipped.append((source_path, abs_output_path, f'read error: {e}'))
+            record_page(source_path, abs_output_path, started, f'read error: {e}')
             continue
         html_body = convert_markdown_to_html(md_text)
         try:
@@ -391,6 +452,7 @@ def build_all_markdown_files():
                 'android512_path': asset('android-chrome-512x192x192.png', 'images'),
                 'manifest_path': asset('site.webmanifest'),
                 'top_menu': nav_menu,
+                'accessibility_badge': badge_markup(accessibility_badges.get(output_path)),
             }
             page_html = env.get_template('base.html').render(**context)
             # --- Post-process internal links in final HTML ---
@@ -418,17 +480,18 @@ def build_all_markdown_files():
             page_html = page_html_post
         except Exception as e:
             logging.error(f"[BUILD] Template rendering or post-processing failed for {source_path}: {e}")
-            files_skipped.append((source_path, abs_output_path, f'template error: {e}'))
+            record_page(source_path, abs_output_path, started, f'template error: {e}')
             continue
         ensure_dir(os.path.dirname(abs_output_path))
         try:
             with open(abs_output_path, 'w', encoding='utf-8') as outf:
                 outf.write(page_html)
             logging.info(f"[BUILD] Wrote HTML: {abs_output_path}")
-            files_written.append((source_path, abs_output_path))
+            record_page(source_path, abs_output_path, started)
         except Exception as e:
             logging.error(f"[BUILD] Failed to write output for {source_path}: {e}")
-            files_skipped.append((source_path, abs_output_path, f'write error: {e}'))
+            record_page(source_path, abs_output_path, started, f'write error: {e}')
+    progress.close()
     logging.info(f"[SUMMARY] Files written: {len(files_written)}")
     for src, out in files_written:
         logging.info(f"[SUMMARY] WROTE: {src} -> {out}")
@@ -436,8 +499,7 @@ def build_all_markdown_files():
     for src, out, reason in files_skipped:
         logging.info(f"[SUMMARY] SKIPPED: {src} -> {out} ({reason})")
     conn.close()
-    copy_static_assets_to_build()
-    copy_db_images_to_build()
+    sync_assets_to_build()
     from oerforge.copyfile import copy_build_to_docs
     copy_build_to_docs()
     logging.info("[AUTO] All markdown files built and copied to docs/.")
@@ -0,0 +1,218 @@
+"""
+notebook.py
+-----------
+Native Jupyter Notebook Rendering
+
+Renders .ipynb notebooks to Markdown in-process, without nbconvert or a Pandoc process per
+notebook. Markdown cells are kept as written, code cells become fenced code blocks, and
+outputs are rendered by MIME type (images, Markdown, HTML, plain text, errors). Output images
+and cell attachments are decoded and written by a thread pool, so notebooks with many plots
+do not serialise on disk I/O.
+
+The resulting Markdown feeds the same markdown-it -> Jinja2 pipeline as .md pages (make.py),
+and the Markdown-based converters for the other export formats (convert.py).
+
+Usage:
+    md_text = render_notebook_file('content/nb.ipynb', 'build/nb_files', 'nb_files')
+"""
+
+import os
+import re
+import base64
+import logging
+import concurrent.futures
+
+try:
+    from .scan import read_notebook_file
+    from .execute import load_cached_outputs, apply_cached_outputs
+except ImportError:
+    from scan import read_notebook_file
+    from execute import load_cached_outputs, apply_cached_outputs
+
+# Output MIME types in order of preference (richest first)
+IMAGE_MIME_TYPES = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/svg+xml': '.svg',
+}
+OUTPUT_MIME_PREFERENCE = ['image/png', 'image/jpeg', 'image/gif', 'image/svg+xml', 'text/markdown', 'text/html', 'text/latex', 'text/plain']
+ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]')
+ATTACHMENT_RE = re.compile(r'\(attachment:([^)\s]+)\)')
+
+def _source_text(source):
+    """
+    Notebook sources and text outputs are stored either as a string or a list of lines.
+    """
+    return ''.join(source) if isinstance(source, list) else (source or '')
+
+def _fence(text, info=''):
+    """
+    Return text as a fenced code block, using a fence longer than any backtick run inside it.
+    """
+    longest = max((len(m) for m in re.findall(r'`+', text)), default=0)
+    fence = '`' * max(3, longest + 1)
+    return f"{fence}{info}\n{text.rstrip()}\n{fence}"
+
+def notebook_language(nb):
+    """
+    Return the notebook's code language for fenced code blocks (default: python).
+    """
+    metadata = nb.get('metadata', {})
+    return (metadata.get('language_info', {}).get('name')
+            or metadata.get('kernelspec', {}).get('language')
+            or 'python')
+
+class _ImageSink:
+    """
+    Collects image writes while cells are rendered; write_all() runs them in a thread pool.
+    """
+
+    def __init__(self, asset_dir, asset_prefix, stem):
+        self.asset_dir = asset_dir
+        self.asset_prefix = asset_prefix
+        self.stem = stem
+        self.pending = []
+
+    def add(self, name, mime_type, data):
+        """
+        Queue an image for writing and return its Markdown link target.
+        """
+        self.pending.append((name, mime_type, data))
+        return f"{self.asset_prefix}/{name}" if self.asset_prefix else name
+
+    def output_name(self, cell_index, output_index, mime_type):
+        return f"{self.stem}_{cell_index}_{output_index}{IMAGE_MIME_TYPES[mime_type]}"
+
+    def write_all(self, max_workers=None):
+        """
+        Decode and write all queued images in parallel. Returns the number of files written.
+        Files whose content is unchanged are left alone.
+        """
+        if not self.pending:
+            return 0
+        os.makedirs(self.asset_dir, exist_ok=True)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return sum(executor.map(lambda item: _write_image(self.asset_dir, *item), self.pending))
+
+def _write_image(asset_dir, name, mime_type, data):
+    """
+    Decode one image payload and write it if it differs from what is on disk. Returns 1 if written.
+    SVG is stored as text in notebooks; other image types are base64.
+    """
+    if mime_type == 'image/svg+xml':
+        payload = _source_text(data).encode('utf-8')
+    else:
+        payload = base64.b64decode(_source_text(data))
+    path = os.path.join(asset_dir, name)
+    if os.path.exists(path) and os.path.getsize(path) == len(payload):
+        with open(path, 'rb') as f:
+            if f.read() == payload:
+                return 0
+    with open(path, 'wb') as f:
+        f.write(payload)
+    return 1
+
+def render_output(output, cell_index, output_index, sink):
+    """
+    Render one code cell output to Markdown.
+    """
+    output_type = output.get('output_type')
+    if output_type == 'stream':
+        return _fence(ANSI_ESCAPE_RE.sub('', _source_text(output.get('text'))))
+    if output_type == 'error':
+        traceback = '\n'.join(output.get('traceback', [])) or f"{output.get('ename')}: {output.get('evalue')}"
+        return _fence(ANSI_ESCAPE_RE.sub('', traceback))
+    if output_type in ('execute_result', 'display_data'):
+        data = output.get('data', {})
+        for mime_type in OUTPUT_MIME_PREFERENCE:
+            if mime_type not in data:
+                continue
+            if mime_type in IMAGE_MIME_TYPES:
+                target = sink.add(sink.output_name(cell_index, output_index, mime_type), mime_type, data[mime_type])
+                alt = _source_text(data.get('text/plain', 'output')).strip().replace('\n', ' ')
+                alt = re.sub(r'[\[\]]', '', alt) or 'output'
+                return f"![{alt}]({target})"
+            text = _source_text(data[mime_type])
+            if mime_type in ('text/markdown', 'text/html', 'text/latex'):
+                return text
+            return _fence(text)
+    return ''
+
+def render_markdown_cell(cell, cell_index, sink):
+    """
+    Render a Markdown cell, writing any attachments and rewriting `attachment:` links.
+    """
+    text = _source_text(cell.get('source'))
+    attachments = cell.get('attachments', {})
+    if not attachments:
+        return text
+
+    def replace(match):
+        name = match.group(1)
+        bundle = attachments.get(name, {})
+        for mime_type in IMAGE_MIME_TYPES:
+            if mime_type in bundle:
+                filename = f"{sink.stem}_{cell_index}_{os.path.basename(name)}"
+                return f"({sink.add(filename, mime_type, bundle[mime_type])})"
+        return match.group(0)
+    return ATTACHMENT_RE.sub(replace, text)
+
+def notebook_to_markdown(nb, asset_dir, asset_prefix='', stem='output', include_outputs=True, max_workers=None):
+    """
+    Render a parsed notebook (dict) to Markdown.
+    Images are written to asset_dir and linked as asset_prefix/<name>.
+    Returns the Markdown text.
+    """
+    sink = _ImageSink(asset_dir, asset_prefix, stem)
+    language = notebook_language(nb)
+    parts = []
+    for cell_index, cell in enumerate(nb.get('cells', [])):
+        cell_type = cell.get('cell_type')
+        if cell_type == 'markdown':
+            parts.append(render_markdown_cell(cell, cell_index, sink))
+        elif cell_type == 'code':
+            source = _source_text(cell.get('source'))
+            if source.strip():
+                parts.append(_fence(source, language))
+            if include_outputs:
+                for output_index, output in enumerate(cell.get('outputs', [])):
+                    rendered = render_output(output, cell_index, output_index, sink)
+                    if rendered:
+                        parts.append(rendered)
+        elif cell_type == 'raw':
+            parts.append(_source_text(cell.get('source')))
+    written = sink.write_all(max_workers=max_workers)
+    if written:
+        logging.debug(f"[NOTEBOOK] Wrote {written} output image(s) to {asset_dir}")
+    return '\n\n'.join(p.strip('\n') for p in parts if p.strip()) + '\n'
+
+def render_notebook_file(input_path, asset_dir, asset_prefix='', include_outputs=True, max_workers=None):
+    """
+    Read a notebook from disk and render it to Markdown.
+    If the execute stage has cached outputs for the notebook's current code, those replace the stored outputs.
+    Returns the Markdown text, or None if the notebook could not be read.
+    """
+    nb = read_notebook_file(input_path)
+    if nb is None:
+        return None
+    if include_outputs:
+        record = load_cached_outputs(nb)
+        if record is not None:
+            apply_cached_outputs(nb, record)
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return notebook_to_markdown(nb, asset_dir, asset_prefix, stem, include_outputs, max_workers)
+
+def notebook_title(nb, default=''):
+    """
+    Return the notebook's title: metadata title, else the first Markdown heading, else default.
+    """
+    title = nb.get('metadata', {}).get('title')
+    if title:
+        return title
+    for cell in nb.get('cells', []):
+        if cell.get('cell_type') == 'markdown':
+            match = re.search(r'^#{1,6}\s+(.+)$', _source_text(cell.get('source')), re.MULTILINE)
+            if match:
+                return match.group(1).strip()
+    return default
@@ -0,0 +1,297 @@
+"""
+pa11y_pool.py
+-------------
+Pool of Long-Lived Pa11y Checkers
+
+Running the pa11y CLI once per page pays for a Node start and a fresh Chromium launch every
+time. This module keeps a few long-lived Node processes (pa11y_worker.js), each with one
+headless browser checking several pages at once, and talks to them over stdin/stdout with
+one JSON object per line.
+
+- concurrency: total pages checked at once across the pool
+- workers: number of browser processes the pages are spread over
+A worker with a request older than the timeout is killed (its in-flight pages fail) and
+replaced. If no worker can be started (Node or the pa11y module missing), Pa11yPool.start()
+raises Pa11yPoolError and callers fall back to the pa11y CLI.
+
+Usage:
+    with Pa11yPool(concurrency=8, workers=2, launch_config=config.get('chromeLaunchConfig')) as pool:
+        for key, response in pool.check_many([(path, 'file://' + path, options) for path in paths]):
+            issues = response.get('issues')
+"""
+
+import os
+import json
+import math
+import time
+import queue
+import signal
+import logging
+import threading
+import subprocess
+import concurrent.futures
+
+try:
+    from . import process_utils
+except ImportError:
+    import process_utils
+
+# --- Constants ---
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pa11y_worker.js')
+DEFAULT_CONCURRENCY = 4
+DEFAULT_WORKERS = 1
+READY_TIMEOUT = 60      # seconds for a worker to launch its browser
+REQUEST_TIMEOUT = 120   # seconds per page before its worker is recycled
+# Keys of a pa11y CLI config file that are not per-page options
+NON_PAGE_OPTIONS = ('chromeLaunchConfig', 'defaults')
+
+class Pa11yPoolError(RuntimeError):
+    """Raised when no pa11y worker process could be started."""
+
+def node_env():
+    """
+    Return the environment for worker processes, with npm's global modules on NODE_PATH
+    so a globally installed pa11y can be required.
+    """
+    env = dict(os.environ)
+    try:
+        result = process_utils.run_tool(["npm", "root", "-g"], timeout=30, retries=0)
+        global_root = result.stdout.strip()
+        if global_root:
+            env['NODE_PATH'] = os.pathsep.join(p for p in (env.get('NODE_PATH'), global_root) if p)
+    except Exception as e:
+        logging.debug(f"[PA11Y] Could not locate global node modules: {e}")
+    return env
+
+def load_page_options(config_path=None, standard=None):
+    """
+    Return (page_options, launch_config) from a pa11y JSON config file plus the WCAG standard.
+    """
+    options = {}
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'r', encoding='utf-8') as f:
+            options = json.load(f)
+    launch_config = options.get('chromeLaunchConfig', {})
+    options = {k: v for k, v in options.items() if k not in NON_PAGE_OPTIONS}
+    if standard:
+        options['standard'] = standard
+    return options, launch_config
+
+class _Worker:
+    """
+    One pa11y_worker.js process: requests are written to stdin, a reader thread resolves
+    their futures from stdout.
+    """
+
+    def __init__(self, cmd, env):
+        self.proc = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            text=True, bufsize=1, env=env, **process_utils._popen_kwargs()
+        )
+        self.ready = threading.Event()
+        self.pending = {}   # id -> (future, submitted_at)
+        self.alive = True
+        self._lock = threading.Lock()
+        threading.Thread(target=self._read_stdout, daemon=True).start()
+        threading.Thread(target=self._read_stderr, daemon=True).start()
+
+    def _read_stdout(self):
+        for line in self.proc.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                logging.debug(f"[PA11Y] worker {self.proc.pid}: {line.rstrip()}")
+                continue
+            if message.get('ready'):
+                self.ready.set()
+                continue
+            with self._lock:
+                entry = self.pending.pop(message.get('id'), None)
+            if entry is not None:
+                entry[0].set_result(message)
+            elif message.get('error'):
+                logging.error(f"[PA11Y] worker {self.proc.pid}: {message['error']}")
+        self._fail_pending("pa11y worker exited")
+
+    def _read_stderr(self):
+        for line in self.proc.stderr:
+            logging.debug(f"[PA11Y] worker {self.proc.pid} stderr: {line.rstrip()}")
+
+    def _fail_pending(self, reason):
+        with self._lock:
+            self.alive = False
+            entries = list(self.pending.values())
+            self.pending.clear()
+        for future, _ in entries:
+            if not future.done():
+                future.set_result({'error': reason})
+        self.ready.set()
+
+    def submit(self, request_id, url, options):
+        future = concurrent.futures.Future()
+        with self._lock:
+            if not self.alive:
+                future.set_result({'id': request_id, 'error': "pa11y worker exited"})
+                return future
+            self.pending[request_id] = (future, time.monotonic())
+        try:
+            self.proc.stdin.write(json.dumps({'id': request_id, 'url': url, 'options': options}) + '\n')
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            self._fail_pending("pa11y worker exited")
+        return future
+
+    def oldest_request_age(self):
+        with self._lock:
+            if not self.pending:
+                return 0.0
+            return time.monotonic() - min(submitted for _, submitted in self.pending.values())
+
+    def load(self):
+        with self._lock:
+            return len(self.pending)
+
+    def close(self, grace=process_utils.KILL_GRACE_SECONDS):
+        """
+        Close stdin (the worker finishes its pages and exits); kill it if it does not.
+        """
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass
+        try:
+            self.proc.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            self.kill()
+
+    def kill(self):
+        try:
+            if os.name == 'nt':
+                self.proc.kill()
+            else:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+        self.proc.wait()
+        self._fail_pending("pa11y worker killed")
+
+class Pa11yPool:
+    """
+    Long-lived pa11y workers checking up to `concurrency` pages at a time.
+    """
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY, workers=DEFAULT_WORKERS, launch_config=None,
+                 command=None, timeout=REQUEST_TIMEOUT, env=None):
+        self.concurrency = max(1, concurrency)
+        self.worker_count = max(1, min(workers, self.concurrency))
+        pages = math.ceil(self.concurrency / self.worker_count)
+        self.command = command or ["node", WORKER_SCRIPT, str(pages), json.dumps(launch_config or {})]
+        self.timeout = timeout
+        self.env = env
+        self.workers = []
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _spawn(self):
+        try:
+            worker = _Worker(self.command, self.env)
+        except OSError as e:
+            logging.error(f"[PA11Y] Could not start pa11y worker: {e}")
+            return None
+        if not worker.ready.wait(READY_TIMEOUT) or not worker.alive:
+            logging.error(f"[PA11Y] pa11y worker {worker.proc.pid} did not become ready")
+            worker.kill()
+            return None
+        return worker
+
+    def start(self):
+        """
+        Start the worker processes. Raises Pa11yPoolError if none could be started.
+        """
+        if self.env is None:
+            self.env = node_env()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.worker_count) as executor:
+            self.workers = [w for w in executor.map(lambda _: self._spawn(), range(self.worker_count)) if w]
+        if not self.workers:
+            raise Pa11yPoolError("no pa11y worker could be started")
+        logging.info(f"[PA11Y] Started {len(self.workers)} pa11y worker(s), {self.concurrency} page(s) at a time")
+        return self
+
+    def check(self, url, options=None):
+        """
+        Queue one page; returns a Future of the worker's response ({issues} or {error}).
+        Blocks while `concurrency` pages are in flight.
+        """
+        self._slots.acquire()
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            live = [w for w in self.workers if w.alive]
+            if not live:
+                replacement = self._spawn()
+                if replacement is not None:
+                    self.workers.append(replacement)
+                    live = [replacement]
+            worker = min(live, key=lambda w: w.load()) if live else None
+        if worker is None:
+            future = concurrent.futures.Future()
+            future.set_result({'id': request_id, 'error': "no pa11y worker available"})
+        else:
+            future = worker.submit(request_id, url, options or {})
+        future.add_done_callback(lambda f: self._slots.release())
+        return future
+
+    def recycle_stuck_workers(self):
+        """
+        Kill and replace workers whose oldest request has run longer than the timeout.
+        """
+        with self._lock:
+            for index, worker in enumerate(self.workers):
+                if worker.alive and worker.oldest_request_age() > self.timeout:
+                    logging.error(f"[PA11Y] pa11y worker {worker.proc.pid} exceeded {self.timeout}s; restarting it")
+                    worker.kill()
+                    replacement = self._spawn()
+                    if replacement is not None:
+                        self.workers[index] = replacement
+
+    def check_many(self, items):
+        """
+        Check (key, url, options) items; yields (key, response) as pages finish.
+        """
+        items = list(items)
+        completed = queue.Queue()
+
+        def submit_all():
+            for key, url, options in items:
+                future = self.check(url, options)
+                future.add_done_callback(lambda f, key=key: completed.put((key, f.result())))
+        threading.Thread(target=submit_all, daemon=True).start()
+        for _ in range(len(items)):
+            while True:
+                try:
+                    key, response = completed.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    self.recycle_stuck_workers()
+            yield key, response
+
+    def close(self):
+        """
+        Let every worker finish and exit.
+        """
+        for worker in self.workers:
+            worker.close()
+        self.workers = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            for worker in self.workers:
+                worker.kill()
+            self.workers = []
+        else:
+            self.close()
+        return False
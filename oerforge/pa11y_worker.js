@@ -0,0 +1,85 @@
+#!/usr/bin/env node
+/*
+ * pa11y_worker.js
+ * ---------------
+ * Long-lived Pa11y checker used by oerforge/pa11y_pool.py.
+ *
+ * Launches one headless browser and checks many pages with it, up to PAGES pages at a time.
+ * Protocol (one JSON object per line):
+ *   stdin:  {"id": 1, "url": "file:///.../page.html", "options": {...pa11y options...}}
+ *   stdout: {"id": 1, "issues": [...]}   or   {"id": 1, "error": "message"}
+ * The first line on stdout is {"ready": true} once the browser is up.
+ *
+ * Usage: node pa11y_worker.js [pages] [chromeLaunchConfig JSON]
+ */
+'use strict';
+
+const path = require('path');
+const readline = require('readline');
+const pa11y = require('pa11y');
+// Use the puppeteer that pa11y itself depends on
+const puppeteer = require(require.resolve('puppeteer', { paths: [path.dirname(require.resolve('pa11y'))] }));
+
+const PAGES = Math.max(1, parseInt(process.argv[2] || '4', 10));
+const LAUNCH_CONFIG = process.argv[3] ? JSON.parse(process.argv[3]) : {};
+
+function send(message) {
+    process.stdout.write(JSON.stringify(message) + '\n');
+}
+
+async function main() {
+    const browser = await puppeteer.launch(Object.assign({ headless: true }, LAUNCH_CONFIG));
+    const queue = [];
+    let active = 0;
+    let closing = false;
+
+    async function check(request) {
+        const page = await browser.newPage();
+        try {
+            const options = Object.assign({}, request.options || {}, { browser, page });
+            delete options.chromeLaunchConfig;
+            const result = await pa11y(request.url, options);
+            send({ id: request.id, issues: result.issues });
+        } catch (err) {
+            send({ id: request.id, error: String(err && err.message || err) });
+        } finally {
+            await page.close().catch(() => {});
+        }
+    }
+
+    function pump() {
+        while (active < PAGES && queue.length) {
+            active += 1;
+            check(queue.shift()).finally(() => {
+                active -= 1;
+                pump();
+            });
+        }
+        if (closing && active === 0 && !queue.length) {
+            browser.close().finally(() => process.exit(0));
+        }
+    }
+
+    const lines = readline.createInterface({ input: process.stdin });
+    lines.on('line', (line) => {
+        if (!line.trim()) {
+            return;
+        }
+        try {
+            queue.push(JSON.parse(line));
+        } catch (err) {
+            send({ id: null, error: `invalid request: ${err.message}` });
+        }
+        pump();
+    });
+    lines.on('close', () => {
+        closing = true;
+        pump();
+    });
+    send({ ready: true });
+}
+
+main().catch((err) => {
+    send({ id: null, error: `worker failed to start: ${err && err.message || err}` });
+    process.exit(1);
+});
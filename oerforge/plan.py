@@ -0,0 +1,173 @@
+"""
+plan.py
+-------
+Dry-Run Conversion Planner
+
+Shows what batch_convert_all_content would do without running anything. Every conversion
+from content x conversion_capabilities x export_types is classified as new, stale,
+up-to-date, missing-source or unavailable (a required tool is missing, see tools.py),
+with the reason, given an estimated duration from the timings recorded in
+conversion_results, and scheduled onto N workers to predict the wall-clock time of the
+rebuild and the jobs on its critical path.
+
+Duration estimates, most specific first:
+    1. the last successful timing of the same output
+    2. the average successful timing of the same source -> target format pair
+    3. DEFAULT_ESTIMATES for the target format
+
+Usage:
+    python -m oerforge.convert --plan [--workers 8] [--plan-json build/conversion_plan.json]
+"""
+
+import os
+import json
+import heapq
+import sqlite3
+import logging
+
+try:
+    from . import convert
+except ImportError:
+    import convert
+
+# --- Constants ---
+PLAN_JSON = os.path.join(convert.BUILD_DIR, 'conversion_plan.json')
+# Seconds per job when no history exists for an output or format pair
+DEFAULT_ESTIMATES = {
+    '.md': 0.05,
+    '.txt': 1.0,
+    '.tex': 1.0,
+    '.docx': 2.0,
+    '.epub': 2.0,
+    '.pdf': 15.0,
+}
+FALLBACK_ESTIMATE = 2.0
+PLANNED_STATES = ('new', 'stale')
+
+def load_historic_timings(db_path):
+    """
+    Return (by_output, by_pair) average durations in seconds from successful conversion_results rows.
+    by_output is keyed by the output path relative to build/; by_pair by (source_format, target_format).
+    """
+    by_output, by_pair = {}, {}
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("""
+            SELECT output_path, source_format, target_format, CAST(conversion_time AS REAL)
+            FROM conversion_results
+            WHERE status = 'success' AND CAST(conversion_time AS REAL) > 0
+            ORDER BY id
+        """).fetchall()
+    except sqlite3.OperationalError as e:
+        logging.warning(f"[PLAN] No conversion history available: {e}")
+        rows = []
+    finally:
+        conn.close()
+    pair_totals = {}
+    for output_path, source_format, target_format, seconds in rows:
+        if output_path:
+            by_output[output_path] = seconds
+        total, count = pair_totals.get((source_format, target_format), (0.0, 0))
+        pair_totals[(source_format, target_format)] = (total + seconds, count + 1)
+    for pair, (total, count) in pair_totals.items():
+        by_pair[pair] = total / count
+    return by_output, by_pair
+
+def estimate_duration(job, by_output, by_pair):
+    """
+    Return (seconds, basis) for one job; basis is one of: output, format, default.
+    """
+    rel_output = os.path.relpath(job["output_path"], convert.BUILD_DIR) if os.path.isabs(job["output_path"]) else job["output_path"]
+    if rel_output in by_output:
+        return by_output[rel_output], "output"
+    pair = (job["input_ext"], job["output_ext"])
+    if pair in by_pair:
+        return by_pair[pair], "format"
+    return DEFAULT_ESTIMATES.get(job["output_ext"], FALLBACK_ESTIMATE), "default"
+
+def schedule(jobs, workers):
+    """
+    Predict the makespan of independent jobs on `workers` workers (longest job first onto
+    the least loaded worker). Returns (makespan, critical_path), where critical_path is the
+    list of jobs on the worker that finishes last.
+    """
+    workers = max(1, workers)
+    loads = [(0.0, n) for n in range(workers)]
+    heapq.heapify(loads)
+    assigned = {n: [] for n in range(workers)}
+    for job in sorted(jobs, key=lambda j: j["estimate"], reverse=True):
+        load, n = heapq.heappop(loads)
+        assigned[n].append(job)
+        heapq.heappush(loads, (load + job["estimate"], n))
+    makespan, last = max(loads)
+    return makespan, assigned[last] if makespan > 0 else []
+
+def build_plan(db_path=convert.DB_PATH, force=False, workers=convert.DEFAULT_WORKERS):
+    """
+    Build the dry-run plan. Returns a dict with the classified jobs, per-state counts,
+    the serial cost, the predicted makespan for `workers` workers and its critical path.
+    """
+    jobs = convert.enumerate_conversion_jobs(db_path, force=force)
+    by_output, by_pair = load_historic_timings(db_path)
+    counts = {}
+    for job in jobs:
+        job["estimate"], job["estimate_basis"] = estimate_duration(job, by_output, by_pair)
+        if job["state"] not in PLANNED_STATES:
+            job["estimate"] = 0.0
+        counts[job["state"]] = counts.get(job["state"], 0) + 1
+    planned = [job for job in jobs if job["state"] in PLANNED_STATES]
+    makespan, critical_path = schedule(planned, workers)
+    return {
+        "workers": workers,
+        "counts": counts,
+        "planned_jobs": len(planned),
+        "serial_seconds": round(sum(job["estimate"] for job in planned), 3),
+        "longest_job_seconds": round(max((job["estimate"] for job in planned), default=0.0), 3),
+        "predicted_seconds": round(makespan, 3),
+        "critical_path": [job["output_path"] for job in critical_path],
+        "jobs": jobs,
+    }
+
+def format_plan_table(plan):
+    """
+    Return the plan as a plain text table followed by a summary.
+    """
+    headers = ("STATE", "EST(s)", "BASIS", "SOURCE", "OUTPUT", "REASON")
+    rows = [(
+        job["state"], f"{job['estimate']:.2f}", job["estimate_basis"],
+        job["input_path"], os.path.relpath(job["output_path"], convert.BUILD_DIR) if os.path.isabs(job["output_path"]) else job["output_path"],
+        job["reason"],
+    ) for job in sorted(plan["jobs"], key=lambda j: (j["state"] not in PLANNED_STATES, -j["estimate"], j["output_path"]))]
+    widths = [max([len(h)] + [len(str(r[i])) for r in rows]) for i, h in enumerate(headers)]
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(str(v).ljust(w) for v, w in zip(row, widths)) for row in rows)
+    lines.append("")
+    lines.append("Plan Summary:")
+    for state, count in sorted(plan["counts"].items()):
+        lines.append(f"  {state}: {count}")
+    lines.append(f"  serial cost: {plan['serial_seconds']:.1f}s")
+    lines.append(f"  predicted wall time with {plan['workers']} worker(s): {plan['predicted_seconds']:.1f}s "
+                 f"(longest single job {plan['longest_job_seconds']:.1f}s)")
+    if plan["critical_path"]:
+        lines.append(f"  critical path ({len(plan['critical_path'])} job(s)):")
+        lines.extend(f"    {path}" for path in plan["critical_path"])
+    return "\n".join(lines)
+
+def write_plan_json(plan, plan_json_path=PLAN_JSON):
+    """
+    Write the plan to JSON.
+    """
+    os.makedirs(os.path.dirname(plan_json_path) or convert.BUILD_DIR, exist_ok=True)
+    with open(plan_json_path, "w", encoding="utf-8") as f:
+        json.dump(plan, f, indent=2)
+
+def run_plan(db_path=convert.DB_PATH, force=False, workers=convert.DEFAULT_WORKERS, plan_json_path=PLAN_JSON):
+    """
+    Build the plan, print it as a table and write it as JSON. Returns the plan dict.
+    """
+    plan = build_plan(db_path, force=force, workers=workers)
+    print(format_plan_table(plan))
+    write_plan_json(plan, plan_json_path)
+    print(f"\nPlan written to {plan_json_path}")
+    return plan
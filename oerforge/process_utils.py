@@ -0,0 +1,383 @@
+"""
+process_utils.py
+----------------
+External Tool Process Helpers
+
+Runs external tools (Pandoc, LaTeX via Pandoc, Pa11y) with a timeout, bounded retry with
+backoff for transient failures, and process-group kill so a hung tool never takes its
+children down with it or stalls a worker pool. Every in-flight child is tracked so that a
+Ctrl-C can terminate all of them at once.
+
+All tool processes are driven by one shared AsyncToolRunner: an asyncio event loop in a
+background thread that starts children with asyncio.create_subprocess_exec. Each tool
+(pandoc, pdflatex, pa11y, ...) has its own concurrency limit, submissions beyond
+MAX_PENDING block the submitting thread (backpressure), and stdout/stderr are captured as
+streams with a size cap. Synchronous callers use run_tool() or submit(); async code can
+await runner.run() directly.
+
+Usage:
+    from oerforge.process_utils import run_tool
+    run_tool(["pandoc", "in.md", "-o", "out.pdf"], timeout=600, retries=1)
+
+    futures = [get_runner().submit(cmd, timeout=120) for cmd in cmds]   # ToolResult futures
+"""
+
+import os
+import time
+import errno
+import signal
+import asyncio
+import subprocess
+import threading
+import logging
+from collections import namedtuple
+
+# --- Defaults ---
+DEFAULT_TIMEOUT = 300
+DEFAULT_RETRIES = 1
+DEFAULT_BACKOFF = 2.0
+KILL_GRACE_SECONDS = 5
+TRANSIENT_ERRNOS = {errno.EAGAIN, errno.ENOMEM, errno.EMFILE, errno.ENFILE, errno.EINTR}
+
+# --- Async runner defaults ---
+CPU_COUNT = os.cpu_count() or 1
+# Concurrent processes per tool (keyed by executable basename); others use DEFAULT_TOOL_LIMIT
+TOOL_LIMITS = {
+    'pandoc': CPU_COUNT,
+    'pdflatex': CPU_COUNT,
+    'xelatex': CPU_COUNT,
+    'lualatex': CPU_COUNT,
+    'pa11y': max(1, min(4, CPU_COUNT)),
+}
+DEFAULT_TOOL_LIMIT = CPU_COUNT * 2
+MAX_PENDING = 256                      # queued + running submissions before submit() blocks
+MAX_OUTPUT_BYTES = 64 * 1024 * 1024    # per stream; the rest is drained and discarded
+
+ToolResult = namedtuple('ToolResult', [
+    'cmd', 'tool', 'returncode', 'stdout', 'stderr', 'duration', 'timed_out', 'truncated', 'error'
+])
+
+_cancel_event = threading.Event()
+
+class ToolTimeoutError(subprocess.TimeoutExpired):
+    """Raised when an external tool exceeds its timeout and its process group was killed."""
+
+class ToolCancelledError(RuntimeError):
+    """Raised when a tool run is cancelled (e.g. Ctrl-C) before or during execution."""
+
+def is_cancelled():
+    """
+    Return True if cancel_all() has been called since the last reset_cancellation().
+    """
+    return _cancel_event.is_set()
+
+def reset_cancellation():
+    """
+    Clear the cancellation flag before starting a new batch of tool runs.
+    """
+    _cancel_event.clear()
+
+def _popen_kwargs():
+    """
+    Return Popen kwargs that start the child in its own process group.
+    """
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+def cancel_all():
+    """
+    Cancel all tool runs: set the cancellation flag and kill every in-flight process group.
+    Pending retries observe the flag and stop.
+    """
+    _cancel_event.set()
+    if _runner is not None:
+        _runner.kill_all()
+
+def _is_transient(exc):
+    """
+    Return True if a failure is worth retrying: killed by a signal or a resource OSError.
+    A missing binary or a normal non-zero exit is not transient.
+    """
+    if isinstance(exc, subprocess.CalledProcessError):
+        return exc.returncode is not None and exc.returncode < 0 and not _cancel_event.is_set()
+    if isinstance(exc, FileNotFoundError):
+        return False
+    if isinstance(exc, OSError):
+        return exc.errno in TRANSIENT_ERRNOS
+    return False
+
+class AsyncToolRunner:
+    """
+    Runs external tools on an asyncio event loop with per-tool concurrency limits,
+    bounded submission (backpressure), and size-capped streaming output capture.
+    """
+
+    def __init__(self, tool_limits=None, default_limit=DEFAULT_TOOL_LIMIT, max_pending=MAX_PENDING, max_output=MAX_OUTPUT_BYTES):
+        self.tool_limits = dict(TOOL_LIMITS if tool_limits is None else tool_limits)
+        self.default_limit = default_limit
+        self.max_output = max_output
+        self._pending = threading.BoundedSemaphore(max_pending)
+        self._semaphores = {}
+        self._procs = set()
+        self._loop = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # --- Event loop thread ---
+    def start(self):
+        """
+        Start the background event loop thread (idempotent). Returns self.
+        """
+        with self._start_lock:
+            if self._thread is None:
+                ready = threading.Event()
+
+                def run_loop():
+                    self._loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(self._loop)
+                    ready.set()
+                    self._loop.run_forever()
+                self._thread = threading.Thread(target=run_loop, name="oerforge-tool-runner", daemon=True)
+                self._thread.start()
+                ready.wait()
+        return self
+
+    def _semaphore(self, tool):
+        if tool not in self._semaphores:
+            self._semaphores[tool] = asyncio.Semaphore(self.tool_limits.get(tool, self.default_limit))
+        return self._semaphores[tool]
+
+    # --- Async API ---
+    async def _read_capped(self, stream, chunks):
+        """
+        Read a stream to EOF into `chunks`, keeping at most max_output bytes. Returns truncated.
+        Chunks read so far stay in `chunks` if the read is cancelled.
+        """
+        size, truncated = 0, False
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                break
+            if self.max_output is None or size + len(chunk) <= self.max_output:
+                chunks.append(chunk)
+                size += len(chunk)
+            else:
+                keep = max(0, self.max_output - size)
+                if keep:
+                    chunks.append(chunk[:keep])
+                    size += keep
+                truncated = True
+        return truncated
+
+    async def _finish_readers(self, proc, readers, tool, grace=KILL_GRACE_SECONDS):
+        """
+        Wait up to `grace` seconds for the output readers after the process is gone. A descendant
+        that escaped the process group can hold the pipes open; its output is then cut off and the
+        pipe transports closed. Returns (out_truncated, err_truncated).
+        """
+        try:
+            return await asyncio.wait_for(asyncio.shield(readers), grace)
+        except asyncio.TimeoutError:
+            logging.warning(f"[process_utils] Output pipes of {tool} still open after it exited; output cut off.")
+            readers.cancel()
+            transport = getattr(proc, '_transport', None)
+            if transport is not None:
+                transport.close()
+            return True, True
+
+    async def _kill_group(self, proc, grace=KILL_GRACE_SECONDS):
+        """
+        SIGTERM the child's process group, then SIGKILL if it has not exited after `grace` seconds.
+        """
+        if proc.returncode is not None:
+            return
+        try:
+            if os.name == 'nt':
+                proc.terminate()
+            else:
+                os.killpg(proc.pid, signal.SIGTERM)
+            await asyncio.wait_for(proc.wait(), grace)
+        except (ProcessLookupError, PermissionError):
+            return
+        except asyncio.TimeoutError:
+            try:
+                if os.name == 'nt':
+                    proc.kill()
+                else:
+                    os.killpg(proc.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                return
+            await proc.wait()
+
+    async def run(self, cmd, timeout=DEFAULT_TIMEOUT, input=None, cwd=None, env=None):
+        """
+        Run one tool process and return a ToolResult. Never raises for tool failures:
+        timeouts set timed_out, start-up errors (e.g. missing binary) are returned in `error`.
+        Cancelling the awaiting task kills the process group.
+        """
+        tool = os.path.basename(cmd[0])
+        async with self._semaphore(tool):
+            start = time.monotonic()
+            if _cancel_event.is_set():
+                return ToolResult(cmd, tool, None, '', '', 0.0, False, False, ToolCancelledError(f"Cancelled before start: {tool}"))
+            try:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=cwd,
+                    env=env,
+                    **_popen_kwargs()
+                )
+            except OSError as e:
+                return ToolResult(cmd, tool, None, '', '', time.monotonic() - start, False, False, e)
+            self._procs.add(proc)
+            out_chunks, err_chunks = [], []
+            readers = asyncio.gather(self._read_capped(proc.stdout, out_chunks), self._read_capped(proc.stderr, err_chunks))
+
+            async def communicate():
+                # Feeding stdin, waiting for exit and draining the pipes share one deadline
+                if input is not None:
+                    try:
+                        proc.stdin.write(input.encode('utf-8') if isinstance(input, str) else input)
+                        await proc.stdin.drain()
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+                    finally:
+                        proc.stdin.close()
+                await proc.wait()
+                return await asyncio.shield(readers)
+
+            timed_out = False
+            try:
+                try:
+                    out_truncated, err_truncated = await asyncio.wait_for(communicate(), timeout)
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    logging.error(f"[process_utils] Timeout after {timeout}s, killing process group: {' '.join(cmd)}")
+                    await self._kill_group(proc)
+                    out_truncated, err_truncated = await self._finish_readers(proc, readers, tool)
+            except asyncio.CancelledError:
+                # The child runs in its own session, so it never sees the terminal's SIGINT.
+                await self._kill_group(proc)
+                readers.cancel()
+                raise
+            finally:
+                self._procs.discard(proc)
+            stdout, stderr = b''.join(out_chunks), b''.join(err_chunks)
+            if (out_truncated or err_truncated) and not timed_out:
+                logging.warning(f"[process_utils] Output of {tool} exceeded {self.max_output} bytes and was truncated.")
+            return ToolResult(
+                cmd, tool, proc.returncode,
+                stdout.decode('utf-8', errors='replace'), stderr.decode('utf-8', errors='replace'),
+                time.monotonic() - start, timed_out, out_truncated or err_truncated, None
+            )
+
+    # --- Thread-safe API ---
+    def submit(self, cmd, timeout=DEFAULT_TIMEOUT, input=None, cwd=None, env=None):
+        """
+        Schedule a tool run from any thread; returns a concurrent.futures.Future of ToolResult.
+        Blocks while MAX_PENDING submissions are outstanding (backpressure).
+        """
+        self.start()
+        self._pending.acquire()
+        future = asyncio.run_coroutine_threadsafe(self.run(cmd, timeout, input, cwd, env), self._loop)
+        future.add_done_callback(lambda f: self._pending.release())
+        return future
+
+    def map(self, cmds, timeout=DEFAULT_TIMEOUT, cwd=None, env=None):
+        """
+        Run many commands with the runner's concurrency limits; yields (cmd, ToolResult) as each finishes.
+        """
+        import concurrent.futures
+        futures = {}
+        for cmd in cmds:
+            futures[self.submit(cmd, timeout=timeout, cwd=cwd, env=env)] = cmd
+        for future in concurrent.futures.as_completed(futures):
+            yield futures[future], future.result()
+
+    def kill_all(self):
+        """
+        Kill every in-flight process group (called by cancel_all()).
+        """
+        if self._loop is None:
+            return
+        procs = list(self._procs)
+        if not procs:
+            return
+        logging.warning(f"[process_utils] Terminating {len(procs)} in-flight tool process(es).")
+
+        async def kill():
+            await asyncio.gather(*(self._kill_group(proc) for proc in procs), return_exceptions=True)
+        try:
+            asyncio.run_coroutine_threadsafe(kill(), self._loop).result(KILL_GRACE_SECONDS + 5)
+        except Exception as e:
+            logging.error(f"[process_utils] Failed to kill in-flight processes: {e}")
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_runner():
+    """
+    Return the shared AsyncToolRunner, starting it on first use.
+    """
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = AsyncToolRunner().start()
+        return _runner
+
+def _run_once(cmd, timeout, input=None, cwd=None, env=None):
+    """
+    Run cmd once on the shared runner, in its own process group, killing the group on timeout.
+    Returns subprocess.CompletedProcess (text mode).
+    """
+    if _cancel_event.is_set():
+        raise ToolCancelledError(f"Cancelled before start: {cmd[0]}")
+    future = get_runner().submit(cmd, timeout=timeout, input=input, cwd=cwd, env=env)
+    try:
+        result = future.result()
+    except KeyboardInterrupt:
+        future.cancel()
+        raise
+    if result.error is not None:
+        raise result.error
+    if result.timed_out:
+        raise ToolTimeoutError(cmd, timeout, output=result.stdout, stderr=result.stderr)
+    if _cancel_event.is_set() and result.returncode != 0:
+        raise ToolCancelledError(f"Cancelled while running: {cmd[0]}")
+    return subprocess.CompletedProcess(cmd, result.returncode, result.stdout, result.stderr)
+
+def run_tool(cmd, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES, backoff=DEFAULT_BACKOFF,
+             check=True, retry_on_timeout=False, input=None, cwd=None, env=None):
+    """
+    Run an external tool with a timeout, process-group kill, and bounded retry.
+    - Transient failures (signal kills, EAGAIN/ENOMEM) are retried up to `retries` times,
+      waiting backoff * 2**attempt seconds between attempts.
+    - Timeouts raise ToolTimeoutError; they are only retried if retry_on_timeout is True.
+    - With check=True, a non-zero exit raises subprocess.CalledProcessError.
+    Returns subprocess.CompletedProcess.
+    """
+    attempt = 0
+    while True:
+        try:
+            result = _run_once(cmd, timeout, input=input, cwd=cwd, env=env)
+            if check and result.returncode != 0:
+                raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+            return result
+        except ToolCancelledError:
+            raise
+        except ToolTimeoutError:
+            if not retry_on_timeout or attempt >= retries or _cancel_event.is_set():
+                raise
+            logging.warning(f"[process_utils] Retrying after timeout ({attempt + 1}/{retries}): {cmd[0]}")
+        except (subprocess.CalledProcessError, OSError) as e:
+            if attempt >= retries or not _is_transient(e):
+                raise
+            logging.warning(f"[process_utils] Transient failure ({e}); retrying ({attempt + 1}/{retries}): {cmd[0]}")
+        delay = backoff * (2 ** attempt)
+        if _cancel_event.wait(delay):
+            raise ToolCancelledError(f"Cancelled during retry backoff: {cmd[0]}")
+        attempt += 1
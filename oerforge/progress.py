@@ -0,0 +1,152 @@
+"""
+progress.py
+-----------
+Streaming NDJSON Progress Log
+
+Writes one JSON line per finished job to a progress file as results arrive, and shows a live
+counter with an ETA on the console. The file is flushed after every line, so a crashed or
+interrupted run still leaves a complete record of everything that finished; summaries are
+built by reading the stream back (read_progress).
+
+Usage:
+    with ProgressLog('build/conversion_progress.ndjson', total=len(jobs), run_id=run_id) as progress:
+        for result in results_as_they_complete:
+            progress.record(result)
+    results = read_progress('build/conversion_progress.ndjson', run_id=run_id)
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+
+CONSOLE_INTERVAL = 5.0  # seconds between progress lines when the console is not a terminal
+
+def format_eta(seconds):
+    """
+    Format a duration in seconds as e.g. 45s, 3m05s or 1h02m.
+    """
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}m"
+
+class ProgressLog:
+    """
+    Thread-safe NDJSON progress writer with a console counter.
+    Each record gets the run_id, a timestamp, and the output size in bytes (if the output exists).
+    """
+
+    def __init__(self, path, total, run_id=None, label="progress", append=False, stream=None):
+        self.path = path
+        self.total = total
+        self.run_id = run_id
+        self.label = label
+        self.stream = stream or sys.stdout
+        self.done = 0
+        self.counts = {}
+        self._append = append
+        self._file = None
+        self._lock = threading.Lock()
+        self._start = None
+        self._last_print = 0.0
+        self._tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+
+    def open(self):
+        """
+        Open the progress file (truncated unless append=True). Returns self.
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._file = open(self.path, 'a' if self._append else 'w', encoding='utf-8')
+        self._start = time.monotonic()
+        return self
+
+    def record(self, result):
+        """
+        Append one finished job to the stream and update the console counter.
+        """
+        line = dict(result)
+        line.setdefault('run_id', self.run_id)
+        line['recorded_at'] = time.time()
+        output = line.get('output')
+        line['output_size'] = os.path.getsize(output) if output and os.path.isfile(output) else None
+        with self._lock:
+            self._file.write(json.dumps(line) + '\n')
+            self._file.flush()
+            self.done += 1
+            status = line.get('status', 'unknown')
+            self.counts[status] = self.counts.get(status, 0) + 1
+            self._print_counter()
+
+    def _print_counter(self):
+        now = time.monotonic()
+        if not self._tty and now - self._last_print < CONSOLE_INTERVAL and self.done < self.total:
+            return
+        self._last_print = now
+        elapsed = now - self._start
+        counts = ' '.join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+        pct = (100 * self.done // self.total) if self.total else 100
+        text = f"[{self.label}] {self.done}/{self.total} ({pct}%) {counts}"
+        if self.done and self.done < self.total:
+            text += f"  ETA {format_eta(elapsed / self.done * (self.total - self.done))}"
+        elif self.done >= self.total:
+            text += f"  in {format_eta(elapsed)}"
+        if self._tty:
+            end = '\n' if self.done >= self.total else ''
+            self.stream.write('\r\033[K' + text + end)
+        else:
+            self.stream.write(text + '\n')
+        self.stream.flush()
+
+    def close(self):
+        """
+        Close the progress file, finishing the console line.
+        """
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                if self._tty and 0 < self.done < self.total:
+                    self.stream.write('\n')
+                    self.stream.flush()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def read_progress(path, run_id=None):
+    """
+    Read a progress stream back as a list of dicts (optionally only one run's records).
+    A truncated last line, left by a crash mid-write, is ignored.
+    """
+    if not os.path.exists(path):
+        return []
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if run_id is None or record.get('run_id') == run_id:
+                records.append(record)
+    return records
+
+def latest_records(records, key='output'):
+    """
+    Keep only the last record per key (e.g. a job cancelled and later rerun in a resumed run),
+    in order of first appearance.
+    """
+    latest = {}
+    for record in records:
+        latest[record.get(key)] = record
+    return list(latest.values())
@@ -22,6 +22,9 @@ from oerforge.db_utils import (
     get_records,
     initialize_database,
     create_tables,
+    canonical_build_path,
+    refresh_canonical_paths,
+    relink_accessibility_results,
     db_log
 )
 
@@ -225,6 +228,7 @@ def build_content_record(
             'title': title,
             'source_path': rel_source_path,
             'output_path': output_path_db,
+            'canonical_path': canonical_build_path(output_path_db),
             'is_autobuilt': 0,
             'mime_type': ext,
             'can_convert_md': flags['can_convert_md'],
@@ -262,6 +266,7 @@ def build_content_record(
             'title': title,
             'source_path': None,
             'output_path': output_path_db,
+            'canonical_path': canonical_build_path(output_path_db),
             'is_autobuilt': 1,
             'mime_type': 'section',
             'can_convert_md': False,
@@ -502,6 +507,9 @@ def scan_toc_and_populate_db(config_path, db_path=DB_PATH, root_dir=PROJECT_ROOT
         logging.error(f"Commit failed in scan_toc_and_populate_db: {e}\\n{traceback.format_exc()}")
         if not DEBUG_MODE:
             raise
+    # Stored accessibility results survive the rescan; attach them to the new content ids
+    refresh_canonical_paths(conn)
+    relink_accessibility_results(conn)
     import mimetypes
     rel_file_paths = [os.path.relpath(p, root_dir) for p in file_paths if os.path.exists(p)]
     contents = batch_read_files(rel_file_paths)
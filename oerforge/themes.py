@@ -0,0 +1,254 @@
+"""
+themes.py
+---------
+Theme Contrast Analyzer
+
+Checks the colour palettes in static/themes/*.yml against the WCAG contrast thresholds
+once per theme, instead of leaving Pa11y to report the same palette problem on every page.
+
+For each theme, every meaningful foreground/background pair (CONTRAST_PAIRS) gets a
+contrast ratio, computed for all themes at once with NumPy. Results are cached in
+cache/theme_contrast.json, keyed by each theme file's SHA-256, so only edited themes are
+recomputed.
+
+Pair kinds and their minimum ratios (AA / AAA):
+- text: body text, links and buttons (4.5 / 7)
+- large: headings (3 / 4.5)
+- ui: borders and other non-text components (3 / 3, SC 1.4.11)
+
+Usage:
+    python -m oerforge.themes [--level AAA] [--theme dark]
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import yaml
+
+# --- Constants ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THEMES_DIR = os.path.join(PROJECT_ROOT, 'static', 'themes')
+CACHE_PATH = os.path.join(PROJECT_ROOT, 'cache', 'theme_contrast.json')
+# Bump when CONTRAST_PAIRS or the ratio math change so cached results are recomputed
+ANALYZER_VERSION = 1
+# (foreground key, background key, kind)
+CONTRAST_PAIRS = (
+    ('color_fg', 'color_bg', 'text'),
+    ('color_fg', 'color_card', 'text'),
+    ('color_link', 'color_bg', 'text'),
+    ('color_link', 'color_card', 'text'),
+    ('color_link_hover', 'color_bg', 'text'),
+    ('color_menu', 'color_bg', 'text'),
+    ('color_btn_text', 'color_btn', 'text'),
+    ('color_btn_hover_text', 'color_btn_hover', 'text'),
+    ('color_title', 'color_bg', 'large'),
+    ('color_border', 'color_bg', 'ui'),
+)
+MIN_RATIOS = {
+    'AA': {'text': 4.5, 'large': 3.0, 'ui': 3.0},
+    'AAA': {'text': 7.0, 'large': 4.5, 'ui': 3.0},
+}
+
+def parse_color(value):
+    """
+    Return (r, g, b) in 0-255 for a '#rgb', '#rrggbb' or '#rrggbbaa' colour, or None.
+    """
+    if not isinstance(value, str):
+        return None
+    text = value.strip().lstrip('#')
+    if len(text) in (3, 4):
+        text = ''.join(c * 2 for c in text[:3])
+    elif len(text) == 8:
+        text = text[:6]
+    if len(text) != 6:
+        return None
+    try:
+        return tuple(int(text[i:i + 2], 16) for i in (0, 2, 4))
+    except ValueError:
+        return None
+
+def load_theme(path):
+    """
+    Return (name, colors dict) from a theme YAML file.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f) or {}
+    name = (data.get('theme') or {}).get('name') or os.path.splitext(os.path.basename(path))[0]
+    return name, data.get('colors') or {}
+
+def theme_hash(path):
+    """
+    Return the SHA-256 of a theme file's bytes.
+    """
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def contrast_ratios(foregrounds, backgrounds):
+    """
+    Return WCAG contrast ratios for two equal-length lists of (r, g, b) colours, as a NumPy array.
+    """
+    import numpy as np
+    colors = np.asarray([foregrounds, backgrounds], dtype=float).reshape(2, -1, 3) / 255.0
+    linear = np.where(colors <= 0.04045, colors / 12.92, ((colors + 0.055) / 1.055) ** 2.4)
+    luminance = linear @ np.array([0.2126, 0.7152, 0.0722])
+    lighter = luminance.max(axis=0)
+    darker = luminance.min(axis=0)
+    return (lighter + 0.05) / (darker + 0.05)
+
+def analyze_palettes(palettes):
+    """
+    Compute the contrast of every CONTRAST_PAIRS pair in every palette.
+    palettes: {theme name: colors dict}. Returns {theme name: [result dict]}; a pair whose
+    colours are missing is skipped, one with an unparseable colour is reported with ratio None.
+    """
+    results = {name: [] for name in palettes}
+    pending = []   # result dicts whose colours both parsed
+    foregrounds = []
+    backgrounds = []
+    for name, colors in palettes.items():
+        for fg_key, bg_key, kind in CONTRAST_PAIRS:
+            if fg_key not in colors or bg_key not in colors:
+                continue
+            result = {'fg': fg_key, 'bg': bg_key, 'kind': kind, 'fg_color': colors[fg_key], 'bg_color': colors[bg_key], 'ratio': None}
+            results[name].append(result)
+            fg, bg = parse_color(colors[fg_key]), parse_color(colors[bg_key])
+            if fg is None or bg is None:
+                continue
+            pending.append(result)
+            foregrounds.append(fg)
+            backgrounds.append(bg)
+    if pending:
+        for result, ratio in zip(pending, contrast_ratios(foregrounds, backgrounds).tolist()):
+            result['ratio'] = round(ratio, 2)
+    return results
+
+def analyze_themes(themes_dir=None, cache_path=None, force=False):
+    """
+    Return {theme name: [result dict]} for every theme in themes_dir, recomputing only
+    themes whose file hash is not in the cache. Returns None if NumPy is not installed.
+    """
+    themes_dir = themes_dir or THEMES_DIR
+    cache_path = cache_path or CACHE_PATH
+    cached = {}
+    if not force and os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == ANALYZER_VERSION:
+                cached = data.get('themes', {})
+        except (OSError, ValueError) as e:
+            logging.warning(f"[THEMES] Ignoring unreadable contrast cache {cache_path}: {e}")
+    if not os.path.isdir(themes_dir):
+        logging.warning(f"[THEMES] Theme directory not found: {themes_dir}")
+        return {}
+
+    entries = {}
+    palettes = {}
+    for filename in sorted(os.listdir(themes_dir)):
+        if not filename.endswith(('.yml', '.yaml')):
+            continue
+        path = os.path.join(themes_dir, filename)
+        digest = theme_hash(path)
+        entry = cached.get(filename)
+        if entry and entry.get('hash') == digest:
+            entries[filename] = entry
+            continue
+        try:
+            name, colors = load_theme(path)
+        except yaml.YAMLError as e:
+            logging.error(f"[THEMES] Could not parse {path}: {e}")
+            continue
+        entries[filename] = {'hash': digest, 'name': name}
+        palettes[filename] = colors
+
+    if palettes:
+        try:
+            import numpy  # noqa: F401
+        except ImportError:
+            logging.error("numpy is not installed. Run 'pip install numpy' to check theme contrast.")
+            return None
+        for filename, results in analyze_palettes(palettes).items():
+            entries[filename]['results'] = results
+        logging.info(f"[THEMES] Analyzed {len(palettes)} theme(s); {len(entries) - len(palettes)} unchanged")
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': ANALYZER_VERSION, 'themes': entries}, f, indent=2)
+        os.replace(tmp_path, cache_path)
+    return {entry['name']: entry['results'] for entry in entries.values()}
+
+def site_themes(content_yml):
+    """
+    Return the theme names the site uses (site.theme in _content.yml), or None if unset.
+    """
+    if not os.path.exists(content_yml):
+        return None
+    with open(content_yml, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    theme = (config.get('site') or {}).get('theme')
+    if isinstance(theme, dict):
+        return sorted({name for name in theme.values() if isinstance(name, str)}) or None
+    return [theme] if isinstance(theme, str) else None
+
+def contrast_failures(analysis, level='AA'):
+    """
+    Return [(theme name, result dict, required ratio)] for pairs below the level's minimum
+    (or with an unparseable colour). level may be 'AA', 'AAA' or a Pa11y standard like 'WCAG2AAA'.
+    """
+    level = 'AAA' if str(level).upper().endswith('AAA') else 'AA'
+    failures = []
+    for name, results in sorted(analysis.items()):
+        for result in results:
+            required = MIN_RATIOS[level][result['kind']]
+            if result['ratio'] is None or result['ratio'] < required:
+                failures.append((name, result, required))
+    return failures
+
+def format_failure(name, result, required):
+    """
+    One-line description of a failing pair.
+    """
+    if result['ratio'] is None:
+        return f"{name}: {result['fg']} {result['fg_color']!r} on {result['bg']} {result['bg_color']!r} is not a valid colour"
+    return (f"{name}: {result['fg']} {result['fg_color']} on {result['bg']} {result['bg_color']} "
+            f"is {result['ratio']}:1, needs {required}:1 ({result['kind']})")
+
+def report_theme_contrast(level='AA', themes=None, themes_dir=None, cache_path=None):
+    """
+    Analyze the themes and log every failing pair once. themes limits the report to the
+    named themes. Returns the list of failures (empty if NumPy is unavailable).
+    """
+    analysis = analyze_themes(themes_dir, cache_path)
+    if analysis is None:
+        return []
+    if themes:
+        analysis = {name: results for name, results in analysis.items() if name in themes}
+    failures = contrast_failures(analysis, level)
+    for failure in failures:
+        logging.warning(f"[THEMES] Contrast: {format_failure(*failure)}")
+    logging.info(f"[THEMES] {len(analysis)} theme(s) checked at {level}: {len(failures)} failing pair(s)")
+    return failures
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Check theme palettes against WCAG contrast ratios.")
+    parser.add_argument("--level", default="AA", help="AA or AAA (or a Pa11y standard such as WCAG2AAA)")
+    parser.add_argument("--theme", action="append", help="Only report this theme (repeatable)")
+    parser.add_argument("--force", action="store_true", help="Ignore the cache and recompute every theme")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    analysis = analyze_themes(force=args.force)
+    if analysis is None:
+        return 1
+    if args.theme:
+        analysis = {name: results for name, results in analysis.items() if name in args.theme}
+    failures = contrast_failures(analysis, args.level)
+    for failure in failures:
+        print(format_failure(*failure))
+    print(f"{len(analysis)} theme(s), {len(failures)} failing pair(s) at {args.level}")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
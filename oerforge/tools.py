@@ -0,0 +1,170 @@
+"""
+tools.py
+--------
+External Tool Capability Probe
+
+Detects the external tools the build shells out to (Pandoc, the LaTeX engines, Pa11y) once
+per run: which binaries exist, their versions and, for Pandoc, the output formats it
+supports. Probing means starting each tool, so results are cached in cache/tools.json and
+reused until PATH or the mtime of any probed binary changes.
+
+The probe is used to prune jobs that cannot run before any work starts (a missing Pandoc
+is reported once instead of failing every conversion), and the tool versions form the
+toolchain stamp recorded with every conversion result, so upgrading Pandoc or LaTeX marks
+the affected outputs stale.
+
+Usage:
+    from oerforge import tools
+    ok, reason = tools.can_convert('.md', '.pdf')
+    stamp = tools.toolchain_stamp('.md', '.pdf')   # e.g. 'pandoc 3.1.9; pdfTeX 3.141592653-2.6-1.40.25 (TeX Live 2023)'
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import logging
+import threading
+
+try:
+    from . import process_utils
+except ImportError:
+    import process_utils
+
+# --- Constants ---
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(PROJECT_ROOT, 'cache', 'tools.json')
+PROBE_TIMEOUT = 60
+# Tool name -> arguments that print its version on the first line of stdout
+VERSION_ARGS = {
+    'pandoc': ['--version'],
+    'pdflatex': ['--version'],
+    'xelatex': ['--version'],
+    'lualatex': ['--version'],
+    'pa11y': ['--version'],
+}
+PDF_ENGINE = 'pdflatex'  # Pandoc's default LaTeX engine
+# Target extension -> Pandoc output format it needs
+PANDOC_OUTPUT_FORMATS = {
+    '.txt': 'plain',
+    '.tex': 'latex',
+    '.pdf': 'latex',
+    '.docx': 'docx',
+    '.epub': 'epub',
+}
+# Conversions done in-process (no external tool)
+NATIVE_CONVERSIONS = {('.md', '.md'), ('.ipynb', '.md')}
+
+_probe_lock = threading.Lock()
+_probed = None
+
+def probe_key(names=tuple(VERSION_ARGS)):
+    """
+    Return the cache key for a probe: PATH plus the location and mtime of every tool binary.
+    """
+    parts = [os.environ.get('PATH', '')]
+    for name in names:
+        path = shutil.which(name)
+        mtime = os.path.getmtime(path) if path else None
+        parts.append(f"{name}={path}:{mtime}")
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+def _probe_one(name, path):
+    """
+    Run one tool's version command (and, for Pandoc, list its output formats).
+    Returns {path, version, formats}; version is None if the tool failed to run.
+    """
+    info = {'path': path, 'version': None, 'formats': None}
+    runner = process_utils.get_runner()
+    result = runner.submit([path] + VERSION_ARGS[name], timeout=PROBE_TIMEOUT).result()
+    if result.error is not None or result.timed_out or result.returncode != 0:
+        logging.warning(f"[TOOLS] {name} at {path} did not report a version: {result.error or result.stderr.strip()}")
+        return info
+    lines = result.stdout.strip().splitlines()
+    info['version'] = lines[0].strip() if lines else ''
+    if name == 'pandoc':
+        formats = runner.submit([path, '--list-output-formats'], timeout=PROBE_TIMEOUT).result()
+        if formats.error is None and formats.returncode == 0:
+            info['formats'] = formats.stdout.split()
+    return info
+
+def probe_tools(cache_path=None, force=False):
+    """
+    Return {tool name: {path, version, formats}} for every available tool; missing tools are absent.
+    The result is memoized for the process and cached on disk keyed by probe_key().
+    """
+    global _probed
+    cache_path = cache_path or CACHE_PATH
+    with _probe_lock:
+        if _probed is not None and not force:
+            return _probed
+        key = probe_key()
+        if not force and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    cached = json.load(f)
+                if cached.get('key') == key:
+                    _probed = cached['tools']
+                    return _probed
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"[TOOLS] Ignoring unreadable tool cache {cache_path}: {e}")
+        found = {name: shutil.which(name) for name in VERSION_ARGS}
+        tools = {}
+        for name, path in found.items():
+            if path:
+                tools[name] = _probe_one(name, path)
+        missing = sorted(name for name, path in found.items() if not path)
+        summary = ', '.join(f"{name} ({info['version']})" for name, info in sorted(tools.items())) or 'none'
+        logging.info(f"[TOOLS] Found: {summary}" + (f"; missing: {', '.join(missing)}" if missing else ''))
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': key, 'tools': tools}, f, indent=2)
+        os.replace(tmp_path, cache_path)
+        _probed = tools
+        return tools
+
+def tool_version(name, tools=None):
+    """
+    Return a tool's version line, or None if it is not available.
+    """
+    tools = probe_tools() if tools is None else tools
+    info = tools.get(name)
+    return info['version'] if info else None
+
+def required_tools(input_ext, output_ext):
+    """
+    Return the external tools a conversion runs, in order (e.g. ['pandoc', 'pdflatex'] for PDF).
+    """
+    if (input_ext, output_ext) in NATIVE_CONVERSIONS:
+        return []
+    if output_ext not in PANDOC_OUTPUT_FORMATS:
+        return []
+    if output_ext == '.pdf':
+        return ['pandoc', PDF_ENGINE]
+    return ['pandoc']
+
+def can_convert(input_ext, output_ext, tools=None):
+    """
+    Return (ok, reason): whether the tools a conversion needs are installed and support it.
+    """
+    tools = probe_tools() if tools is None else tools
+    for name in required_tools(input_ext, output_ext):
+        info = tools.get(name)
+        if not info:
+            return False, f"{name} not found in PATH"
+        if info['version'] is None:
+            return False, f"{name} at {info['path']} does not run"
+        if name == 'pandoc' and info.get('formats') is not None:
+            fmt = PANDOC_OUTPUT_FORMATS[output_ext]
+            if fmt not in info['formats']:
+                return False, f"pandoc {info['version']} cannot write {fmt}"
+    return True, None
+
+def toolchain_stamp(input_ext, output_ext, tools=None):
+    """
+    Return the versions of the tools a conversion runs, as one string ('' for native conversions).
+    Recorded with each conversion result; a change marks the output stale.
+    """
+    tools = probe_tools() if tools is None else tools
+    return '; '.join(tool_version(name, tools) or f"{name} missing" for name in required_tools(input_ext, output_ext))
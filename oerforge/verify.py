@@ -1,10 +1,38 @@
 import os
 import sys
+import zlib
 import sqlite3
-import subprocess
 import json
+import time
+import hashlib
+import threading
+import concurrent.futures
+from html.parser import HTMLParser
 from typing import Optional, Dict, Any, List
 import logging
+from oerforge.process_utils import get_runner
+from oerforge import tools
+from oerforge import badges
+from oerforge import themes
+from oerforge import wcag as wcag_standards
+from oerforge.db_utils import canonical_build_path, refresh_canonical_paths, relink_accessibility_results
+from oerforge.db_writer import DBWriter, AccessibilityResult, INTENT_HANDLERS
+from oerforge.pa11y_pool import Pa11yPool, Pa11yPoolError, load_page_options, DEFAULT_CONCURRENCY, DEFAULT_WORKERS
+
+# Seconds before a single Pa11y run (Node + headless Chromium) is killed.
+PA11Y_TIMEOUT = 120
+# pa11y_json payloads larger than this (bytes of JSON) are stored zlib-compressed
+PA11Y_JSON_COMPRESS_BYTES = 4096
+# Pre-lint results are stored in accessibility_results under this wcag_level
+PRELINT_LEVEL = "prelint"
+# Bump when the pre-lint rules change so stored results are recomputed
+PRELINT_VERSION = "prelint-1"
+PRELINT_CODE_PREFIX = "prelint."
+PRELINT_WORKERS = os.cpu_count() or 1
+PRELINT_MIN_PARALLEL = 64  # smaller builds are linted in-process
+HEADING_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6")
+# Threads rendering WCAG reports
+REPORT_WORKERS = min(8, os.cpu_count() or 1)
 
 logging.basicConfig(
     filename="log/pa11y.log",
@@ -28,76 +56,291 @@ def load_pa11y_config(yml_path: str = "_content.yml") -> dict:
 
 
 # --- Pa11y Integration ---
-def run_pa11y_on_file(html_path: str, config_path: Optional[str] = None, wcag_level: str = "AA") -> Optional[List[Dict[str, Any]]]:
-    """
-    Run Pa11y on a single HTML file. Returns parsed JSON result, or None on error.
-    Accepts config_path and wcag_level ("AA" or "AAA").
-    """
+def pa11y_standard(wcag_level: str) -> str:
+    """Map a WCAG level ("AA", "AAA") or standard name ("WCAG22AAA") to the standard Pa11y runs."""
+    try:
+        return wcag_standards.runner_standard(wcag_level)
+    except ValueError:
+        return "WCAG2AA"
+
+def build_pa11y_cmd(html_path: str, config_path: Optional[str] = None, wcag_level: str = "AA") -> List[str]:
+    """Build the Pa11y command line for one HTML file."""
     html_abs = os.path.abspath(html_path)
     pa11y_cmd = ["pa11y", f"file://{html_abs}", "--reporter", "json"]
     # Add WCAG level as --standard
-    if wcag_level.upper() == "AAA":
-        pa11y_cmd.extend(["--standard", "WCAG2AAA"])
-    else:
-        pa11y_cmd.extend(["--standard", "WCAG2AA"])
+    pa11y_cmd.extend(["--standard", pa11y_standard(wcag_level)])
     if config_path:
         pa11y_cmd.extend(["--config", os.path.abspath(config_path)])
-    try:
-        logging.info(f"Running Pa11y on {html_path} with command: {' '.join(pa11y_cmd)}")
-        result = subprocess.run(pa11y_cmd, capture_output=True, text=True, check=True)
-        logging.info(f"Pa11y output for {html_path}: {result.stdout}")
-        return json.loads(result.stdout)
-    except FileNotFoundError:
+    return pa11y_cmd
+
+def parse_pa11y_result(html_path: str, result) -> Optional[List[Dict[str, Any]]]:
+    """
+    Turn a process_utils.ToolResult from Pa11y into the parsed JSON issue list, or None on error.
+    Pa11y exits non-zero when it finds issues, so stdout is parsed regardless of the exit code.
+    """
+    if isinstance(result.error, FileNotFoundError):
         logging.error("Pa11y is not installed or not found in PATH.")
         return None
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Pa11y failed for {html_path}: {e.stderr}")
-        try:
-            return json.loads(e.stdout)
-        except Exception as parse_err:
-            logging.error(f"Failed to parse Pa11y JSON output after error: {parse_err}")
-            return None
+    if result.error is not None:
+        logging.error(f"Pa11y could not start for {html_path}: {result.error}")
+        return None
+    if result.timed_out:
+        logging.error(f"Pa11y timed out after {PA11Y_TIMEOUT}s for {html_path}; process group killed.")
+        return None
+    if result.returncode != 0:
+        logging.error(f"Pa11y exited with {result.returncode} for {html_path}: {result.stderr}")
+    logging.info(f"Pa11y output for {html_path}: {result.stdout}")
+    try:
+        return json.loads(result.stdout)
     except json.JSONDecodeError:
         logging.error(f"Failed to parse Pa11y JSON output for {html_path}.")
         return None
 
+def run_pa11y_on_file(html_path: str, config_path: Optional[str] = None, wcag_level: str = "AA") -> Optional[List[Dict[str, Any]]]:
+    """
+    Run Pa11y on a single HTML file. Returns parsed JSON result, or None on error.
+    Accepts config_path and wcag_level ("AA" or "AAA").
+    """
+    pa11y_cmd = build_pa11y_cmd(html_path, config_path, wcag_level)
+    logging.info(f"Running Pa11y on {html_path} with command: {' '.join(pa11y_cmd)}")
+    result = get_runner().submit(pa11y_cmd, timeout=PA11Y_TIMEOUT).result()
+    return parse_pa11y_result(html_path, result)
+
+def check_pages(html_paths: List[str], config_path: Optional[str] = None, wcag_level: str = "AA",
+                concurrency: int = DEFAULT_CONCURRENCY, workers: int = DEFAULT_WORKERS):
+    """
+    Check many pages with Pa11y; yields (html_path, parsed issues or None) as pages finish.
+    Pages go to a pool of long-lived Pa11y workers that reuse their browsers; if the pool
+    cannot start, each page runs the Pa11y CLI through the shared process runner instead.
+    """
+    if not html_paths:
+        return
+    options, launch_config = load_page_options(config_path, pa11y_standard(wcag_level))
+    try:
+        pool = Pa11yPool(concurrency=concurrency, workers=workers, launch_config=launch_config, timeout=PA11Y_TIMEOUT).start()
+    except Pa11yPoolError as e:
+        logging.warning(f"Pa11y worker pool unavailable ({e}); falling back to one Pa11y CLI run per page.")
+        cmds = {tuple(build_pa11y_cmd(path, config_path, wcag_level)): path for path in html_paths}
+        for cmd, tool_result in get_runner().map([list(cmd) for cmd in cmds], timeout=PA11Y_TIMEOUT):
+            html_path = cmds[tuple(cmd)]
+            yield html_path, parse_pa11y_result(html_path, tool_result)
+        return
+    with pool:
+        items = [(path, f"file://{os.path.abspath(path)}", options) for path in html_paths]
+        for html_path, response in pool.check_many(items):
+            if response.get("error"):
+                logging.error(f"Pa11y failed for {html_path}: {response['error']}")
+                yield html_path, None
+            else:
+                yield html_path, response.get("issues", [])
+
+# --- Change Detection ---
+def checked_html_hash(html: str, logo_info: dict) -> str:
+    """
+    Hash a page's HTML as Pa11y sees it, with any injected badge removed, so a page whose
+    only change is its badge hashes the same as before the badge was injected.
+    Pages rendered with the badge markers are hashed without parsing them.
+    """
+    if badges.BADGE_START in html:
+        return hashlib.sha256(badges.splice_badge(html, "")[0].encode('utf-8')).hexdigest()
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    remove_badges(soup, logo_info)
+    return hashlib.sha256(str(soup).encode('utf-8')).hexdigest()
+
+def pa11y_config_hash(config_path: Optional[str], wcag_level: str, standards: Optional[List[str]] = None) -> str:
+    """Hash the Pa11y config file contents together with the standard checked (and the standards its results are split into)."""
+    digest = hashlib.sha256(pa11y_standard(wcag_level).encode('utf-8'))
+    if standards:
+        digest.update(",".join(standards).encode('utf-8'))
+    if config_path and os.path.exists(config_path):
+        with open(config_path, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+def get_cached_result(content_id: int, wcag_level: str, html_hash: str, config_hash: str, conn) -> Optional[List[Dict[str, Any]]]:
+    """Return the stored Pa11y issues for a page if it was last checked with the same HTML and config, else None."""
+    row = conn.execute("""
+        SELECT pa11y_json FROM accessibility_results
+        WHERE content_id = ? AND wcag_level = ? AND html_hash = ? AND config_hash = ?
+        ORDER BY id DESC LIMIT 1
+    """, (content_id, wcag_level, html_hash, config_hash)).fetchone()
+    if row is None or row[0] is None:
+        return None
+    try:
+        return decode_pa11y_json(row[0])
+    except (json.JSONDecodeError, zlib.error, UnicodeDecodeError):
+        return None
+
+def get_cached_results(content_id: int, levels: List[str], html_hash: str, config_hash: str, conn) -> Optional[Dict[str, List[Dict[str, Any]]]]:
+    """Return {level: issues} if every level has a stored result for this HTML and config, else None."""
+    results = {}
+    for level in levels:
+        issues = get_cached_result(content_id, level, html_hash, config_hash, conn)
+        if issues is None:
+            return None
+        results[level] = issues
+    return results
+
+def get_stored_result(content_id: int, wcag_level: str, conn):
+    """Return (html_hash, issues) of a page's last stored Pa11y result, or (None, None)."""
+    row = conn.execute(
+        "SELECT html_hash, pa11y_json FROM accessibility_results WHERE content_id = ? AND wcag_level = ? ORDER BY id DESC LIMIT 1",
+        (content_id, wcag_level)
+    ).fetchone()
+    if row is None:
+        return None, None
+    try:
+        return row[0], decode_pa11y_json(row[1])
+    except (json.JSONDecodeError, zlib.error, UnicodeDecodeError):
+        return None, None
+
+# --- Pre-lint ---
+class _PrelintParser(HTMLParser):
+    """
+    Streaming checks for WCAG failures visible in the static HTML: images without alt text,
+    links without an accessible name, skipped heading levels, duplicate ids and a missing lang.
+    Issues use Pa11y's shape (type, code, message, context, selector) with runner 'prelint'.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.issues = []
+        self.ids = set()
+        self.saw_html = False
+        self.heading_level = 0
+        self.links = []  # open <a href> elements: [context, selector, has_name]
+
+    def add(self, kind, rule, message, context, selector):
+        self.issues.append({
+            'type': kind, 'code': f"{PRELINT_CODE_PREFIX}{rule}", 'message': f"{message} (line {self.getpos()[0]})",
+            'context': context, 'selector': selector, 'runner': 'prelint',
+        })
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        context = self.get_starttag_text()
+        element_id = attrs.get('id')
+        selector = f"{tag}#{element_id}" if element_id else tag
+        if element_id:
+            if element_id in self.ids:
+                self.add('error', 'duplicate-id', f"Duplicate id attribute value \"{element_id}\"", context, selector)
+            self.ids.add(element_id)
+        if tag == 'html':
+            self.saw_html = True
+            if not (attrs.get('lang') or '').strip():
+                self.add('error', 'html-lang', "The html element has no lang attribute", context, selector)
+        elif tag == 'img' or (tag == 'input' and (attrs.get('type') or '').lower() == 'image'):
+            if 'alt' not in attrs and not attrs.get('aria-label') and not attrs.get('aria-labelledby'):
+                self.add('error', 'img-alt', "Image has no alt attribute", context, selector)
+            elif self.links and (attrs.get('alt') or attrs.get('aria-label') or '').strip():
+                self.links[-1][2] = True
+        elif tag in HEADING_TAGS:
+            level = int(tag[1])
+            if self.heading_level and level > self.heading_level + 1:
+                self.add('warning', 'heading-order', f"Heading level skipped: h{self.heading_level} followed by h{level}", context, selector)
+            self.heading_level = level
+        elif tag == 'a' and 'href' in attrs:
+            named = any((attrs.get(name) or '').strip() for name in ('aria-label', 'aria-labelledby', 'title'))
+            self.links.append([context, selector, named])
+
+    def handle_data(self, data):
+        if self.links and data.strip():
+            self.links[-1][2] = True
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self.links:
+            context, selector, named = self.links.pop()
+            if not named:
+                self.add('error', 'link-name', "Link has no text or accessible name", context, selector)
+
+    def close(self):
+        super().close()
+        if not self.saw_html:
+            self.add('error', 'html-lang', "The page has no html element with a lang attribute", '', 'html')
+
+def prelint_html(html: str) -> List[Dict[str, Any]]:
+    """Return the pre-lint issues for a page's HTML."""
+    parser = _PrelintParser()
+    parser.feed(html)
+    parser.close()
+    return parser.issues
+
+def prelint_page(html_path: str, logo_info: dict):
+    """Read a built page once; returns (html_path, checked_html_hash, pre-lint issues)."""
+    with open(html_path, "r", encoding="utf-8") as f:
+        html = f.read()
+    return html_path, checked_html_hash(html, logo_info), prelint_html(html)
+
+def prelint_pages(html_paths: List[str], logo_info: dict, workers: int = PRELINT_WORKERS):
+    """Hash and pre-lint pages on a process pool; yields (html_path, html_hash, issues)."""
+    if workers <= 1 or len(html_paths) < PRELINT_MIN_PARALLEL:
+        for html_path in html_paths:
+            yield prelint_page(html_path, logo_info)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(html_paths) // (workers * 4))
+        yield from executor.map(prelint_page, html_paths, [logo_info] * len(html_paths), chunksize=chunksize)
+
 # --- DB Operations ---
-def get_content_id_for_file(html_path: str, conn) -> Optional[int]:
-    """Get the content_id for a given HTML file from the DB."""
-    # Normalize path for DB comparison
-    html_path = os.path.abspath(html_path)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, output_path FROM content")
-    for row in cursor.fetchall():
-        db_id, db_path = row
-        if os.path.abspath(db_path) == html_path:
-            return db_id
-    logging.warning(f"No content_id found for {html_path}")
-    return None
-
-def store_accessibility_result(content_id: int, pa11y_json: List[Dict[str, Any]], badge_html: str, wcag_level: str, error_count: int, warning_count: int, notice_count: int, conn=None):
-    """Store the latest accessibility result for a page in the database."""
+def get_content_id_for_file(html_path: str, conn, build_dir: str = "build") -> Optional[int]:
+    """Get the content_id for a given HTML file from the DB (indexed lookup on content.canonical_path)."""
+    canonical = canonical_build_path(html_path, build_dir)
+    row = conn.execute("SELECT id FROM content WHERE canonical_path = ? LIMIT 1", (canonical,)).fetchone()
+    if row is None:
+        logging.debug(f"No content_id found for {html_path}")
+        return None
+    return row[0]
+
+def build_content_index(conn, build_dir: str = "build") -> Dict[str, int]:
+    """
+    Return {canonical build-relative path: content_id} for one verification run,
+    backfilling content.canonical_path for rows scanned before the column existed and
+    reattaching stored results to the current content ids.
+    """
+    refresh_canonical_paths(conn, build_dir)
+    relink_accessibility_results(conn)
+    index = {}
+    for content_id, canonical in conn.execute("SELECT id, canonical_path FROM content WHERE canonical_path IS NOT NULL ORDER BY id"):
+        index.setdefault(canonical, content_id)
+    return index
+
+def encode_pa11y_json(issues: List[Dict[str, Any]]):
+    """Serialize Pa11y issues for accessibility_results.pa11y_json; payloads over PA11Y_JSON_COMPRESS_BYTES are stored zlib-compressed."""
+    text = json.dumps(issues)
+    if len(text) > PA11Y_JSON_COMPRESS_BYTES:
+        return sqlite3.Binary(zlib.compress(text.encode('utf-8')))
+    return text
+
+def decode_pa11y_json(value) -> Optional[List[Dict[str, Any]]]:
+    """Inverse of encode_pa11y_json: accepts plain JSON text or a compressed blob."""
+    if value is None:
+        return None
+    if isinstance(value, (bytes, memoryview)):
+        value = zlib.decompress(bytes(value)).decode('utf-8')
+    return json.loads(value)
+
+def build_accessibility_result(content_id: int, issues: List[Dict[str, Any]], badge_html: str, wcag_level: str,
+                               html_hash: Optional[str] = None, config_hash: Optional[str] = None) -> AccessibilityResult:
+    """Build the DBWriter intent for one page's result, with counts and one normalized row per issue."""
+    counts = {kind: sum(1 for i in issues if i.get("type") == kind) for kind in ("error", "warning", "notice")}
+    issue_rows = [
+        (i.get("type"), i.get("code"), i.get("message"), i.get("context"), i.get("selector"), i.get("runner"))
+        for i in issues
+    ]
+    return AccessibilityResult(
+        content_id, wcag_level, encode_pa11y_json(issues), badge_html,
+        counts["error"], counts["warning"], counts["notice"], html_hash, config_hash, issue_rows
+    )
+
+def store_accessibility_result(content_id: int, pa11y_json: List[Dict[str, Any]], badge_html: str, wcag_level: str, error_count: int, warning_count: int, notice_count: int, conn=None, html_hash: Optional[str] = None, config_hash: Optional[str] = None):
+    """Store the latest accessibility result for a page in the database (single-page path; batch runs post to a DBWriter)."""
     if conn is None:
         raise ValueError("A valid database connection is required.")
-    cursor = conn.cursor()
-    # Remove old result for this content_id and wcag_level
-    cursor.execute("""
-        DELETE FROM accessibility_results WHERE content_id = ? AND wcag_level = ?
-    """, (content_id, wcag_level))
-    # Insert new result
-    cursor.execute("""
-        INSERT INTO accessibility_results (
-            content_id, pa11y_json, badge_html, wcag_level, error_count, warning_count, notice_count, checked_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
-    """, (
-        content_id,
-        json.dumps(pa11y_json),
-        badge_html,
-        wcag_level,
-        error_count,
-        warning_count,
-        notice_count
-    ))
+    intent = build_accessibility_result(content_id, pa11y_json, badge_html, wcag_level, html_hash, config_hash)
+    INTENT_HANDLERS[AccessibilityResult](conn.cursor(), [intent._replace(
+        error_count=error_count, warning_count=warning_count, notice_count=notice_count
+    )])
     conn.commit()
 
 # --- Badge and Report Generation ---
@@ -131,25 +374,9 @@ def generate_badge_html(wcag_level: str, error_count: int, logo_info: dict, repo
     logging.info(f"[generate_badge_html] Generated badge HTML for WCAG {wcag_level}: {badge_html}")
     return badge_html
 
-def inject_badge_into_html(html_path: str, badge_html: str, report_link: str, logo_info: dict):
-    """Inject the badge/button into the HTML file after <main>."""
-    # Use BeautifulSoup for robust HTML manipulation
-    try:
-        from bs4 import BeautifulSoup
-        from bs4.element import NavigableString, Tag
-    except ImportError:
-        raise ImportError("BeautifulSoup4 is required. Install with 'pip install beautifulsoup4'.")
-
-    try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            html = f.read()
-    except Exception as e:
-        logging.error(f"[inject_badge_into_html] Failed to read {html_path}: {e}")
-        return
-
-    soup = BeautifulSoup(html, 'html.parser')
-
-    # Remove all previous accessibility report buttons and badges (robust)
+def remove_badges(soup, logo_info: dict) -> int:
+    """Remove every injected accessibility badge/button from a parsed page. Returns the number removed."""
+    from bs4.element import Tag
     removed = 0
     # Remove all <a> with class containing 'wcag-badge' and data-accessibility-report-btn
     for a in soup.find_all('a'):
@@ -188,6 +415,28 @@ def inject_badge_into_html(html_path: str, badge_html: str, report_link: str, lo
                     img.decompose()
                     removed += 1
                     break
+    return removed
+
+def inject_badge_into_html(html_path: str, badge_html: str, report_link: str, logo_info: dict):
+    """Inject the badge/button into the HTML file after <main>."""
+    # Use BeautifulSoup for robust HTML manipulation
+    try:
+        from bs4 import BeautifulSoup
+        from bs4.element import NavigableString, Tag
+    except ImportError:
+        raise ImportError("BeautifulSoup4 is required. Install with 'pip install beautifulsoup4'.")
+
+    try:
+        with open(html_path, 'r', encoding='utf-8') as f:
+            html = f.read()
+    except Exception as e:
+        logging.error(f"[inject_badge_into_html] Failed to read {html_path}: {e}")
+        return
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Remove all previous accessibility report buttons and badges (robust)
+    removed = remove_badges(soup, logo_info)
     if removed > 0:
         logging.info(f"[inject_badge_into_html] Removed {removed} existing accessibility report button/badge blocks in {html_path}")
 
@@ -225,18 +474,9 @@ def inject_badge_into_html(html_path: str, badge_html: str, report_link: str, lo
 
 
 # --- Navigation Menu Generation (ported from make.py) ---
-def generate_nav_menu(context: dict) -> list:
-    import os
-    PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+def menu_links(rows, rel_path: str) -> list:
+    """Turn top-level menu rows (title, relative_link) into links relative to the page at rel_path."""
     menu_items = []
-    rel_path = context.get('rel_path', '')
-    # Query for top-level menu items (menu_context='main', parent_output_path is NULL or empty)
-    sql = "SELECT title, relative_link FROM content WHERE menu_context='main' AND (parent_output_path IS NULL OR parent_output_path = '') ORDER BY \"order\";"
-    cursor.execute(sql)
-    rows = cursor.fetchall()
     for title, relative_link in rows:
         # For Home, always use 'index.html'
         if title and title.lower() == 'home':
@@ -262,100 +502,202 @@ def generate_nav_menu(context: dict) -> list:
         else:
             link = target
         menu_items.append({'title': title, 'link': link})
-    conn.close()
     return menu_items
 
-def generate_wcag_report(html_path: str, issues: List[Dict[str, Any]], badge_html: str, config: dict):
-    """Generate a detailed HTML report for the file using a Jinja2 template that extends baseof.html."""
-    from jinja2 import Environment, FileSystemLoader, select_autoescape
-    # Determine output path: wcag_report_FILENAME.html in same dir as html_path
-    html_dir = os.path.dirname(html_path)
-    html_filename = os.path.basename(html_path)
-    if html_filename.endswith('.html'):
-        report_filename = f"wcag_report_{html_filename}"
-    else:
-        report_filename = f"wcag_report.html"
-    report_path = os.path.join(html_dir, report_filename)
-
-    # Setup Jinja2 environment to search both reports and partials
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../layouts'))
-    template_dirs = [
-        os.path.join(base_dir, 'reports'),
-        os.path.join(base_dir, 'partials'),
-        os.path.join(base_dir, '_default'),
-    ]
-    env = Environment(
-        loader=FileSystemLoader(template_dirs),
-        autoescape=select_autoescape(['html', 'xml'])
-    )
-    template = env.get_template('wcag_report.html')
-
-    # Load site and footer info from _content.yml
-    site_config = load_pa11y_config(os.path.abspath(os.path.join(os.path.dirname(__file__), '../_content.yml')))
-    site = site_config.get('site', {})
-    footer_text = site_config.get('footer', {}).get('text', '')
-
-    # Compute relative asset paths from report location
-    build_dir = os.path.abspath(os.path.join(html_dir, '..'))
-    css_path = os.path.relpath(os.path.join(build_dir, 'css/theme-light.css'), html_dir)
-    js_path = os.path.relpath(os.path.join(build_dir, 'js/main.js'), html_dir)
-    favicon = os.path.relpath(os.path.join(build_dir, 'images/favicon.ico'), html_dir)
-    logo_path = os.path.relpath(os.path.join(build_dir, 'images/logo.png'), html_dir)
-
-    # Try to extract page title from HTML file (fallback to config or filename)
-    page_title = config.get('title', html_filename)
+def load_menu_rows(db_path: str) -> list:
+    """Return the top-level menu rows (menu_context='main', no parent) as (title, relative_link)."""
+    if not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(db_path)
     try:
-        with open(html_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if '<title>' in line:
-                    import re
-                    m = re.search(r'<title>(.*?)</title>', line)
-                    if m:
-                        page_title = m.group(1).strip()
-                        break
-    except Exception:
-        pass
-
-    # Compute relative URL from build/ root
-    build_root = os.path.abspath(os.path.join(html_dir, '..'))
-    relative_url = os.path.relpath(html_path, build_root)
-
-    # Compute rel_path for the report (relative to build/)
-    rel_path = os.path.relpath(report_path, build_root)
-    # Generate the top menu using the same logic as make.py
-    top_menu = generate_nav_menu({'rel_path': rel_path})
-
-    context = {
-        'Title': page_title,  # For {% block title %} in baseof.html
-        'page_title': page_title,
-        'relative_url': relative_url,
-        'site': site,
-        'css_path': css_path,
-        'js_path': js_path,
-        'favicon': favicon,
-        'logo_path': logo_path,
-        'wcag_level': config.get('wcag_level', 'AA'),
-        'error_count': sum(1 for i in issues if i.get('type') == 'error'),
-        'warning_count': sum(1 for i in issues if i.get('type') == 'warning'),
-        'notice_count': sum(1 for i in issues if i.get('type') == 'notice'),
-        'badge_html': badge_html,
-        'issues': issues,
-        'footer_text': footer_text,
-        'top_menu': top_menu,
-        'rel_path': rel_path,
-    }
-
-    # Render and write
-    rendered = template.render(**context)
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(rendered)
-    logging.info(f"Generated WCAG report: {report_path}")
-    return report_path
-
-def process_all_html_files(build_dir="build", wcag="WCAG2AA", config_file=None, db_path="db/sqlite.db"):
+        # Rows are scanned in TOC order; the content table has no "order" column
+        sql = "SELECT title, relative_link FROM content WHERE menu_context='main' AND (parent_output_path IS NULL OR parent_output_path = '') ORDER BY id;"
+        return conn.execute(sql).fetchall()
+    except sqlite3.OperationalError as e:
+        logging.warning(f"[generate_nav_menu] Could not read menu from {db_path}: {e}")
+        return []
+    finally:
+        conn.close()
+
+def generate_nav_menu(context: dict) -> list:
+    PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    db_path = os.path.join(PROJECT_ROOT, 'db', 'sqlite.db')
+    return menu_links(load_menu_rows(db_path), context.get('rel_path', ''))
+
+# --- Report Generation ---
+class ReportRenderer:
+    """
+    Renders the WCAG reports of one build. The template is compiled, _content.yml read and the
+    menu and page titles queried once; the menu is computed once per output directory, and
+    reports are rendered on a thread pool (submit/close) so they keep up with Pa11y.
+    """
+
+    def __init__(self, build_dir: str = "build", db_path: Optional[str] = None,
+                 content_yml: Optional[str] = None, workers: int = REPORT_WORKERS):
+        from jinja2 import Environment, FileSystemLoader, select_autoescape
+        import yaml
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.build_dir = os.path.abspath(build_dir)
+        db_path = db_path or os.path.join(project_root, 'db', 'sqlite.db')
+        content_yml = content_yml or os.path.join(project_root, '_content.yml')
+
+        # Search both reports and partials
+        base_dir = os.path.join(project_root, 'layouts')
+        env = Environment(
+            loader=FileSystemLoader([os.path.join(base_dir, d) for d in ('reports', 'partials', '_default')]),
+            autoescape=select_autoescape(['html', 'xml'])
+        )
+        self.template = env.get_template('wcag_report.html')
+
+        site_config = {}
+        if os.path.exists(content_yml):
+            with open(content_yml, 'r', encoding='utf-8') as f:
+                site_config = yaml.safe_load(f) or {}
+        self.site = site_config.get('site', {})
+        self.footer_text = site_config.get('footer', {}).get('text', '')
+
+        self.menu_rows = load_menu_rows(db_path)
+        self.titles = {}
+        if os.path.exists(db_path):
+            conn = sqlite3.connect(db_path)
+            try:
+                self.titles = dict(conn.execute("SELECT canonical_path, title FROM content WHERE canonical_path IS NOT NULL AND title IS NOT NULL"))
+            except sqlite3.OperationalError as e:
+                logging.warning(f"[ReportRenderer] Could not read page titles from {db_path}: {e}")
+            finally:
+                conn.close()
+
+        self.workers = max(1, workers)
+        self._menus = {}
+        self._menu_lock = threading.Lock()
+        self._executor = None
+        self._futures = []
+        self._failed = False
+        self._started = time.monotonic()
+
+    def menu_for(self, rel_path: str) -> list:
+        """Return the top menu for a report at rel_path (relative to the build dir), cached per directory."""
+        current_dir = os.path.dirname(rel_path)
+        # Section index pages link their own section as "index.html", so they are cached by path
+        is_section_index = rel_path.endswith('index.html') and current_dir and rel_path != 'index.html'
+        key = rel_path if is_section_index else current_dir
+        with self._menu_lock:
+            if key not in self._menus:
+                self._menus[key] = menu_links(self.menu_rows, rel_path)
+            return self._menus[key]
+
+    def title_for(self, html_path: str) -> str:
+        """Return the page's title from the content table, or its file name."""
+        title = self.titles.get(canonical_build_path(html_path, self.build_dir))
+        return title or os.path.splitext(os.path.basename(html_path))[0].capitalize()
+
+    def render(self, html_path: str, issues: List[Dict[str, Any]], badge_html: str, wcag_level: str,
+               title: Optional[str] = None) -> Optional[str]:
+        """Write wcag_report_FILENAME.html next to the page; returns its path (None if rendering failed)."""
+        html_dir = os.path.dirname(os.path.abspath(html_path))
+        html_filename = os.path.basename(html_path)
+        report_filename = f"wcag_report_{html_filename}" if html_filename.endswith('.html') else "wcag_report.html"
+        report_path = os.path.join(html_dir, report_filename)
+        page_title = title or self.title_for(html_path)
+        rel_path = os.path.relpath(report_path, self.build_dir)
+
+        def asset(path):
+            return os.path.relpath(os.path.join(self.build_dir, path), html_dir)
+
+        context = {
+            'Title': page_title,  # For {% block title %} in baseof.html
+            'page_title': page_title,
+            'relative_url': os.path.relpath(os.path.abspath(html_path), self.build_dir),
+            'site': self.site,
+            'css_path': asset('css/theme-light.css'),
+            'js_path': asset('js/main.js'),
+            'favicon': asset('images/favicon.ico'),
+            'logo_path': asset('images/logo.png'),
+            'wcag_level': wcag_level,
+            'error_count': sum(1 for i in issues if i.get('type') == 'error'),
+            'warning_count': sum(1 for i in issues if i.get('type') == 'warning'),
+            'notice_count': sum(1 for i in issues if i.get('type') == 'notice'),
+            'badge_html': badge_html,
+            'issues': issues,
+            'footer_text': self.footer_text,
+            'top_menu': self.menu_for(rel_path),
+            'rel_path': rel_path,
+        }
+        try:
+            rendered = self.template.render(**context)
+        except Exception as e:
+            # A broken layout fails every report the same way; say so once
+            if not self._failed:
+                logging.error(f"[ReportRenderer] Could not render WCAG reports: {e}")
+                self._failed = True
+            return None
+        with open(report_path, 'w', encoding='utf-8') as f:
+            f.write(rendered)
+        logging.info(f"Generated WCAG report: {report_path}")
+        return report_path
+
+    def submit(self, html_path: str, issues: List[Dict[str, Any]], badge_html: str, wcag_level: str,
+               title: Optional[str] = None):
+        """Queue a report for rendering on the renderer's thread pool; returns a Future."""
+        if self._executor is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="wcag-report")
+        future = self._executor.submit(self.render, html_path, issues, badge_html, wcag_level, title)
+        self._futures.append(future)
+        return future
+
+    def close(self):
+        """Wait for queued reports; returns the number written."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        written = 0
+        for future in self._futures:
+            try:
+                written += future.result() is not None
+            except Exception as e:
+                logging.error(f"[ReportRenderer] Report failed: {e}")
+        self._futures = []
+        logging.info(f"[ReportRenderer] Rendered {written} report(s) in {time.monotonic() - self._started:.2f}s")
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def generate_wcag_report(html_path: str, issues: List[Dict[str, Any]], badge_html: str, config: dict):
+    """
+    Generate the WCAG report for a single page (wcag_report_FILENAME.html in its directory).
+    For a whole build use ReportRenderer, which sets up the template, menu and titles once.
+    """
+    build_dir = os.path.dirname(os.path.dirname(os.path.abspath(html_path)))
+    renderer = ReportRenderer(build_dir=build_dir)
+    return renderer.render(html_path, issues, badge_html, config.get('wcag_level', 'AA'), config.get('title'))
+
+def process_all_html_files(build_dir="build", wcag="WCAG2AA", config_file=None, db_path="db/sqlite.db", force=False,
+                           triage=False, standards=None):
+    """
+    Check every built page with Pa11y, store the results, and write reports and badges.
+    Every page is first pre-linted (prelint_pages); those results are stored under the
+    'prelint' wcag_level.
+    Pages whose HTML and Pa11y config are unchanged since their last check reuse the stored
+    result (their reports and badges are still regenerated); force=True checks every page.
+    triage=True (ignored with force=True) also keeps the last stored result, instead of re-running
+    Pa11y, for pages that fail the pre-lint and whose HTML is unchanged since their last Pa11y
+    check. Such a page only misses the cache because the Pa11y config changed, so its result
+    is deliberately reused from the earlier config: a page with static errors fails either way.
+    Triaged results are shown but not stored under the new config, so the next run without
+    triage checks those pages again.
+    standards (e.g. ['WCAG2A', 'WCAG2AA', 'WCAG22AA'], or ['all'] for every standard in
+    wcag.badges.json) checks each page once at the strictest level and stores a result and
+    badge per standard (see wcag.classify_issues); the page shows the badge and report for
+    `wcag`, or for the first standard if `wcag` is not among them.
+    """
     import fnmatch
     asset_dirs = {"css", "js", "images", "files"}
-    from oerforge.verify import run_pa11y_on_file, get_content_id_for_file, store_accessibility_result, generate_wcag_report, inject_badge_into_html, generate_badge_html, load_pa11y_config
+    from oerforge.verify import inject_badge_into_html, generate_badge_html, load_pa11y_config
     import sqlite3
     import json
     # Load config and logo info
@@ -375,69 +717,176 @@ def process_all_html_files(build_dir="build", wcag="WCAG2AA", config_file=None,
     # Get default WCAG level from config
     default_wcag_level = wcag
 
+    # Determine WCAG level (allow per-page override in config if desired)
+    wcag_level = default_wcag_level
+    if standards and [str(s).lower() for s in standards] == ["all"]:
+        standards = list(logo_info)
+    standards = [s for s in dict.fromkeys(standards or []) if _is_standard(s)] or None
+    if standards:
+        # One Pa11y run at the strictest level, split into a result per standard
+        levels = standards
+        wcag_level = wcag_level if wcag_level in levels else levels[0]
+        check_level = wcag_standards.superset_standard(levels)
+    else:
+        levels = [wcag_level]
+        check_level = wcag_level
+    html_paths = []
     for root, dirs, files in os.walk(build_dir):
         # Skip asset directories
         dirs[:] = [d for d in dirs if d not in asset_dirs]
         for filename in files:
             if fnmatch.fnmatch(filename, "*.html") and not filename.startswith("wcag_report_"):
-                html_path = os.path.join(root, filename)
-                print(f"Processing: {html_path}")
-                # Determine WCAG level (allow per-page override in config if desired)
-                wcag_level = default_wcag_level
-                # Optionally, you could add logic here to check for per-page config in the future
-                # Run Pa11y with config and level
-                result = run_pa11y_on_file(html_path, config_file, wcag_level)
-                # Open DB connection
-                conn = sqlite3.connect(db_path)
-                content_id = get_content_id_for_file(html_path, conn)
+                html_paths.append(os.path.join(root, filename))
+
+    # Resolve a bare config name (as written in _content.yml) against pa11y-config/
+    if config_file and not os.path.exists(config_file) and os.path.exists(os.path.join("pa11y-config", config_file)):
+        config_file = os.path.join("pa11y-config", config_file)
+    concurrency = int(config_data.get("concurrency", DEFAULT_CONCURRENCY))
+    workers = int(config_data.get("workers", DEFAULT_WORKERS))
+    config_hash = pa11y_config_hash(config_file, check_level, levels if standards else None)
+
+    # Palette contrast is checked once per theme here, not rediscovered by Pa11y on every page
+    theme_failures = themes.report_theme_contrast(wcag_level, themes=themes.site_themes("_content.yml"))
+    if theme_failures:
+        print(f"Theme contrast: {len(theme_failures)} failing colour pair(s) in the site themes (see log or run python -m oerforge.themes)")
+
+    # Hash and pre-lint every page up front, before the writer and report threads start (the pool forks)
+    linted = list(prelint_pages(html_paths, logo_info))
+
+    # One read connection for the run; results are batched into large transactions by the writer thread
+    conn = sqlite3.connect(db_path)
+    writer = DBWriter(db_path).start()
+    renderer = ReportRenderer(build_dir, db_path)
+    try:
+        # Pages whose HTML (badge stripped) and Pa11y config match the last check reuse its result
+        content_index = build_content_index(conn, build_dir)
+        stored_prelint = dict(conn.execute(
+            "SELECT content_id, html_hash FROM accessibility_results WHERE wcag_level = ? AND config_hash = ?",
+            (PRELINT_LEVEL, PRELINT_VERSION)
+        ))
+        page_info = {}
+        cached = []
+        triaged = []
+        to_check = []
+        unmatched = []
+        lint_failed = 0
+        for html_path, html_hash, lint_issues in linted:
+            content_id = content_index.get(canonical_build_path(html_path, build_dir))
+            if content_id is None:
+                unmatched.append(html_path)
+            elif stored_prelint.get(content_id) != html_hash:
+                writer.post(build_accessibility_result(content_id, lint_issues, None, PRELINT_LEVEL,
+                                                       html_hash=html_hash, config_hash=PRELINT_VERSION))
+            passed_lint = not any(i["type"] == "error" for i in lint_issues)
+            lint_failed += not passed_lint
+            page_info[html_path] = (content_id, html_hash)
+            results = None
+            if not force and content_id is not None:
+                results = get_cached_results(content_id, levels, html_hash, config_hash, conn)
+            if results is not None:
+                cached.append((html_path, results))
+                continue
+            if triage and not force and not passed_lint and content_id is not None:
+                stored = {level: get_stored_result(content_id, level, conn) for level in levels}
+                if all(last_hash == html_hash and last_issues is not None for last_hash, last_issues in stored.values()):
+                    triaged.append((html_path, {level: last_issues for level, (_, last_issues) in stored.items()}))
+                    continue
+            to_check.append(html_path)
+        logging.info(f"[process_all_html_files] Pre-lint: {lint_failed} of {len(html_paths)} page(s) have errors")
+        logging.info(f"[process_all_html_files] {len(cached)} page(s) unchanged since their last check, {len(to_check)} to check")
+        if triaged:
+            logging.info(f"[process_all_html_files] Triage: {len(triaged)} unchanged page(s) failing the pre-lint keep their last Pa11y result")
+        if unmatched:
+            shown = ", ".join(canonical_build_path(path, build_dir) or path for path in unmatched[:10])
+            more = f" and {len(unmatched) - 10} more" if len(unmatched) > 10 else ""
+            logging.warning(f"[process_all_html_files] {len(unmatched)} page(s) have no content record; checked but not stored: {shown}{more}")
+
+        if to_check and tools.tool_version("pa11y") is None:
+            logging.error(f"[process_all_html_files] Pa11y is not installed or not found in PATH; skipping {len(to_check)} page(s).")
+            print("Pa11y not found; accessibility checks skipped.")
+            to_check = []
+
+        def split_result(result):
+            if result is None:
+                return {level: None for level in levels}
+            if standards:
+                return wcag_standards.classify_issues(result, levels)
+            return {wcag_level: result}
+
+        def finish_page(html_path, results, from_cache, note="unchanged, cached result"):
+            root, filename = os.path.split(html_path)
+            print(f"Processing: {html_path}" + (f" ({note})" if from_cache else ""))
+            content_id, html_hash = page_info[html_path]
+            # Compute report link before generating badge
+            report_filename = f"wcag_report_{filename}" if filename.endswith('.html') else "wcag_report.html"
+            report_path = os.path.join(root, report_filename)
+            report_link = os.path.basename(report_path)
+            if content_id is None:
+                return
+            for level, result in results.items():
                 error_count = sum(1 for i in result if i.get("type") == "error") if result else 0
-                warning_count = sum(1 for i in result if i.get("type") == "warning") if result else 0
-                notice_count = sum(1 for i in result if i.get("type") == "notice") if result else 0
                 safe_result = result if result is not None else []
-                # Compute report link before generating badge
-                report_filename = f"wcag_report_{filename}" if filename.endswith('.html') else "wcag_report.html"
-                report_path = os.path.join(root, report_filename)
-                report_link = os.path.basename(report_path)
-                badge_html = generate_badge_html(wcag_level, error_count, logo_info, report_link)
-                if content_id is not None:
-                    store_accessibility_result(content_id, safe_result, badge_html, wcag_level, error_count, warning_count, notice_count, conn)
-                    config = {
-                        'title': os.path.splitext(filename)[0].capitalize(),
-                        'wcag_level': wcag_level
-                    }
-                    issues = safe_result
-                    # Now generate the report with badge_html
-                    generate_wcag_report(html_path, issues, badge_html, config)
-                    inject_badge_into_html(html_path, badge_html, report_link, logo_info)
-                conn.close()
+                badge_html = generate_badge_html(level, error_count, logo_info, report_link)
+                if not from_cache:
+                    # A failed check (None) is stored without hashes so the page is checked again next time
+                    stored_hash = html_hash if result is not None else None
+                    writer.post(build_accessibility_result(content_id, safe_result, badge_html, level,
+                                                           html_hash=stored_hash, config_hash=config_hash))
+                if level == wcag_level:
+                    renderer.submit(html_path, safe_result, badge_html, wcag_level)
+                    # Pages rendered by make.py carry the badge placeholder; only older layouts need the DOM rewrite
+                    if not badges.splice_badge_into_file(html_path, badge_html):
+                        inject_badge_into_html(html_path, badge_html, report_link, logo_info)
+
+        for html_path, results in cached:
+            finish_page(html_path, results, from_cache=True)
+        for html_path, results in triaged:
+            finish_page(html_path, results, from_cache=True, note="fails the pre-lint; triaged, result from an earlier Pa11y config")
+        # Check changed pages concurrently and store results as each check finishes.
+        logging.info(f"[process_all_html_files] Checking {len(to_check)} page(s) with Pa11y at {pa11y_standard(check_level)} "
+                     f"({concurrency} at a time)" + (f" for {', '.join(levels)}" if standards else ""))
+        for html_path, result in check_pages(to_check, config_file, check_level, concurrency=concurrency, workers=workers):
+            finish_page(html_path, split_result(result), from_cache=False)
+    finally:
+        renderer.close()
+        writer.close()
+        conn.close()
     # After processing, copy changed files to docs/
     copy_to_docs()
 
 # --- Utility ---
+def _is_standard(name: str) -> bool:
+    """Whether name is a WCAG standard wcag.py knows; others are skipped with a warning."""
+    try:
+        wcag_standards.parse_standard(name)
+        return True
+    except ValueError:
+        logging.warning(f"[process_all_html_files] Skipping unknown WCAG standard: {name}")
+        return False
+
 def copy_to_docs():
-    """Copy all changed files from build/ to docs/."""
-    import filecmp
-    import shutil
-    build_dir = os.path.abspath("build")
-    docs_dir = os.path.abspath("docs")
-    for root, dirs, files in os.walk(build_dir):
-        rel_root = os.path.relpath(root, build_dir)
-        target_root = os.path.join(docs_dir, rel_root) if rel_root != "." else docs_dir
-        if not os.path.exists(target_root):
-            os.makedirs(target_root, exist_ok=True)
-        for filename in files:
-            src_file = os.path.join(root, filename)
-            dst_file = os.path.join(target_root, filename)
-            # Only copy if file does not exist or is different
-            if not os.path.exists(dst_file) or not filecmp.cmp(src_file, dst_file, shallow=False):
-                shutil.copy2(src_file, dst_file)
-                logging.info(f"Copied {src_file} to {dst_file}")
-    logging.info("All changed files copied from build/ to docs/.")
+    """Sync changed files from build/ to docs/ (see copyfile.sync_tree)."""
+    from oerforge.copyfile import sync_build_to_docs
+    sync_build_to_docs(os.path.abspath("build"), os.path.abspath("docs"), delete=False)
 
 # --- CLI Entry Point ---
 def main():
     """Parse CLI args, run checks, store results, and generate reports as needed."""
-    pass
+    import argparse
+    config_data = load_pa11y_config("_content.yml")
+    parser = argparse.ArgumentParser(description="Check built pages with Pa11y and write WCAG reports and badges.")
+    parser.add_argument("--build-dir", default="build", help="Directory of built HTML pages")
+    parser.add_argument("--db", default="db/sqlite.db", help="Path to sqlite.db")
+    parser.add_argument("--wcag", default=config_data.get("wcag_level", "WCAG2AA"), help="WCAG level to check")
+    parser.add_argument("--config", default=config_data.get("config", "pa11y-config/pa11y.wcag.aa.json"), help="Pa11y JSON config")
+    parser.add_argument("--force", action="store_true", help="Re-check every page, even if unchanged since its last check")
+    parser.add_argument("--standards", nargs="+", default=config_data.get("standards"),
+                        help="Check several standards in one pass (e.g. WCAG2A WCAG2AA WCAG22AA, or 'all' for every badge)")
+    parser.add_argument("--triage", action="store_true", default=bool(config_data.get("triage", False)),
+                        help="After a Pa11y config change, keep the last result of unchanged pages that fail the pre-lint")
+    args = parser.parse_args()
+    process_all_html_files(build_dir=args.build_dir, wcag=args.wcag, config_file=args.config, db_path=args.db, force=args.force,
+                           triage=args.triage, standards=args.standards)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,111 @@
+"""
+wcag.py
+-------
+WCAG Standards and Success Criteria
+
+Maps Pa11y standard names (WCAG2A, WCAG2AA, WCAG21AAA, WCAG22AA, ...) to a WCAG version and
+conformance level, and each success criterion to the level and version that define it. This
+lets one Pa11y run at the strictest level be split into results for every standard:
+an issue counts against a standard when its success criterion belongs to that version
+at or below that level.
+
+Pa11y's HTML_CodeSniffer runner only knows WCAG2A/AA/AAA, and its issue codes name the
+criterion, e.g. WCAG2AA.Principle1.Guideline1_4.1_4_3.G18.Fail is 1.4.3. Issues without a
+criterion (other runners, the pre-lint) count against every standard.
+
+Usage:
+    from oerforge import wcag
+    wcag.superset_standard(['WCAG2A', 'WCAG22AA'])    # 'WCAG2AA'
+    wcag.classify_issues(issues, ['WCAG2A', 'WCAG2AA'])
+"""
+
+import re
+
+# --- Constants ---
+LEVELS = ('A', 'AA', 'AAA')
+VERSIONS = {'2': 20, '21': 21, '22': 22}
+STANDARD_RE = re.compile(r'^WCAG(2|21|22)(A{1,3})$')
+CRITERION_RE = re.compile(r'(?:^|\.)(\d)_(\d{1,2})_(\d{1,2})(?:\.|$)')
+# Success criterion -> (level, WCAG version that added it)
+SUCCESS_CRITERIA = {
+    '1.1.1': ('A', 20),
+    '1.2.1': ('A', 20), '1.2.2': ('A', 20), '1.2.3': ('A', 20), '1.2.4': ('AA', 20), '1.2.5': ('AA', 20),
+    '1.2.6': ('AAA', 20), '1.2.7': ('AAA', 20), '1.2.8': ('AAA', 20), '1.2.9': ('AAA', 20),
+    '1.3.1': ('A', 20), '1.3.2': ('A', 20), '1.3.3': ('A', 20), '1.3.4': ('AA', 21), '1.3.5': ('AA', 21),
+    '1.3.6': ('AAA', 21),
+    '1.4.1': ('A', 20), '1.4.2': ('A', 20), '1.4.3': ('AA', 20), '1.4.4': ('AA', 20), '1.4.5': ('AA', 20),
+    '1.4.6': ('AAA', 20), '1.4.7': ('AAA', 20), '1.4.8': ('AAA', 20), '1.4.9': ('AAA', 20),
+    '1.4.10': ('AA', 21), '1.4.11': ('AA', 21), '1.4.12': ('AA', 21), '1.4.13': ('AA', 21),
+    '2.1.1': ('A', 20), '2.1.2': ('A', 20), '2.1.3': ('AAA', 20), '2.1.4': ('A', 21),
+    '2.2.1': ('A', 20), '2.2.2': ('A', 20), '2.2.3': ('AAA', 20), '2.2.4': ('AAA', 20), '2.2.5': ('AAA', 20),
+    '2.2.6': ('AAA', 21),
+    '2.3.1': ('A', 20), '2.3.2': ('AAA', 20), '2.3.3': ('AAA', 21),
+    '2.4.1': ('A', 20), '2.4.2': ('A', 20), '2.4.3': ('A', 20), '2.4.4': ('A', 20), '2.4.5': ('AA', 20),
+    '2.4.6': ('AA', 20), '2.4.7': ('AA', 20), '2.4.8': ('AAA', 20), '2.4.9': ('AAA', 20), '2.4.10': ('AAA', 20),
+    '2.4.11': ('AA', 22), '2.4.12': ('AAA', 22), '2.4.13': ('AAA', 22),
+    '2.5.1': ('A', 21), '2.5.2': ('A', 21), '2.5.3': ('A', 21), '2.5.4': ('A', 21), '2.5.5': ('AAA', 21),
+    '2.5.6': ('AAA', 21), '2.5.7': ('AA', 22), '2.5.8': ('AA', 22),
+    '3.1.1': ('A', 20), '3.1.2': ('AA', 20), '3.1.3': ('AAA', 20), '3.1.4': ('AAA', 20), '3.1.5': ('AAA', 20),
+    '3.1.6': ('AAA', 20),
+    '3.2.1': ('A', 20), '3.2.2': ('A', 20), '3.2.3': ('AA', 20), '3.2.4': ('AA', 20), '3.2.5': ('AAA', 20),
+    '3.2.6': ('A', 22),
+    '3.3.1': ('A', 20), '3.3.2': ('A', 20), '3.3.3': ('AA', 20), '3.3.4': ('AA', 20), '3.3.5': ('AAA', 20),
+    '3.3.6': ('AAA', 20), '3.3.7': ('A', 22), '3.3.8': ('AA', 22), '3.3.9': ('AAA', 22),
+    '4.1.1': ('A', 20), '4.1.2': ('A', 20), '4.1.3': ('AA', 21),
+}
+# Success criteria removed from later versions -> first version without them
+REMOVED_IN = {'4.1.1': 22}
+
+def parse_standard(standard):
+    """
+    Return (version, level) for a standard name, e.g. 'WCAG21AA' -> (21, 'AA').
+    Bare levels ('A', 'AA', 'AAA') mean WCAG 2.0. Raises ValueError for anything else.
+    """
+    name = str(standard).strip().upper()
+    if name in LEVELS:
+        return 20, name
+    match = STANDARD_RE.match(name)
+    if not match:
+        raise ValueError(f"Unknown WCAG standard: {standard}")
+    return VERSIONS[match.group(1)], match.group(2)
+
+def runner_standard(standard):
+    """
+    Return the standard Pa11y's HTML_CodeSniffer runner checks for a standard name
+    (it has no 2.1/2.2 rule sets): 'WCAG22AAA' -> 'WCAG2AAA'.
+    """
+    return f"WCAG2{parse_standard(standard)[1]}"
+
+def superset_standard(standards):
+    """
+    Return the runner standard whose results cover every standard in the list (the strictest level).
+    """
+    return f"WCAG2{max((parse_standard(s)[1] for s in standards), key=LEVELS.index)}"
+
+def success_criterion(code):
+    """
+    Return the success criterion named in a Pa11y issue code ('1.4.3'), or None.
+    """
+    match = CRITERION_RE.search(code or '')
+    return '.'.join(match.groups()) if match else None
+
+def applies_to(criterion, standard):
+    """
+    Whether a success criterion is part of a standard. Unknown or missing criteria apply to every standard.
+    """
+    if criterion not in SUCCESS_CRITERIA:
+        return True
+    version, level = parse_standard(standard)
+    sc_level, added = SUCCESS_CRITERIA[criterion]
+    removed = REMOVED_IN.get(criterion)
+    return added <= version and (removed is None or version < removed) and LEVELS.index(sc_level) <= LEVELS.index(level)
+
+def classify_issues(issues, standards):
+    """
+    Split one run's issues into {standard: [issues]} for each standard in the list.
+    """
+    criteria = [success_criterion(issue.get('code')) for issue in issues]
+    return {
+        standard: [issue for issue, criterion in zip(issues, criteria) if applies_to(criterion, standard)]
+        for standard in standards
+    }
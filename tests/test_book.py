@@ -0,0 +1,65 @@
+"""Tests for whole-course book assembly in oerforge.book."""
+
+import os
+from oerforge import book
+
+def test_collect_toc_chapters_follows_toc_order(tmp_path):
+    content = tmp_path / "content"
+    (content / "part").mkdir(parents=True)
+    (content / "intro.md").write_text("# Intro\n")
+    (content / "part" / "index.md").write_text("Part text\n")
+    (content / "part" / "one.md").write_text("# One\n")
+    toc = [
+        {"title": "Intro", "file": "intro.md"},
+        {"title": "Part", "file": "part/index.md", "children": [
+            {"title": "One", "file": "part/one.md"},
+            {"title": "Notebook", "file": "part/nb.ipynb"},
+            {"title": "Missing", "file": "part/missing.md"},
+        ]},
+    ]
+    chapters = book.collect_toc_chapters(toc, str(content))
+    assert [c["title"] for c in chapters] == ["Intro", "Part", "One"]
+    assert [c["level"] for c in chapters] == [0, 0, 1]
+
+def test_merge_chapter_asts_adds_missing_titles_and_absolute_images(tmp_path):
+    image = {"t": "Image", "c": [["", [], []], [], ["img.png", ""]]}
+    with_h1 = {"pandoc-api-version": [1, 23], "meta": {}, "blocks": [
+        {"t": "Header", "c": [1, ["intro", [], []], [{"t": "Str", "c": "Intro"}]]},
+    ]}
+    without_h1 = {"pandoc-api-version": [1, 23], "meta": {}, "blocks": [
+        {"t": "Para", "c": [image]},
+    ]}
+    book.absolutize_image_paths(without_h1, str(tmp_path))
+    assert image["c"][2][0] == os.path.join(str(tmp_path), "img.png")
+
+    chapters = [{"title": "Intro"}, {"title": "Part Two"}]
+    merged = book.merge_chapter_asts(chapters, [with_h1, without_h1])
+    assert merged["pandoc-api-version"] == [1, 23]
+    assert len(merged["blocks"]) == 3
+    header = merged["blocks"][1]
+    assert header["t"] == "Header" and header["c"][0] == 1
+    assert header["c"][2] == [{"t": "Str", "c": "Part"}, {"t": "Space"}, {"t": "Str", "c": "Two"}]
+
+def test_chapter_cache_key_changes_with_content(tmp_path, monkeypatch):
+    monkeypatch.setattr(book, "_pandoc_version", "pandoc 3.1")
+    source = tmp_path / "a.md"
+    source.write_text("one")
+    chapter = {"title": "A", "source_path": str(source)}
+    key = book.chapter_cache_key(chapter, "epub")
+    assert key == book.chapter_cache_key(chapter, "epub")
+    assert key != book.chapter_cache_key(chapter, "pdf")
+    source.write_text("two")
+    assert key != book.chapter_cache_key(chapter, "epub")
+
+def test_merge_chapter_asts_nests_headings_by_toc_level():
+    def header(level, text):
+        return {"t": "Header", "c": [level, [text.lower(), [], []], [{"t": "Str", "c": text}]]}
+    part = {"pandoc-api-version": [1, 23], "meta": {}, "blocks": [header(1, "Part"), header(2, "Overview")]}
+    section = {"pandoc-api-version": [1, 23], "meta": {}, "blocks": [header(1, "One"), header(6, "Deep")]}
+    untitled = {"pandoc-api-version": [1, 23], "meta": {}, "blocks": [{"t": "Para", "c": []}]}
+    chapters = [{"title": "Part", "level": 0}, {"title": "One", "level": 1}, {"title": "Two", "level": 1}]
+    merged = book.merge_chapter_asts(chapters, [part, section, untitled])
+    levels = [(b["c"][0], b["c"][2][0]["c"]) for b in merged["blocks"] if b["t"] == "Header"]
+    assert levels == [(1, "Part"), (2, "Overview"), (2, "One"), (6, "Deep"), (2, "Two")]
+    # The cached chapter ASTs are not modified
+    assert section["blocks"][0]["c"][0] == 1
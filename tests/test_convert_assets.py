@@ -0,0 +1,39 @@
+"""Tests for per-source asset staging in oerforge.convert."""
+
+import os
+import sqlite3
+from oerforge import convert
+from oerforge import db_utils
+
+def test_stage_assets_skips_unchanged_copies(tmp_path, monkeypatch):
+    monkeypatch.setattr(convert, "PROJECT_ROOT", str(tmp_path))
+    content_dir = tmp_path / "content"
+    content_dir.mkdir()
+    (content_dir / "img.png").write_bytes(b"\x89PNG\r\n\x1a\nabc")
+    source = content_dir / "page.md"
+    source.write_text("# Page\n![alt](img.png)\n<img src=\"missing.png\">\n")
+    files_dir = tmp_path / "build" / "page_files"
+
+    updates = convert.stage_assets_for_source(str(source), str(files_dir))
+    assert updates == [("img.png", os.path.join("page_files", "img.png"))]
+    staged = files_dir / "img.png"
+    assert staged.read_bytes() == b"\x89PNG\r\n\x1a\nabc"
+
+    # Second staging in the same build must not rewrite an identical file
+    os.utime(staged, (1, 1))
+    convert.stage_assets_for_source(str(source), str(files_dir))
+    assert os.path.getmtime(staged) == 1
+
+def test_apply_asset_path_updates_single_transaction(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.execute("INSERT INTO files (filename, relative_path) VALUES ('img.png', 'img.png')")
+    conn.execute("INSERT INTO pages_files (file_id, page_path) VALUES (1, 'img.png')")
+    conn.commit()
+    conn.close()
+    convert.apply_asset_path_updates([("img.png", "page_files/img.png"), ("img.png", "page_files/img.png")], db_path)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT relative_path FROM files").fetchone()[0] == "page_files/img.png"
+    assert conn.execute("SELECT page_path FROM pages_files").fetchone()[0] == "page_files/img.png"
+    conn.close()
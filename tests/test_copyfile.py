@@ -0,0 +1,85 @@
+"""Tests for the manifest-driven build/ to docs/ sync in oerforge.copyfile."""
+
+import os
+import json
+from oerforge import copyfile
+
+def test_sync_copies_changes_and_deletes_orphans(tmp_path, monkeypatch):
+    monkeypatch.setattr(copyfile, "MANIFEST_DIR", str(tmp_path / "manifests"))
+    changes_path = str(tmp_path / "changes.json")
+    build = tmp_path / "build"
+    docs = tmp_path / "docs"
+    (build / "css").mkdir(parents=True)
+    (build / "index.html").write_text("<p>home</p>")
+    (build / "css" / "site.css").write_text("body {}")
+    (docs / "old").mkdir(parents=True)
+    (docs / "old" / "gone.html").write_text("stale")
+
+    changes = copyfile.sync_tree(str(build), str(docs), changes_path=changes_path)
+    assert changes["copied"] == ["css/site.css", "index.html"]
+    assert changes["deleted"] == ["old/gone.html"]
+    assert not (docs / "old").exists()
+    assert (docs / "css" / "site.css").read_text() == "body {}"
+
+    # Nothing changed: nothing is copied or rehashed
+    hashed = []
+    real_hash = copyfile.file_sha256
+    monkeypatch.setattr(copyfile, "file_sha256", lambda path: hashed.append(path) or real_hash(path))
+    assert copyfile.sync_tree(str(build), str(docs), changes_path=changes_path)["copied"] == []
+    assert hashed == []
+
+    (build / "index.html").write_text("<p>new home</p>")
+    changes = copyfile.sync_tree(str(build), str(docs), delete=False, changes_path=changes_path)
+    assert changes["copied"] == ["index.html"] and changes["deleted"] == []
+    assert (docs / "index.html").read_text() == "<p>new home</p>"
+    assert json.load(open(changes_path))["copied"] == ["index.html"]
+    assert not any(name.endswith(copyfile.TMP_SUFFIX) for name in os.listdir(docs))
+
+def test_asset_sync_merges_static_and_db_images(tmp_path, monkeypatch):
+    monkeypatch.setattr(copyfile, "MANIFEST_DIR", str(tmp_path / "manifests"))
+    static = tmp_path / "static"
+    build = tmp_path / "build"
+    content = tmp_path / "content"
+    for sub in ("css", "js", "images"):
+        (static / sub).mkdir(parents=True)
+    (static / "css" / "theme.css").write_text("body {}")
+    (static / "images" / "logo.png").write_bytes(b"static logo")
+    content.mkdir()
+    (content / "chart.png").write_bytes(b"chart")
+    (content / "logo.png").write_bytes(b"db logo")
+    (build / "images").mkdir(parents=True)
+    (build / "images" / "stale.png").write_bytes(b"old")
+    (build / "index.html").write_text("<p>page</p>")
+    records = [{"absolute_path": str(content / "chart.png")}, {"absolute_path": str(content / "logo.png")}]
+    monkeypatch.setattr(copyfile.db_utils, "get_records", lambda *args, **kwargs: records)
+
+    sync = lambda: copyfile.sync_assets_to_build(build_dir=str(build), static_dir=str(static))
+    changes = sync()
+    assert changes["copied"] == ["css/theme.css", "images/chart.png", "images/logo.png"]
+    assert changes["deleted"] == ["images/stale.png"]
+    # Static files win over DB images with the same name; pages are left alone
+    assert (build / "images" / "logo.png").read_bytes() == b"static logo"
+    assert (build / "index.html").exists()
+
+    assert sync()["copied"] == [] and sync()["deleted"] == []
+    (content / "chart.png").write_bytes(b"new chart")
+    records.pop(1)
+    (static / "images" / "logo.png").unlink()
+    changes = sync()
+    assert changes["copied"] == ["images/chart.png"]
+    assert changes["deleted"] == ["images/logo.png"]
+
+def test_asset_sync_of_some_types_keeps_static_images(tmp_path, monkeypatch):
+    monkeypatch.setattr(copyfile, "MANIFEST_DIR", str(tmp_path / "manifests"))
+    monkeypatch.setattr(copyfile.db_utils, "get_records", lambda *args, **kwargs: [])
+    static = tmp_path / "static"
+    build = tmp_path / "build"
+    for sub in ("css", "images"):
+        (static / sub).mkdir(parents=True)
+    (static / "css" / "theme.css").write_text("body {}")
+    (static / "images" / "logo.png").write_bytes(b"logo")
+
+    copyfile.sync_assets_to_build(build_dir=str(build), static_dir=str(static))
+    changes = copyfile.sync_assets_to_build(["css"], build_dir=str(build), static_dir=str(static))
+    assert changes["deleted"] == []
+    assert (build / "images" / "logo.png").read_bytes() == b"logo"
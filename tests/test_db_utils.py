@@ -85,3 +85,25 @@ def test_migrate_database_entrypoint():
         for col in ['status', 'reason', 'custom_label', 'forced', 'created_at']:
             assert col in columns
         conn.close()
+
+def test_migrate_database_dedupes_conversion_results():
+    """
+    Test that migrate_database keeps the newest conversion result per output before adding the unique index.
+    """
+    with tempfile.TemporaryDirectory() as tmpdir:
+        db_path = os.path.join(tmpdir, 'test.db')
+        conn = sqlite3.connect(db_path)
+        conn.execute("""CREATE TABLE conversion_results (id INTEGER PRIMARY KEY, content_id INTEGER,
+                        source_format TEXT, target_format TEXT, status TEXT)""")
+        conn.executemany("INSERT INTO conversion_results (content_id, source_format, target_format, status) VALUES (?, ?, ?, ?)", [
+            (1, '.md', '.pdf', 'failed'), (1, '.md', '.pdf', 'success'), (1, '.md', '.docx', 'success'),
+        ])
+        conn.commit()
+        conn.close()
+        db_utils.migrate_database(db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        rows = conn.execute("SELECT target_format, status FROM conversion_results ORDER BY id").fetchall()
+        assert rows == [('.pdf', 'success'), ('.docx', 'success')]
+        with pytest.raises(sqlite3.IntegrityError):
+            conn.execute("INSERT INTO conversion_results (content_id, target_format) VALUES (1, '.pdf')")
+        conn.close()
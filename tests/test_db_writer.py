@@ -0,0 +1,63 @@
+"""Tests for the single-writer database queue in oerforge.db_writer."""
+
+import sqlite3
+import threading
+from oerforge import db_utils
+from oerforge.db_writer import DBWriter, AssetPathUpdate, ConversionResult, PagesFileLink
+
+def make_db(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.execute("INSERT INTO files (filename, relative_path) VALUES ('a.png', 'a.png')")
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_writer_commits_intents_from_many_threads(tmp_path):
+    db_path = make_db(tmp_path)
+
+    def worker(n):
+        for i in range(25):
+            writer.post(ConversionResult(n, '.md', f'.f{i}', f'p{n}_{i}.f{i}', 0.1, 'success', None, 0, None, 'now'))
+
+    with DBWriter(db_path, flush_interval=0.05, max_batch=10) as writer:
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM conversion_results").fetchone()[0] == 100
+    conn.close()
+    assert writer.errors == 0
+
+def test_writer_preserves_order_and_flushes(tmp_path):
+    db_path = make_db(tmp_path)
+    writer = DBWriter(db_path, flush_interval=60).start()
+    writer.post(AssetPathUpdate('a.png', 'x_files/a.png'))
+    writer.post(PagesFileLink(1, 'x_files/a.png'))
+    writer.post(AssetPathUpdate('x_files/a.png', 'y_files/a.png'))
+    assert writer.flush(timeout=10)
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT relative_path FROM files").fetchone()[0] == 'y_files/a.png'
+    # The link was inserted before the second rename, so it is renamed too
+    assert conn.execute("SELECT page_path FROM pages_files").fetchone()[0] == 'y_files/a.png'
+    conn.close()
+    writer.close()
+
+def test_reconversion_replaces_result_and_bad_intent_loses_only_itself(tmp_path):
+    db_path = make_db(tmp_path)
+    with DBWriter(db_path, flush_interval=60) as writer:
+        writer.post(ConversionResult(1, '.md', '.pdf', 'a.pdf', 0.1, 'failed', 'pandoc error', 0, None, 't1'))
+        writer.post(ConversionResult(None, '.md', '.pdf', 'bad.pdf', 0.1, 'success', None, 0, None, 't1'))
+        writer.post(ConversionResult(1, '.md', '.pdf', 'a.pdf', 0.2, 'success', None, 0, None, 't2'))
+        writer.post(PagesFileLink(1, 'a.md'))
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT content_id, status, created_at FROM conversion_results").fetchall()
+    links = conn.execute("SELECT page_path FROM pages_files").fetchall()
+    conn.close()
+    assert rows == [(1, 'success', 't2')]
+    assert links == [('a.md',)]
+    assert writer.errors == 1
+    assert writer.committed == 3
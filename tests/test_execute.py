@@ -0,0 +1,78 @@
+"""Tests for cached notebook execution in oerforge.execute."""
+
+import json
+import sqlite3
+from oerforge import execute
+from oerforge import db_utils
+
+def make_notebook(code="x = 1", prose="Intro"):
+    return {
+        "metadata": {"kernelspec": {"name": "python3", "language": "python"}},
+        "cells": [
+            {"cell_type": "markdown", "source": prose},
+            {"cell_type": "code", "source": code, "outputs": [], "execution_count": None},
+        ],
+    }
+
+def test_execution_key_ignores_markdown_but_not_code():
+    key = execute.execution_key(make_notebook())
+    assert key == execute.execution_key(make_notebook(prose="Edited prose"))
+    assert key != execute.execution_key(make_notebook(code="x = 2"))
+
+def test_cached_notebooks_are_not_reexecuted_and_are_registered(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(execute, "CACHE_DIR", str(cache_dir))
+    nb = make_notebook()
+    source = tmp_path / "content" / "nb.ipynb"
+    source.parent.mkdir()
+    source.write_text(json.dumps(nb))
+    outputs = [[{"output_type": "stream", "name": "stdout", "text": "1\n"}]]
+    cache_dir.mkdir()
+    cache_file = cache_dir / f"{execute.execution_key(nb)}.json"
+    cache_file.write_text(json.dumps({"outputs": outputs, "execution_counts": [1]}))
+
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    def fail(*args):
+        raise AssertionError("cached notebook must not be executed")
+    monkeypatch.setattr(execute, "_execute_in_child", fail)
+    results = execute.execute_notebooks([str(source)], db_path=db_path)
+    assert [r["status"] for r in results] == ["cached"]
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT absolute_path, is_code_generated FROM files").fetchall()
+    conn.close()
+    assert rows == [(str(cache_file), 1)]
+
+    rendered = execute.apply_cached_outputs(make_notebook(prose="Edited"), execute.load_cached_outputs(nb))
+    assert rendered["cells"][1]["outputs"] == outputs[0]
+    assert rendered["cells"][1]["execution_count"] == 1
+
+def test_corrupt_notebook_is_reported_and_others_still_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(execute, "CACHE_DIR", str(tmp_path / "cache"))
+    content = tmp_path / "content"
+    content.mkdir()
+    broken = content / "broken.ipynb"
+    broken.write_text('{"cells": [')
+    not_a_notebook = content / "list.ipynb"
+    not_a_notebook.write_text("[]")
+    good = content / "good.ipynb"
+    good.write_text(json.dumps(make_notebook()))
+
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(execute, "_execute_in_child", lambda *args: ("executed", None, 0.1))
+    results = execute.execute_notebooks([str(broken), str(not_a_notebook), str(good)], db_path=db_path)
+    by_source = {r["source"]: r for r in results}
+    assert by_source[str(broken)]["status"] == "failed"
+    assert "unreadable notebook" in by_source[str(broken)]["reason"]
+    assert by_source[str(not_a_notebook)]["status"] == "failed"
+    assert by_source[str(good)]["status"] == "executed"
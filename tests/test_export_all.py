@@ -0,0 +1,93 @@
+"""Tests for the parallel export engine in oerforge.export_all."""
+
+import sqlite3
+from oerforge import export_all
+from oerforge import db_utils
+
+def make_db(tmp_path, source):
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.execute(
+        "INSERT INTO content (source_path, slug, mime_type, export_types) VALUES (?, 'page', '.md', 'html,docx,txt')",
+        (str(source),)
+    )
+    conn.commit()
+    conn.close()
+    return db_path
+
+def test_export_all_skips_current_artifacts(tmp_path, monkeypatch):
+    source = tmp_path / "page.md"
+    source.write_text("# Page\n")
+    config = tmp_path / "_content.yml"
+    config.write_text("export:\n  types: [docx]\n")
+    db_path = make_db(tmp_path, source)
+    monkeypatch.setattr(export_all, "BUILD_ROOT", str(tmp_path / "build"))
+    monkeypatch.setattr(export_all, "PROGRESS_PATH", str(tmp_path / "build" / "progress.ndjson"))
+    calls = []
+
+    def fake_converter(input_path, output_path):
+        calls.append(output_path)
+        with open(output_path, "w") as f:
+            f.write("out")
+        return True
+    monkeypatch.setitem(export_all.EXPORTERS, (".md", "docx"), fake_converter)
+    monkeypatch.setitem(export_all.EXPORTERS, (".md", "txt"), fake_converter)
+    checkpoint = str(tmp_path / "checkpoint.json")
+    (tmp_path / "build" / "page").mkdir(parents=True)
+
+    summary = export_all.export_all(str(config), db_path=db_path, workers=2, checkpoint_path=checkpoint)
+    assert summary["exported"] == 2 and summary["current"] == 0 and summary["bytes"] == 6
+    assert sorted(p.rsplit(".", 1)[1] for p in calls) == ["docx", "txt"]
+
+    summary = export_all.export_all(str(config), db_path=db_path, workers=2, checkpoint_path=checkpoint)
+    assert summary["exported"] == 0 and summary["current"] == 2 and len(calls) == 2
+
+    source.write_text("# Changed\n")
+    summary = export_all.export_all(str(config), db_path=db_path, workers=2, checkpoint_path=checkpoint)
+    assert summary["exported"] == 2 and len(calls) == 4
+
+def test_interrupt_cancels_queued_exports(tmp_path, monkeypatch):
+    import time
+    import pytest
+    from oerforge import process_utils
+    sources = []
+    for i in range(4):
+        sources.append(tmp_path / f"page{i}.md")
+        sources[-1].write_text(f"# Page {i}\n")
+    db_path = make_db(tmp_path, sources[0])
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO content (source_path, slug, mime_type, export_types) VALUES (?, ?, '.md', 'docx,txt')",
+        [(str(source), source.stem) for source in sources[1:]]
+    )
+    conn.commit()
+    conn.close()
+    config = tmp_path / "_content.yml"
+    config.write_text("export:\n  types: [docx]\n")
+    monkeypatch.setattr(export_all, "BUILD_ROOT", str(tmp_path / "build"))
+    monkeypatch.setattr(export_all, "PROGRESS_PATH", str(tmp_path / "build" / "progress.ndjson"))
+    calls = []
+
+    def interrupting_converter(input_path, output_path):
+        calls.append(process_utils.is_cancelled())
+        if len(calls) == 1:
+            raise KeyboardInterrupt
+        time.sleep(0.05)
+        return True
+    monkeypatch.setitem(export_all.EXPORTERS, (".md", "docx"), interrupting_converter)
+    monkeypatch.setitem(export_all.EXPORTERS, (".md", "txt"), interrupting_converter)
+    checkpoint = str(tmp_path / "checkpoint.json")
+
+    with pytest.raises(KeyboardInterrupt):
+        export_all.export_all(str(config), db_path=db_path, workers=1, checkpoint_path=checkpoint)
+    # Queued exports are cancelled instead of run to completion
+    assert len(calls) <= 2
+    assert process_utils.is_cancelled()
+
+    # The next run in the same process is not poisoned by the cancellation
+    calls.clear()
+    calls.append(False)  # skip the interrupt
+    export_all.export_all(str(config), db_path=db_path, workers=1, checkpoint_path=checkpoint)
+    assert len(calls) == 9 and not any(calls)
+    process_utils.reset_cancellation()
@@ -0,0 +1,84 @@
+"""Tests for the resumable conversion job queue in oerforge.job_queue."""
+
+import time
+from oerforge import job_queue
+
+def make_jobs(tmp_path, n):
+    jobs = []
+    for i in range(n):
+        src = tmp_path / f"page{i}.md"
+        src.write_text(f"# Page {i}\n")
+        jobs.append({
+            "input_path": str(src),
+            "output_path": str(tmp_path / f"page{i}_files" / f"page{i}.pdf"),
+            "input_ext": ".md",
+            "output_ext": ".pdf",
+            "content_id": i + 1,
+        })
+    return jobs
+
+def test_claim_until_empty(tmp_path):
+    conn = job_queue.connect(str(tmp_path / "q.db"))
+    run_id = job_queue.enqueue_jobs(conn, make_jobs(tmp_path, 3))
+    claimed = []
+    while True:
+        job = job_queue.claim_job(conn, "w1", lease_seconds=60)
+        if job is None:
+            break
+        claimed.append(job)
+        job_queue.finish_job(conn, job["id"], "done")
+    assert len(claimed) == 3
+    assert job_queue.get_state_counts(conn, run_id) == {"done": 3}
+    conn.close()
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    conn = job_queue.connect(str(tmp_path / "q.db"))
+    job_queue.enqueue_jobs(conn, make_jobs(tmp_path, 1))
+    first = job_queue.claim_job(conn, "dead-worker", lease_seconds=-1)
+    time.sleep(0.01)
+    second = job_queue.claim_job(conn, "w2", lease_seconds=60)
+    assert second is not None and second["id"] == first["id"]
+    assert second["attempts"] == 1
+    assert job_queue.claim_job(conn, "w3", lease_seconds=60) is None
+    conn.close()
+
+def test_resume_keeps_finished_jobs(tmp_path):
+    db_path = str(tmp_path / "q.db")
+    jobs = make_jobs(tmp_path, 3)
+    conn = job_queue.connect(db_path)
+    run_id = job_queue.enqueue_jobs(conn, jobs)
+    done = job_queue.claim_job(conn, "w1", lease_seconds=60)
+    job_queue.finish_job(conn, done["id"], "done")
+    conn.close()
+    # The run "crashed"; a new run with the same plan resumes it
+    conn = job_queue.connect(db_path)
+    assert job_queue.enqueue_jobs(conn, jobs, resume=True) == run_id
+    assert job_queue.get_state_counts(conn, run_id) == {"done": 1, "pending": 2}
+    # Without resume every planned job starts again
+    new_run = job_queue.enqueue_jobs(conn, jobs, resume=False)
+    assert new_run != run_id
+    assert job_queue.get_state_counts(conn, new_run) == {"pending": 3}
+    conn.close()
+
+def test_resume_releases_claims_of_dead_workers(tmp_path):
+    import os
+    import subprocess
+    import sys
+    db_path = str(tmp_path / "q.db")
+    jobs = make_jobs(tmp_path, 2)
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    conn = job_queue.connect(db_path)
+    run_id = job_queue.enqueue_jobs(conn, jobs)
+    crashed = job_queue.claim_job(conn, f"{job_queue.HOSTNAME}-{dead.pid}-0", lease_seconds=600)
+    live = job_queue.claim_job(conn, f"{job_queue.HOSTNAME}-{os.getpid()}-0", lease_seconds=600)
+    conn.close()
+    # The crashed process's job is claimable again at once; the live worker keeps its claim
+    conn = job_queue.connect(db_path)
+    assert job_queue.enqueue_jobs(conn, jobs, resume=True) == run_id
+    assert job_queue.get_state_counts(conn, run_id) == {"pending": 1, "claimed": 1}
+    assert job_queue.claim_job(conn, "w2", lease_seconds=60)["id"] == crashed["id"]
+    assert [job["id"] for job in job_queue.get_claimed_jobs(conn)] == [crashed["id"], live["id"]]
+    assert job_queue.renew_lease(conn, live["id"], f"{job_queue.HOSTNAME}-{os.getpid()}-0", 60)
+    assert not job_queue.renew_lease(conn, live["id"], "someone-else", 60)
+    conn.close()
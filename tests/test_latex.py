@@ -0,0 +1,34 @@
+"""Tests for the precompiled LaTeX preamble helpers in oerforge.latex."""
+
+import os
+from oerforge import latex
+
+def test_split_template_dumps_only_static_packages():
+    template = (
+        "% header\n"
+        "\\documentclass[11pt]{article}\n"
+        "\\usepackage[margin=1in]{geometry}\n"
+        "\\usepackage{hyperref}\n"
+        "\\usepackage{graphicx}\n"
+        "$if(highlighting-macros)$\n"
+        "$highlighting-macros$\n"
+        "$endif$\n"
+        "\\begin{document}\n$body$\n\\end{document}\n"
+    )
+    static, runtime = latex.split_template(template)
+    assert "geometry" in static and "graphicx" in static
+    assert "hyperref" not in static and "$" not in static
+    assert runtime.startswith("\\usepackage{hyperref}\n$if(highlighting-macros)$")
+    assert runtime.endswith("\\end{document}\n")
+
+def test_template_hash_and_aux_dir_are_stable(tmp_path):
+    template = tmp_path / "t.tex"
+    template.write_text("\\documentclass{article}\n")
+    first = latex.template_hash(str(template))
+    assert first == latex.template_hash(str(template))
+    template.write_text("\\documentclass{report}\n")
+    assert first != latex.template_hash(str(template))
+    aux = latex.page_aux_dir("build/a.pdf", str(tmp_path))
+    assert aux == latex.page_aux_dir("build/a.pdf", str(tmp_path))
+    assert aux != latex.page_aux_dir("build/b.pdf", str(tmp_path))
+    assert os.path.dirname(aux) == os.path.join(str(tmp_path), "aux")
@@ -0,0 +1,38 @@
+"""Tests for the internal link checker in oerforge.linkcheck."""
+
+from oerforge import linkcheck
+
+def test_broken_links_are_grouped(tmp_path):
+    build = tmp_path / "build"
+    (build / "guide").mkdir(parents=True)
+    (build / "css").mkdir()
+    (build / "css" / "site.css").write_text("")
+    (build / "index.html").write_text(
+        '<html><head><link rel="stylesheet" href="css/site.css"><script src="js/missing.js"></script></head><body>'
+        '<a href="guide/">Guide</a> <a href="guide/page.html#setup">Setup</a> <a href="guide/page.html#nope">Nope</a>'
+        '<a href="gone.html">Gone</a> <a href="notes.md">Notes</a> <a href="https://example.org/x.html">Ext</a>'
+        '<a href="#top" id="top">Top</a> <a href="other.md">Other</a> (OER-Forge: Page not found in sqlite.db)</body></html>'
+    )
+    (build / "guide" / "index.html").write_text('<html><body><a href="../index.html#top">Home</a></body></html>')
+    (build / "guide" / "page.html").write_text('<html><body><h2 id="setup">Setup</h2><img src="/css/site.css"></body></html>')
+
+    result = linkcheck.check_links(str(build), workers=1)
+    problems = {group: [(page, detail) for page, _, _, detail in entries] for group, entries in result["problems"].items()}
+    assert problems == {
+        "missing-page": [("index.html", "gone.html")],
+        "unrewritten-md": [("index.html", "notes.md"), ("index.html", "other.md")],
+        "missing-anchor": [("index.html", "guide/page.html#nope")],
+        "missing-asset": [("index.html", "js/missing.js")],
+        "unresolved": [("index.html", "(OER-Forge: Page not found in sqlite.db)")],
+    }
+    assert result["links"] == 11
+    assert "Links to #fragments that do not exist (1):" in linkcheck.format_report(result)
+    assert linkcheck.main([str(build)]) == 1
+
+def test_fail_on_broken_defaults_to_true(tmp_path):
+    config = tmp_path / "_content.yml"
+    assert linkcheck.fail_on_broken(str(config))
+    config.write_text("site:\n  title: Test\n")
+    assert linkcheck.fail_on_broken(str(config))
+    config.write_text("linkcheck:\n  fail_on_broken: false\n")
+    assert not linkcheck.fail_on_broken(str(config))
@@ -20,4 +20,25 @@ def test_merge_export_config():
     assert merged["foo"] == 2
     assert merged["types"] == ["html"]
 
-# Integration tests can use tmp_path and mock file/DB access as needed.
\ No newline at end of file
+# Integration tests can use tmp_path and mock file/DB access as needed.
+def test_badges_survive_database_reinitialization(tmp_path):
+    import sqlite3
+    from oerforge import db_utils
+    from oerforge.db_writer import DBWriter, AccessibilityResult
+    db_path = str(tmp_path / "test.db")
+    db_utils.initialize_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO content (output_path, canonical_path) VALUES ('page.html', 'page.html')")
+    conn.commit()
+    conn.close()
+    with DBWriter(db_path) as writer:
+        writer.post(AccessibilityResult(1, "WCAG2AA", "[]", "<a>badge</a>", 0, 0, 0, "h", "c", []))
+
+    # The next build re-initializes the database and rescans the content with new ids
+    db_utils.initialize_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO content (output_path, canonical_path) VALUES ('other.html', 'other.html')")
+    conn.execute("INSERT INTO content (output_path, canonical_path) VALUES ('page.html', 'page.html')")
+    conn.commit()
+    assert make.load_accessibility_badges(conn.cursor(), "WCAG2AA") == {"page.html": "<a>badge</a>"}
+    conn.close()
@@ -0,0 +1,40 @@
+"""Tests for in-process notebook rendering in oerforge.notebook."""
+
+import base64
+from oerforge import notebook
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\nfake"
+
+def make_notebook():
+    return {
+        "metadata": {"language_info": {"name": "python"}},
+        "cells": [
+            {"cell_type": "markdown", "source": ["# Title\n", "Intro"]},
+            {"cell_type": "code", "source": "print('hi')", "outputs": [
+                {"output_type": "stream", "name": "stdout", "text": ["hi\n"]},
+                {"output_type": "display_data", "data": {
+                    "image/png": base64.b64encode(PNG_BYTES).decode("ascii"),
+                    "text/plain": ["<Figure>"],
+                }},
+                {"output_type": "error", "ename": "ValueError", "evalue": "bad",
+                 "traceback": ["\x1b[0;31mValueError\x1b[0m: bad"]},
+            ]},
+        ],
+    }
+
+def test_notebook_to_markdown_renders_cells_and_writes_images(tmp_path):
+    asset_dir = tmp_path / "nb_files"
+    md = notebook.notebook_to_markdown(make_notebook(), str(asset_dir), "nb_files", stem="nb")
+    assert md.startswith("# Title\nIntro")
+    assert "```python\nprint('hi')\n```" in md
+    assert "```\nhi\n```" in md
+    assert "![<Figure>](nb_files/nb_1_1.png)" in md
+    assert "ValueError: bad" in md and "\x1b" not in md
+    assert (asset_dir / "nb_1_1.png").read_bytes() == PNG_BYTES
+
+def test_unchanged_images_are_not_rewritten(tmp_path):
+    asset_dir = tmp_path / "nb_files"
+    notebook.notebook_to_markdown(make_notebook(), str(asset_dir), stem="nb")
+    sink = notebook._ImageSink(str(asset_dir), "", "nb")
+    sink.add("nb_1_1.png", "image/png", base64.b64encode(PNG_BYTES).decode("ascii"))
+    assert sink.write_all() == 0
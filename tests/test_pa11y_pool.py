@@ -0,0 +1,38 @@
+"""Tests for the long-lived pa11y worker pool in oerforge.pa11y_pool."""
+
+import sys
+from oerforge.pa11y_pool import Pa11yPool
+
+# Speaks the pa11y_worker.js protocol: one issue per page; exits on a "crash" page
+FAKE_WORKER = """
+import sys, json
+print(json.dumps({"ready": True}), flush=True)
+for line in sys.stdin:
+    request = json.loads(line)
+    if "crash" in request["url"]:
+        sys.exit(1)
+    issue = {"type": "error", "code": request["options"]["standard"], "selector": request["url"]}
+    print(json.dumps({"id": request["id"], "issues": [issue]}), flush=True)
+"""
+
+def test_pool_checks_pages_on_long_lived_workers(tmp_path):
+    script = tmp_path / "fake_worker.py"
+    script.write_text(FAKE_WORKER)
+    items = [(f"page{n}", f"file:///page{n}.html", {"standard": "WCAG2AA"}) for n in range(20)]
+    with Pa11yPool(concurrency=4, workers=2, command=[sys.executable, str(script)], env={}) as pool:
+        pids = {worker.proc.pid for worker in pool.workers}
+        results = dict(pool.check_many(items))
+        assert {worker.proc.pid for worker in pool.workers} == pids
+    assert len(pids) == 2
+    assert sorted(results) == sorted(key for key, _, _ in items)
+    assert results["page3"]["issues"] == [{"type": "error", "code": "WCAG2AA", "selector": "file:///page3.html"}]
+
+def test_pool_reports_errors_when_a_worker_dies(tmp_path):
+    script = tmp_path / "fake_worker.py"
+    script.write_text(FAKE_WORKER)
+    items = [("crash", "file:///crash.html", {"standard": "WCAG2AA"})]
+    with Pa11yPool(concurrency=1, workers=1, command=[sys.executable, str(script)], env={}) as pool:
+        results = dict(pool.check_many(items))
+        assert "error" in results["crash"]
+        # The next page is served by a replacement worker
+        assert "issues" in dict(pool.check_many([("ok", "file:///ok.html", {"standard": "WCAG2AA"})]))["ok"]
@@ -0,0 +1,38 @@
+"""Tests for the dry-run conversion planner in oerforge.plan."""
+
+import os
+import time
+from oerforge import convert
+from oerforge import plan
+
+def test_classify_job_states(tmp_path):
+    source = tmp_path / "a.md"
+    output = tmp_path / "a.pdf"
+    source.write_text("x")
+    assert convert.classify_job(str(source), str(output)) == ("new", "output does not exist")
+    output.write_text("y")
+    past = time.time() - 100
+    os.utime(source, (past, past))
+    assert convert.classify_job(str(source), str(output))[0] == "up-to-date"
+    assert convert.classify_job(str(source), str(output), force=True) == ("stale", "forced")
+    os.utime(output, (past - 50, past - 50))
+    state, reason = convert.classify_job(str(source), str(output))
+    assert state == "stale" and "50s" in reason
+
+def test_estimates_prefer_output_then_format_then_default():
+    by_output = {"a_files/a.pdf": 7.0}
+    by_pair = {(".md", ".docx"): 3.0}
+    job = {"input_ext": ".md", "output_ext": ".pdf", "output_path": os.path.join(convert.BUILD_DIR, "a_files", "a.pdf")}
+    assert plan.estimate_duration(job, by_output, by_pair) == (7.0, "output")
+    job = {"input_ext": ".md", "output_ext": ".docx", "output_path": "b_files/b.docx"}
+    assert plan.estimate_duration(job, by_output, by_pair) == (3.0, "format")
+    job = {"input_ext": ".md", "output_ext": ".epub", "output_path": "b_files/b.epub"}
+    assert plan.estimate_duration(job, by_output, by_pair) == (plan.DEFAULT_ESTIMATES[".epub"], "default")
+
+def test_schedule_predicts_makespan_and_critical_path():
+    jobs = [{"output_path": name, "estimate": est} for name, est in [("a", 8), ("b", 4), ("c", 4), ("d", 3), ("e", 1)]]
+    makespan, path = plan.schedule(jobs, 2)
+    assert makespan == 11
+    assert sum(job["estimate"] for job in path) == 11
+    assert plan.schedule(jobs, 1)[0] == 20
+    assert plan.schedule(jobs, 8)[0] == 8
@@ -0,0 +1,98 @@
+"""Unit tests for the oerforge.process_utils module."""
+
+import sys
+import time
+import subprocess
+import pytest
+from oerforge import process_utils
+
+def test_run_tool_returns_output():
+    result = process_utils.run_tool([sys.executable, "-c", "print('ok')"], timeout=30)
+    assert result.returncode == 0
+    assert result.stdout.strip() == "ok"
+
+def test_run_tool_timeout_kills_process_group():
+    """
+    A hung tool is killed after its timeout and reported as a ToolTimeoutError.
+    """
+    start = time.monotonic()
+    with pytest.raises(process_utils.ToolTimeoutError):
+        process_utils.run_tool([sys.executable, "-c", "import time; time.sleep(30)"], timeout=0.5, retries=0)
+    assert time.monotonic() - start < 10
+
+def test_run_tool_does_not_retry_normal_failure():
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        process_utils.run_tool([sys.executable, "-c", "import sys; sys.exit(3)"], timeout=30, retries=2, backoff=0)
+    assert excinfo.value.returncode == 3
+
+def test_run_tool_retries_signal_kill(tmp_path):
+    """
+    A child killed by a signal is transient and retried; the second attempt succeeds.
+    """
+    marker = tmp_path / "attempted"
+    script = (
+        "import os, signal, sys\n"
+        f"m = {str(marker)!r}\n"
+        "if not os.path.exists(m):\n"
+        "    open(m, 'w').close()\n"
+        "    os.kill(os.getpid(), signal.SIGTERM)\n"
+        "print('second')\n"
+    )
+    result = process_utils.run_tool([sys.executable, "-c", script], timeout=30, retries=1, backoff=0)
+    assert result.stdout.strip() == "second"
+
+def test_cancelled_runs_do_not_start():
+    process_utils.cancel_all()
+    try:
+        with pytest.raises(process_utils.ToolCancelledError):
+            process_utils.run_tool([sys.executable, "-c", "print('never')"], timeout=30)
+    finally:
+        process_utils.reset_cancellation()
+
+def test_async_runner_caps_output_and_limits_concurrency(tmp_path):
+    """
+    Output beyond max_output is drained and flagged as truncated; a per-tool limit of 1
+    runs that tool's processes one at a time.
+    """
+    runner = process_utils.AsyncToolRunner(max_output=1000).start()
+    result = runner.submit([sys.executable, "-c", "print('x' * 100000)"], timeout=30).result()
+    assert result.returncode == 0
+    assert result.truncated
+    assert len(result.stdout) == 1000
+
+    tool = "serial_tool"
+    runner = process_utils.AsyncToolRunner(tool_limits={tool: 1}).start()
+    script = tmp_path / tool
+    script.write_text(f"#!{sys.executable}\nimport time; time.sleep(0.3)\n")
+    script.chmod(0o755)
+    start = time.monotonic()
+    results = [result for _, result in runner.map([[str(script)], [str(script)]], timeout=30)]
+    assert [r.returncode for r in results] == [0, 0]
+    assert time.monotonic() - start >= 0.6
+
+def test_async_runner_reports_missing_binary():
+    result = process_utils.get_runner().submit(["oerforge-no-such-tool"], timeout=5).result()
+    assert isinstance(result.error, FileNotFoundError)
+    assert result.returncode is None
+
+def test_async_runner_deadline_covers_stdin_and_escaped_pipes():
+    """
+    A child that never reads a large stdin, or that leaves a descendant in its own session
+    holding the output pipe, still returns within the timeout plus the kill grace.
+    """
+    runner = process_utils.AsyncToolRunner().start()
+    start = time.monotonic()
+    result = runner.submit([sys.executable, "-c", "import time; time.sleep(30)"],
+                           timeout=0.5, input=b"x" * (8 * 1024 * 1024)).result()
+    assert result.timed_out
+    assert time.monotonic() - start < 0.5 + 2 * process_utils.KILL_GRACE_SECONDS
+
+    escape = (
+        "import os, subprocess, sys\n"
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'], start_new_session=True)\n"
+        "print('parent done', flush=True)\n"
+    )
+    start = time.monotonic()
+    result = runner.submit([sys.executable, "-c", escape], timeout=0.5).result()
+    assert "parent done" in result.stdout
+    assert time.monotonic() - start < 0.5 + 2 * process_utils.KILL_GRACE_SECONDS
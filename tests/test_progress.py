@@ -0,0 +1,35 @@
+"""Tests for the NDJSON progress stream in oerforge.progress."""
+
+import io
+from oerforge import progress
+
+def test_progress_stream_is_readable_after_each_record(tmp_path):
+    path = tmp_path / "progress.ndjson"
+    output = tmp_path / "out.pdf"
+    output.write_bytes(b"12345")
+    console = io.StringIO()
+    log = progress.ProgressLog(str(path), total=2, run_id="r1", label="convert", stream=console).open()
+    log.record({"input": "a.md", "output": str(output), "status": "success", "duration": 1.0})
+    # Flushed per line: a crash here would still leave the first record on disk
+    records = progress.read_progress(str(path))
+    assert len(records) == 1 and records[0]["output_size"] == 5 and records[0]["run_id"] == "r1"
+    log.record({"input": "b.md", "output": str(tmp_path / "missing.pdf"), "status": "failed", "duration": 2.0})
+    log.close()
+    assert "[convert] 2/2 (100%) failed=1 success=1" in console.getvalue()
+
+def test_read_progress_skips_truncated_line_and_filters_run(tmp_path):
+    path = tmp_path / "progress.ndjson"
+    path.write_text(
+        '{"run_id": "old", "output": "a", "status": "success"}\n'
+        '{"run_id": "r1", "output": "a", "status": "cancelled"}\n'
+        '{"run_id": "r1", "output": "a", "status": "success"}\n'
+        '{"run_id": "r1", "output": "b", "sta'
+    )
+    records = progress.read_progress(str(path), run_id="r1")
+    assert [r["status"] for r in records] == ["cancelled", "success"]
+    assert [r["status"] for r in progress.latest_records(records)] == ["success"]
+
+def test_format_eta():
+    assert progress.format_eta(45) == "45s"
+    assert progress.format_eta(185) == "3m05s"
+    assert progress.format_eta(3720) == "1h02m"
@@ -0,0 +1,37 @@
+"""Tests for the theme contrast analyzer in oerforge.themes."""
+
+import pytest
+from oerforge import themes
+
+pytest.importorskip("numpy")
+
+THEME = """theme:
+  name: {name}
+colors:
+  color_bg: "#ffffff"
+  color_fg: "#000"
+  color_link: "{link}"
+  color_title: "#777777"
+"""
+
+def test_ratios_failures_and_cache(tmp_path, monkeypatch):
+    themes_dir = tmp_path / "themes"
+    themes_dir.mkdir()
+    (themes_dir / "plain.yml").write_text(THEME.format(name="plain", link="#767676"))
+    (themes_dir / "broken.yml").write_text(THEME.format(name="broken", link="blue"))
+    cache_path = str(tmp_path / "contrast.json")
+
+    analysis = themes.analyze_themes(str(themes_dir), cache_path)
+    ratios = {(r["fg"], r["bg"]): r["ratio"] for r in analysis["plain"]}
+    assert ratios == {("color_fg", "color_bg"): 21.0, ("color_link", "color_bg"): 4.54, ("color_title", "color_bg"): 4.48}
+    assert [(name, r["fg"]) for name, r, _ in themes.contrast_failures(analysis, "AA")] == [("broken", "color_link")]
+    assert len(themes.contrast_failures(analysis, "WCAG2AAA")) == 4
+
+    # Unchanged files come from the cache; an edited one is recomputed
+    calls = []
+    real = themes.analyze_palettes
+    monkeypatch.setattr(themes, "analyze_palettes", lambda palettes: calls.append(sorted(palettes)) or real(palettes))
+    assert themes.analyze_themes(str(themes_dir), cache_path) == analysis
+    (themes_dir / "broken.yml").write_text(THEME.format(name="broken", link="#0000ee"))
+    assert themes.contrast_failures(themes.analyze_themes(str(themes_dir), cache_path), "AA") == []
+    assert calls == [["broken.yml"]]
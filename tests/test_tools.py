@@ -0,0 +1,92 @@
+"""Tests for external tool probing in oerforge.tools."""
+
+import os
+import sys
+from oerforge import tools
+from oerforge import convert
+
+def make_fake_pandoc(bin_dir):
+    script = bin_dir / "pandoc"
+    script.write_text(
+        f"#!{sys.executable}\n"
+        "import sys\n"
+        "print('pandoc 9.9' if sys.argv[1] == '--version' else 'plain\\nlatex\\ndocx')\n"
+    )
+    script.chmod(0o755)
+
+def test_probe_is_cached_and_prunes_missing_tools(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    make_fake_pandoc(bin_dir)
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.setattr(tools, "_probed", None)
+    cache_path = str(tmp_path / "tools.json")
+
+    found = tools.probe_tools(cache_path=cache_path)
+    assert found["pandoc"]["version"] == "pandoc 9.9"
+    assert tools.can_convert(".md", ".docx", found) == (True, None)
+    assert tools.can_convert(".md", ".pdf", found) == (False, "pdflatex not found in PATH")
+    assert tools.can_convert(".md", ".epub", found)[0] is False
+    assert tools.can_convert(".md", ".md", {}) == (True, None)
+    assert tools.toolchain_stamp(".md", ".docx", found) == "pandoc 9.9"
+
+    # Same PATH and binaries: the on-disk cache is used without running any tool
+    monkeypatch.setattr(tools, "_probed", None)
+    def fail(*args):
+        raise AssertionError("tools must not be re-probed")
+    monkeypatch.setattr(tools, "_probe_one", fail)
+    assert tools.probe_tools(cache_path=cache_path) == found
+
+def test_toolchain_change_marks_output_stale(tmp_path):
+    source = tmp_path / "page.md"
+    output = tmp_path / "page.docx"
+    source.write_text("# Page\n")
+    output.write_text("out")
+    os.utime(source, (1000, 1000))
+    state, reason = convert.classify_job(str(source), str(output), toolchain="pandoc 3.2", recorded_toolchain="pandoc 3.1")
+    assert state == "stale" and "pandoc 3.1 -> pandoc 3.2" in reason
+    assert convert.classify_job(str(source), str(output), toolchain="pandoc 3.2", recorded_toolchain=None)[0] == "up-to-date"
+
+def test_toolchain_is_remembered_across_reinitialization(tmp_path, monkeypatch):
+    import sqlite3
+    from oerforge import db_utils, job_queue
+    db_path = str(tmp_path / "test.db")
+    source = tmp_path / "page.md"
+    source.write_text("# Page\n")
+    found = {"pandoc": {"path": "/usr/bin/pandoc", "version": "pandoc 3.1", "formats": None}}
+    monkeypatch.setattr(tools, "probe_tools", lambda *args, **kwargs: found)
+
+    def fake_convert_file(input_path, output_path, input_ext, output_ext, db_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        with open(output_path, "w") as f:
+            f.write("out")
+        now = convert.datetime.now().isoformat()
+        return {"input": input_path, "output": output_path, "status": "success", "reason": None, "start_time": now, "end_time": now}
+    monkeypatch.setattr(convert, "convert_file", fake_convert_file)
+
+    def rebuild_content():
+        db_utils.initialize_database(db_path)
+        conn = sqlite3.connect(db_path)
+        conn.execute("UPDATE conversion_capabilities SET is_enabled = (source_format = '.md' AND target_format = '.docx')")
+        conn.execute(
+            "INSERT INTO content (source_path, output_path, mime_type, export_types) VALUES (?, ?, '.md', 'docx')",
+            (str(source), str(tmp_path / "build" / "page.html"))
+        )
+        conn.commit()
+        conn.close()
+
+    rebuild_content()
+    jobs = convert.enumerate_conversion_jobs(db_path)
+    assert [job["state"] for job in jobs] == ["new"]
+    conn = job_queue.connect(db_path)
+    job_queue.enqueue_jobs(conn, jobs, resume=False)
+    conn.close()
+    assert [r["status"] for r in convert.drain_job_queue(db_path, max_workers=1)] == ["success"]
+    os.utime(source, (1000, 1000))
+
+    # The next build re-initializes the database; the toolchain stamp survives it
+    rebuild_content()
+    assert [job["state"] for job in convert.enumerate_conversion_jobs(db_path)] == ["up-to-date"]
+    found["pandoc"]["version"] = "pandoc 3.2"
+    job = convert.enumerate_conversion_jobs(db_path)[0]
+    assert job["state"] == "stale" and "pandoc 3.1 -> pandoc 3.2" in job["reason"]
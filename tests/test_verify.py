@@ -0,0 +1,282 @@
+"""Tests for accessibility re-check skipping in oerforge.verify."""
+
+import sqlite3
+from oerforge import verify
+from oerforge import db_utils
+
+LOGO_INFO = {"WCAG2AA": "https://example.org/wcag2aa.png"}
+
+def test_badge_does_not_change_checked_hash(tmp_path):
+    page = tmp_path / "page.html"
+    html = "<html><body><main><h1>Page</h1></main><div id=\"accessibility-report-placeholder\"></div></body></html>"
+    page.write_text(html)
+    badge = verify.generate_badge_html("WCAG2AA", 1, LOGO_INFO, "wcag_report_page.html")
+    verify.inject_badge_into_html(str(page), badge, "wcag_report_page.html", LOGO_INFO)
+    assert "wcag-badge" in page.read_text()
+    assert verify.checked_html_hash(page.read_text(), LOGO_INFO) == verify.checked_html_hash(html, LOGO_INFO)
+
+def test_unchanged_pages_reuse_stored_results(tmp_path, monkeypatch):
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    page = build_dir / "page.html"
+    page.write_text("<html><body><main><h1>Page</h1></main></body></html>")
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.execute("INSERT INTO content (source_path, output_path, mime_type) VALUES ('page.md', 'page.html', '.md')")
+    conn.commit()
+    conn.close()
+
+    checked = []
+    def fake_check_pages(html_paths, *args, **kwargs):
+        for path in html_paths:
+            checked.append(path)
+            yield path, [{"type": "error", "code": "x"}, {"type": "notice", "code": "y"}]
+    monkeypatch.setattr(verify, "check_pages", fake_check_pages)
+    monkeypatch.setattr(verify.tools, "tool_version", lambda name: "9.0.0")
+    monkeypatch.setattr(verify, "copy_to_docs", lambda: None)
+    monkeypatch.setattr(verify.ReportRenderer, "render", lambda *args: None)
+
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", db_path=db_path)
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", db_path=db_path)
+    assert checked == [str(page)]
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", db_path=db_path, force=True)
+    assert len(checked) == 2
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT error_count, notice_count, html_hash IS NOT NULL FROM accessibility_results WHERE wcag_level = 'WCAG2AA'").fetchall()
+    conn.close()
+    assert rows == [(1, 1, 1)]
+
+def test_content_index_matches_any_path_form(tmp_path):
+    build_dir = tmp_path / "build"
+    conn = sqlite3.connect(str(tmp_path / "test.db"))
+    db_utils.create_tables(conn.cursor())
+    conn.executemany("INSERT INTO content (output_path) VALUES (?)", [("sample/page.html",), ("build/about.html",), (None,)])
+    conn.commit()
+    index = verify.build_content_index(conn, str(build_dir))
+    assert index == {"sample/page.html": 1, "about.html": 2}
+    assert verify.get_content_id_for_file(str(build_dir / "sample" / "page.html"), conn, str(build_dir)) == 1
+    assert verify.get_content_id_for_file(str(build_dir / "missing.html"), conn, str(build_dir)) is None
+    conn.close()
+
+def test_results_are_upserted_compressed_and_normalized(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.commit()
+    issues = [{"type": "error", "code": f"WCAG2AA.Principle1.{n}", "message": "x" * 100, "selector": f"#el{n}"} for n in range(100)]
+    with verify.DBWriter(db_path) as writer:
+        writer.post(verify.build_accessibility_result(1, issues[:1], "<a></a>", "WCAG2AA", "h1", "c1"))
+        writer.post(verify.build_accessibility_result(1, issues, "<a></a>", "WCAG2AA", "h2", "c1"))
+    rows = conn.execute("SELECT pa11y_json, error_count, html_hash FROM accessibility_results").fetchall()
+    assert len(rows) == 1
+    stored, error_count, html_hash = rows[0]
+    assert isinstance(stored, bytes) and len(stored) < len(str(issues))
+    assert verify.decode_pa11y_json(stored) == issues and error_count == 100 and html_hash == "h2"
+    assert conn.execute("SELECT COUNT(*) FROM accessibility_issues WHERE content_id = 1 AND code LIKE 'WCAG2AA.%'").fetchone()[0] == 100
+    conn.close()
+
+def test_badge_splice_replaces_previous_badge(tmp_path):
+    page = tmp_path / "page.html"
+    # As rendered by make.py for a page with no stored result yet
+    placeholder = "<span id=\"accessibility-report-placeholder\">" + verify.badges.badge_markup(None) + "</span>"
+    html = "<html><body>" + placeholder + "<main><h1>Page</h1></main></body></html>"
+    page.write_text(html)
+    first = verify.generate_badge_html("WCAG2AA", 3, LOGO_INFO, "wcag_report_page.html")
+    second = verify.generate_badge_html("WCAG2AA", 0, LOGO_INFO, "wcag_report_page.html")
+    assert verify.badges.splice_badge_into_file(str(page), first)
+    assert verify.badges.splice_badge_into_file(str(page), second)
+    spliced = page.read_text()
+    assert spliced.count("<!--a11y-badge-->") == 1
+    assert second in spliced and first not in spliced
+    assert "<main><h1>Page</h1></main>" in spliced
+    assert verify.checked_html_hash(spliced, LOGO_INFO) == verify.checked_html_hash(html, LOGO_INFO)
+    bare = tmp_path / "bare.html"
+    bare.write_text("<html><body></body></html>")
+    assert not verify.badges.splice_badge_into_file(str(bare), second)
+
+def test_report_renderer_caches_menu_and_reads_titles(tmp_path):
+    build_dir = tmp_path / "build"
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.executemany(
+        "INSERT INTO content (title, output_path, relative_link, menu_context, canonical_path) VALUES (?, ?, ?, 'main', ?)",
+        [("Home", "index.html", "index.html", "index.html"), ("Guide", "guide/index.html", "guide/index.html", "guide/index.html"),
+         ("Setup", "guide/setup.html", "guide/setup.html", "guide/setup.html")],
+    )
+    conn.commit()
+    conn.close()
+    renderer = verify.ReportRenderer(str(build_dir), db_path)
+    menu = renderer.menu_for("guide/wcag_report_setup.html")
+    assert renderer.menu_for("guide/wcag_report_other.html") is menu
+    assert [item["link"] for item in menu] == ["../index.html", "index.html", "setup.html"]
+    assert renderer.title_for(str(build_dir / "guide" / "setup.html")) == "Setup"
+    assert renderer.title_for(str(build_dir / "unknown.html")) == "Unknown"
+
+def test_prelint_flags_static_failures_and_triages(tmp_path, monkeypatch):
+    issues = verify.prelint_html(
+        "<html><body><h1>T</h1><h3 id=\"a\">S</h3><p id=\"a\"></p><img src=\"x.png\">"
+        "<a href=\"/\"><img src=\"home.png\" alt=\"Home\"></a><a href=\"/y\"> </a></body></html>"
+    )
+    assert sorted(i["code"] for i in issues) == [
+        "prelint.duplicate-id", "prelint.heading-order", "prelint.html-lang", "prelint.img-alt", "prelint.link-name"
+    ]
+    assert verify.prelint_html("<html lang=\"en\"><body><h1>T</h1><h2>S</h2><img src=\"x.png\" alt=\"\"></body></html>") == []
+
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    (build_dir / "bad.html").write_text("<html><body><img src=\"x.png\"></body></html>")
+    (build_dir / "good.html").write_text("<html lang=\"en\"><body><h1>Fine</h1></body></html>")
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.executemany("INSERT INTO content (output_path, mime_type) VALUES (?, '.md')", [("bad.html",), ("good.html",)])
+    conn.commit()
+    conn.close()
+    checked = []
+    def fake_check_pages(html_paths, *args, **kwargs):
+        for path in html_paths:
+            checked.append(path)
+            yield path, []
+    monkeypatch.setattr(verify, "check_pages", fake_check_pages)
+    monkeypatch.setattr(verify.tools, "tool_version", lambda name: "9.0.0")
+    monkeypatch.setattr(verify, "copy_to_docs", lambda: None)
+    monkeypatch.setattr(verify.ReportRenderer, "render", lambda *args: None)
+
+    config = tmp_path / "pa11y.json"
+    config.write_text("{}")
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", config_file=str(config), db_path=db_path, triage=True)
+    assert len(checked) == 2  # never checked before, so both go to Pa11y
+    # After a config change only the page that passes the pre-lint is re-checked
+    config.write_text('{"timeout": 1000}')
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", config_file=str(config), db_path=db_path, triage=True)
+    assert checked[2:] == [str(build_dir / "good.html")]
+    # The triaged result was not stored under the new config, so a run without triage checks it
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", config_file=str(config), db_path=db_path)
+    assert checked[3:] == [str(build_dir / "bad.html")]
+    # force wins over triage
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", config_file=str(config), db_path=db_path, force=True, triage=True)
+    assert sorted(checked[4:]) == [str(build_dir / "bad.html"), str(build_dir / "good.html")]
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT content_id, error_count FROM accessibility_results WHERE wcag_level = 'prelint' ORDER BY content_id").fetchall()
+    stored = conn.execute("SELECT code, runner FROM accessibility_issues WHERE wcag_level = 'prelint' ORDER BY code").fetchall()
+    conn.close()
+    assert rows == [(1, 2), (2, 0)]
+    assert stored == [("prelint.html-lang", "prelint"), ("prelint.img-alt", "prelint")]
+
+def test_one_check_is_split_per_standard(tmp_path, monkeypatch):
+    from oerforge import wcag
+    issues = [
+        {"type": "error", "code": "WCAG2AAA.Principle1.Guideline1_1.1_1_1.H37"},
+        {"type": "error", "code": "WCAG2AAA.Principle1.Guideline1_4.1_4_3.G18.Fail"},
+        {"type": "error", "code": "WCAG2AAA.Principle1.Guideline1_4.1_4_6.G17.Fail"},
+        {"type": "error", "code": "WCAG2AAA.Principle4.Guideline4_1.4_1_1.F77"},
+        {"type": "warning", "code": "color-contrast"},
+    ]
+    assert wcag.superset_standard(["WCAG2A", "WCAG22AA"]) == "WCAG2AA"
+    counts = {std: len(found) for std, found in wcag.classify_issues(issues, ["WCAG2A", "WCAG2AA", "WCAG2AAA", "WCAG22AA"]).items()}
+    assert counts == {"WCAG2A": 3, "WCAG2AA": 4, "WCAG2AAA": 5, "WCAG22AA": 3}
+
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    placeholder = "<span id=\"accessibility-report-placeholder\">" + verify.badges.badge_markup(None) + "</span>"
+    (build_dir / "page.html").write_text("<html lang=\"en\"><body>" + placeholder + "</body></html>")
+    db_path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(db_path)
+    db_utils.create_tables(conn.cursor())
+    conn.execute("INSERT INTO content (output_path, mime_type) VALUES ('page.html', '.md')")
+    conn.commit()
+    conn.close()
+    runs = []
+    def fake_check_pages(html_paths, config_path, wcag_level, **kwargs):
+        for path in html_paths:
+            runs.append(wcag_level)
+            yield path, issues
+    monkeypatch.setattr(verify, "check_pages", fake_check_pages)
+    monkeypatch.setattr(verify.tools, "tool_version", lambda name: "9.0.0")
+    monkeypatch.setattr(verify, "copy_to_docs", lambda: None)
+    monkeypatch.setattr(verify.ReportRenderer, "render", lambda *args: None)
+
+    standards = ["WCAG2A", "WCAG2AA", "WCAG22AA"]
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", db_path=db_path, standards=standards)
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", db_path=db_path, standards=standards)
+    assert runs == ["WCAG2AA"]  # one check, reused on the second run
+    conn = sqlite3.connect(db_path)
+    rows = dict(conn.execute("SELECT wcag_level, error_count FROM accessibility_results WHERE wcag_level != 'prelint'"))
+    badge = conn.execute("SELECT badge_html FROM accessibility_results WHERE wcag_level = 'WCAG22AA'").fetchone()[0]
+    conn.close()
+    assert rows == {"WCAG2A": 2, "WCAG2AA": 3, "WCAG22AA": 2}
+    assert "wcag2.2AA" in badge
+    assert "wcag2AA-blue" in (build_dir / "page.html").read_text()
+
+def test_results_survive_reinitialization(tmp_path, monkeypatch):
+    build_dir = tmp_path / "build"
+    build_dir.mkdir()
+    page = build_dir / "page.html"
+    page.write_text("<html><body><main><h1>Page</h1></main></body></html>")
+    db_path = str(tmp_path / "test.db")
+
+    def scan():
+        conn = sqlite3.connect(db_path)
+        # A rescan assigns new ids; the page no longer has the id its result was stored under
+        conn.execute("INSERT INTO content (source_path, output_path, mime_type) VALUES ('other.md', 'other.html', '.md')")
+        conn.execute("INSERT INTO content (source_path, output_path, mime_type) VALUES ('page.md', 'page.html', '.md')")
+        conn.commit()
+        conn.close()
+
+    checked = []
+    def fake_check_pages(html_paths, *args, **kwargs):
+        for path in html_paths:
+            checked.append(path)
+            yield path, [{"type": "error", "code": "x"}]
+    monkeypatch.setattr(verify, "check_pages", fake_check_pages)
+    monkeypatch.setattr(verify.tools, "tool_version", lambda name: "9.0.0")
+    monkeypatch.setattr(verify, "copy_to_docs", lambda: None)
+    monkeypatch.setattr(verify.ReportRenderer, "render", lambda *args: None)
+
+    db_utils.initialize_database(db_path)
+    scan()
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", db_path=db_path)
+    db_utils.initialize_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO content (source_path, output_path, mime_type) VALUES ('new.md', 'new.html', '.md')")
+    conn.commit()
+    conn.close()
+    scan()
+    verify.process_all_html_files(str(build_dir), wcag="WCAG2AA", db_path=db_path)
+    assert checked == [str(page)]
+
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("""
+        SELECT c.source_path, a.error_count FROM accessibility_results a JOIN content c ON c.id = a.content_id
+        WHERE a.wcag_level = 'WCAG2AA'
+    """).fetchall()
+    conn.close()
+    assert rows == [("page.md", 1)]
+
+def test_issues_follow_their_page_across_reinitialization(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    db_utils.initialize_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO content (source_path, output_path, mime_type, canonical_path) VALUES ('a.md', 'a.html', '.md', 'a.html')")
+    conn.execute("INSERT INTO content (source_path, output_path, mime_type, canonical_path) VALUES ('b.md', 'b.html', '.md', 'b.html')")
+    conn.commit()
+    conn.close()
+    issues = [{"type": "error", "code": "WCAG2AA.Principle1.Guideline1_1.1_1_1.H37", "selector": "img"}]
+    with verify.DBWriter(db_path) as writer:
+        writer.post(verify.build_accessibility_result(1, issues, None, "WCAG2AA", "h", "c"))
+        writer.post(verify.build_accessibility_result(2, issues, None, "WCAG2AA", "h", "c"))
+
+    # Rebuild: b.md moves to id 1, a.md is no longer in the site
+    db_utils.initialize_database(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("INSERT INTO content (source_path, output_path, mime_type, canonical_path) VALUES ('b.md', 'b.html', '.md', 'b.html')")
+    assert db_utils.relink_accessibility_results(conn) == 1
+    rows = conn.execute("""
+        SELECT c.source_path, i.code FROM accessibility_issues i JOIN content c ON c.id = i.content_id
+    """).fetchall()
+    assert rows == [("b.md", issues[0]["code"])]
+    assert conn.execute("SELECT content_id FROM accessibility_results").fetchall() == [(1,)]
+    conn.close()